@@ -0,0 +1,183 @@
+# 内容寻址的图片存储：封面、证物图片按内容哈希命名，同一张图无论保存多少次、被多少剧本引用都只有一个文件
+# 引用计数不单独落表，垃圾回收时从各个存储的剧本/证物表现算（见 assets_api），不会和实际数据不一致。
+# 垃圾回收只处理按内容哈希命名的文件，旧的时间戳命名文件需要显式开启 include_legacy。
+# 没有引用不代表没在用：封面目录同时是封面库（/script-covers 列出整个目录），生成、上传后还没分配给剧本的封面没有引用；
+# 证物图片生成、上传后只把 URL 交给前端，证物保存前（可能隔很久）也没有引用。这两类默认不回收，需要按类型显式开启。
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from image_ingest import (
+    PUBLIC_DIR, TEMP_PREFIX, StoredImage, is_content_addressed, is_data_url, remove_image, store_base64,
+    store_bytes, store_data_url
+)
+
+# 未被引用的文件至少保留这么久再回收：刚上传、前端还没保存剧本的图片也是未引用状态
+GC_GRACE_SECONDS = int(os.getenv("ASSET_GC_GRACE_SECONDS", str(24 * 3600)))
+
+
+# 旧的封面列表接口还会读 src/assets 目录，封面在这里另有一份同名副本
+COVER_ASSETS_DIR = os.path.join(os.path.dirname(__file__), '..', 'web', 'src', 'assets', 'script_covers')
+
+
+class AssetKind(NamedTuple):
+    subdir: str   # web/public 下的目录，也是静态文件的 URL 前缀
+    prefix: str   # 文件名前缀
+    keep_unreferenced: bool = False  # 未被引用的文件也可能在使用中，垃圾回收默认跳过这一类
+    mirror_dir: Optional[str] = None  # 同名副本所在目录，回收时一起删除
+
+
+ASSET_KINDS: Dict[str, AssetKind] = {
+    'cover': AssetKind('script_covers', 'script_cover_', keep_unreferenced=True, mirror_dir=COVER_ASSETS_DIR),
+    'evidence': AssetKind('evidence_images', 'evidence_', keep_unreferenced=True),
+}
+
+
+def _kind(kind: str) -> AssetKind:
+    if kind not in ASSET_KINDS:
+        raise ValueError(f"未知的资源类型: {kind}")
+    return ASSET_KINDS[kind]
+
+
+def put_data_url(kind: str, data_url: str) -> StoredImage:
+    """保存 data:image/...;base64, 图片（请求体里的封面、证物图片）"""
+    spec = _kind(kind)
+    return store_data_url(data_url, spec.subdir, spec.prefix)
+
+
+def put_base64(kind: str, base64_data: str, extension: str = 'png') -> StoredImage:
+    """保存图片生成接口返回的 base64 数据"""
+    spec = _kind(kind)
+    return store_base64(base64_data, spec.subdir, spec.prefix, extension)
+
+
+def put_bytes(kind: str, data: bytes, extension: str = 'png') -> StoredImage:
+    """保存内存中的图片数据（上传后压缩过的图片）"""
+    spec = _kind(kind)
+    return store_bytes(data, spec.subdir, spec.prefix, extension)
+
+
+def release(kind: str, filename: Optional[str]) -> bool:
+    """
+    引用方不再使用某个文件时调用，返回是否删除了文件
+
+    按内容哈希命名的文件可能还有其他引用，留给垃圾回收；旧的时间戳命名文件只属于一个引用方，直接删除。
+    """
+    return remove_image(_kind(kind).subdir, os.path.basename(filename) if filename else None)
+
+
+def reference_counts(references: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, Counter]:
+    """
+    统计引用次数
+
+    Args:
+        references: (资源类型, 文件名或 URL 路径)，文件名为空的会被忽略
+
+    Returns:
+        {资源类型: Counter(文件名 -> 引用次数)}
+    """
+    counts: Dict[str, Counter] = {kind: Counter() for kind in ASSET_KINDS}
+    for kind, value in references:
+        # ORM 证物表可能直接存着 data URL，不对应任何文件
+        if value and kind in counts and not is_data_url(value):
+            counts[kind][os.path.basename(value)] += 1
+    return counts
+
+
+def garbage_collect(references: Iterable[Tuple[str, Optional[str]]], grace_seconds: int = GC_GRACE_SECONDS,
+                    dry_run: bool = True, include_legacy: bool = False,
+                    include_kinds: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    删除没有任何引用的图片文件
+
+    Args:
+        references: 所有数据库中的图片引用，格式同 reference_counts
+        grace_seconds: 修改时间在这之内的文件不删除（复用已有文件时会刷新修改时间）
+        dry_run: 只返回将要删除的文件，不实际删除
+        include_legacy: 同时回收带前缀的时间戳命名旧文件；keep_unreferenced 的类型仍需在 include_kinds 中开启
+        include_kinds: 同时回收这些 keep_unreferenced 资源类型中未被引用的文件（如 'cover'、'evidence'）
+
+    Returns:
+        {'dry_run', 'deleted': [{'kind', 'filename', 'size'}], 'freed_bytes', 'referenced', 'kept_recent', 'errors'}
+    """
+    counts = reference_counts(references)
+    include_kinds = set(include_kinds)
+    for kind in include_kinds:
+        _kind(kind)
+    now = time.time()
+    deleted: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    referenced = 0
+    kept_recent = 0
+
+    for kind, spec in ASSET_KINDS.items():
+        directory = os.path.join(PUBLIC_DIR, spec.subdir)
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if not entry.is_file():
+                continue
+            name = entry.name
+            # 进程中途退出留下的临时文件
+            is_temp = name.startswith(TEMP_PREFIX)
+            managed = ((not spec.keep_unreferenced or kind in include_kinds)
+                       and (is_content_addressed(name) or (include_legacy and name.startswith(spec.prefix))))
+            if not (is_temp or managed):
+                continue
+            if not is_temp and counts[kind][name] > 0:
+                referenced += 1
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime < grace_seconds:
+                kept_recent += 1
+                continue
+            if not dry_run:
+                try:
+                    os.remove(entry.path)
+                    if spec.mirror_dir and not is_temp:
+                        _remove_if_exists(os.path.join(spec.mirror_dir, name))
+                except OSError as e:
+                    errors.append(f"{spec.subdir}/{name}: {e}")
+                    continue
+            deleted.append({'kind': kind, 'filename': name, 'size': stat.st_size})
+
+    freed = sum(item['size'] for item in deleted)
+    if deleted and not dry_run:
+        print(f"🗑️ 图片垃圾回收: 删除 {len(deleted)} 个文件，释放 {freed / 1024 / 1024:.1f} MB")
+    return {
+        'dry_run': dry_run,
+        'deleted': deleted,
+        'freed_bytes': freed,
+        'referenced': referenced,
+        'kept_recent': kept_recent,
+        'errors': errors,
+    }
+
+
+def _remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def stats(references: Iterable[Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    """每类资源的文件数、总大小、被引用的文件数和缺失文件数（数据库引用了但磁盘上没有）"""
+    counts = reference_counts(references)
+    result = {}
+    for kind, spec in ASSET_KINDS.items():
+        directory = os.path.join(PUBLIC_DIR, spec.subdir)
+        files = {}
+        if os.path.isdir(directory):
+            files = {entry.name: entry.stat().st_size for entry in os.scandir(directory)
+                     if entry.is_file() and not entry.name.startswith(TEMP_PREFIX)}
+        result[kind] = {
+            'files': len(files),
+            'bytes': sum(files.values()),
+            'content_addressed': sum(1 for name in files if is_content_addressed(name)),
+            'referenced_files': sum(1 for name in files if counts[kind][name] > 0),
+            'references': sum(counts[kind].values()),
+            'missing': sorted(name for name in counts[kind] if name not in files),
+        }
+    return result
@@ -0,0 +1,69 @@
+# 图片资源管理API：引用统计和未引用图片的垃圾回收
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import inspect
+from typing import List, Optional, Tuple
+
+import asset_store
+from evidence_models import EvidenceRecord
+from models import Script, ScriptEvidence, SessionLocal
+from script_repository import script_repository
+from simple_db import simple_db
+
+router = APIRouter()
+
+
+def _all_references() -> List[Tuple[str, Optional[str]]]:
+    """剧本存储、简化数据库和 ORM 数据库（剧本、剧本证物、游戏证物）中所有的封面和证物图片引用；任何一处引用的文件都不会被回收"""
+    references = list(simple_db.referenced_images())
+    if script_repository.sqlite_db is not simple_db:
+        references.extend(script_repository.referenced_images())
+    db = SessionLocal()
+    try:
+        references.extend(('cover', filename) for (filename,) in
+                          db.query(Script.cover_image_filename).filter(Script.cover_image_filename.isnot(None)))
+        references.extend(('evidence', filename) for (filename,) in
+                          db.query(ScriptEvidence.image_filename).filter(ScriptEvidence.image_filename.isnot(None)))
+        # 游戏证物表不在 models 的建表范围内，没建过就没有引用
+        if inspect(db.get_bind()).has_table(EvidenceRecord.__tablename__):
+            references.extend(('evidence', image_path) for (image_path,) in
+                              db.query(EvidenceRecord.image_path).filter(EvidenceRecord.image_path.isnot(None)))
+    finally:
+        db.close()
+    return references
+
+
+@router.get("/assets/stats")
+async def get_asset_stats():
+    """图片文件数、占用空间和引用情况"""
+    try:
+        return {
+            "success": True,
+            "stats": asset_store.stats(_all_references())
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取图片统计失败: {str(e)}")
+
+
+@router.post("/assets/gc")
+async def collect_unreferenced_assets(
+    dry_run: bool = Query(True, description="只列出将要删除的文件"),
+    grace_seconds: int = Query(asset_store.GC_GRACE_SECONDS, ge=0, description="最近修改过的文件不删除"),
+    include_legacy: bool = Query(False, description="同时回收时间戳命名的旧文件（限于参与回收的资源类型）"),
+    include_unassigned_covers: bool = Query(False, description="同时回收封面库中未分配给任何剧本的封面"),
+    include_unreferenced_evidence: bool = Query(False, description="同时回收未被任何证物引用的证物图片（可能是前端还没保存的证物）")
+):
+    """回收没有被任何剧本或证物引用的图片，默认只预演"""
+    try:
+        include_kinds = []
+        if include_unassigned_covers:
+            include_kinds.append('cover')
+        if include_unreferenced_evidence:
+            include_kinds.append('evidence')
+        result = asset_store.garbage_collect(_all_references(), grace_seconds=grace_seconds, dry_run=dry_run,
+                                             include_legacy=include_legacy, include_kinds=include_kinds)
+        return {
+            "success": True,
+            **result
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"图片垃圾回收失败: {str(e)}")
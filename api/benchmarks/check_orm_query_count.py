@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+database_api 剧本列表的查询数检查
+
+在临时 SQLite 数据库上分别预置少量和大量剧本，统计 models.load_script_list 执行的 SQL 条数。
+查询数必须和剧本数量无关（完整模式 1 + 3 条 selectinload，摘要模式 1 条），否则说明又出现了 N+1，退出码为 1。
+同时检查单个剧本详情（get_script_from_db 使用的 SCRIPT_DETAIL_OPTIONS）的查询数。
+selectinload 每批最多查 500 个剧本的关联，--large 超过 500 时完整模式的查询数会按批增加。
+
+用法（在 api/ 目录下运行）:
+    python benchmarks/check_orm_query_count.py
+    python benchmarks/check_orm_query_count.py --small 3 --large 300
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# models 在导入时按 DATABASE_URL 创建引擎，必须先指向临时数据库
+_tmpdir = tempfile.mkdtemp(prefix="check_orm_query_count_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'orm.db')}"
+
+from sqlalchemy import event  # noqa: E402
+
+import models  # noqa: E402
+from models import (  # noqa: E402
+    Script, Character, QuizQuestion, ScriptEvidence, SessionLocal, SCRIPT_DETAIL_OPTIONS, load_script_list
+)
+
+# 每种模式允许的查询数
+EXPECTED = {"full": 4, "summary": 1, "detail": 4}
+_TRANSACTION_CONTROL = re.compile(r"\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # SQLite 连接上的事务语句（models._begin_sqlite_transaction 显式发出的 BEGIN 等）不算查询
+        if _TRANSACTION_CONTROL.match(statement):
+            return
+        self.count += 1
+
+    @contextlib.contextmanager
+    def measure(self):
+        start = self.count
+        result = {}
+        yield result
+        result["queries"] = self.count - start
+
+
+def seed(start: int, count: int):
+    db = SessionLocal()
+    try:
+        for i in range(start, start + count):
+            script_id = f"orm-{i}"
+            db.add(Script(id=script_id, title=f"剧本 {i}"))
+            for j in range(3):
+                db.add(Character(script_id=script_id, name=f"角色 {j}"))
+                db.add(QuizQuestion(script_id=script_id, question=f"问题 {j}", order_index=j))
+                db.add(ScriptEvidence(id=f"{script_id}-{j}", script_id=script_id, name=f"证物 {j}", description="雨夜"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_queries(counter: QueryCounter) -> dict:
+    counts = {}
+    for mode in ("full", "summary"):
+        db = SessionLocal()
+        try:
+            with counter.measure() as measured:
+                load_script_list(db, summary=(mode == "summary"))
+            counts[mode] = measured["queries"]
+        finally:
+            db.close()
+
+    db = SessionLocal()
+    try:
+        with counter.measure() as measured:
+            script = db.query(Script).options(*SCRIPT_DETAIL_OPTIONS).filter(Script.id == "orm-0").first()
+            models.script_to_dict(script)
+        counts["detail"] = measured["queries"]
+    finally:
+        db.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="database_api 剧本列表查询数检查")
+    parser.add_argument("--small", type=int, default=5, help="第一轮的剧本数")
+    parser.add_argument("--large", type=int, default=200, help="第二轮的剧本数")
+    args = parser.parse_args()
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            models.create_tables()
+        counter = QueryCounter(models.engine)
+
+        seed(0, args.small)
+        small = count_queries(counter)
+        seed(args.small, args.large - args.small)
+        large = count_queries(counter)
+        models.engine.dispose()
+    finally:
+        shutil.rmtree(_tmpdir, ignore_errors=True)
+
+    failed = False
+    for mode, expected in EXPECTED.items():
+        ok = small[mode] == large[mode] == expected
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {mode:8s} {args.small} 个剧本: {small[mode]} 条查询, "
+              f"{args.large} 个剧本: {large[mode]} 条查询 (期望 {expected})")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
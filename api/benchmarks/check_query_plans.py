@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+SimpleScriptDB 查询计划回归检查
+
+在临时数据库上调用 SimpleScriptDB 的每个公开方法，用 trace 回调记录实际执行的 SQL（读连接和写线程的连接），
+逐条执行 EXPLAIN QUERY PLAN。出现以下情况且不在 ALLOWED 白名单中时视为回归，退出码为 1：
+
+    SCAN <表>                       全表或全索引扫描（FTS5 虚拟表和部分索引不算，部分索引只收录满足条件的行）
+    USE TEMP B-TREE FOR ORDER BY    排序没有用上索引
+
+触发器和外键级联中的查询不会出现在 trace 里，单独列在 EXTRA_QUERIES 中检查。
+
+用法（在 api/ 目录下运行）:
+    python benchmarks/check_query_plans.py            # 只输出问题
+    python benchmarks/check_query_plans.py --verbose  # 输出每条语句的查询计划
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from simple_db import SimpleScriptDB, _CHARACTERS_TEXT_SQL  # noqa: E402
+
+CHARACTERS_JSON = Path(__file__).resolve().parent.parent.parent / "web" / "src" / "characters.json"
+
+# 有意为之的扫描/排序：{调用标签: {允许出现的计划项正则}}
+ALLOWED = {
+    # 读取全部剧本和角色，本来就要读整张表，按索引顺序读出以免排序
+    "get_all_scripts": {r"^SCAN scripts USING INDEX idx_scripts_updated_at_id$",
+                        r"^SCAN characters USING INDEX sqlite_autoindex_characters_1$"},
+    # 第一页按索引顺序读，读够 LIMIT 行就停
+    "list_script_summaries": {r"^SCAN scripts USING INDEX idx_scripts_updated_at_id$"},
+    # 相关度在查询时计算，只能临时排序
+    "search (fts)": {r"^USE TEMP B-TREE FOR ORDER BY"},
+    "search (like)": {r"^USE TEMP B-TREE FOR ORDER BY"},
+    # 不带条件时按主键顺序读出全部角色
+    "find_characters (all)": {r"^SCAN c USING INDEX sqlite_autoindex_characters_1$"},
+    # 图片垃圾回收需要全部引用
+    "referenced_images": {r"^SCAN scripts$", r"^SCAN evidences$"},
+}
+
+# trace 看不到的查询：触发器里的角色子查询和变更记录、外键级联删除时查找子行
+EXTRA_QUERIES = [
+    ("trigger scripts_fts characters",
+     f"SELECT {_CHARACTERS_TEXT_SQL.format(src='scripts')} FROM scripts WHERE id = 'plan-0'"),
+    ("fk cascade evidences", "SELECT 1 FROM evidences WHERE script_id = 'plan-0'"),
+    ("fk cascade characters", "SELECT 1 FROM characters WHERE script_id = 'plan-0'"),
+    ("trigger changes", "SELECT 1 FROM changes WHERE entity = 'script' AND entity_id = 'plan-0'"),
+]
+
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!.*VIRTUAL TABLE)")
+_INDEX_SCAN = re.compile(r"USING (?:COVERING )?INDEX (\S+)")
+_TEMP_SORT = re.compile(r"^USE TEMP B-TREE FOR (ORDER BY|RIGHT PART OF ORDER BY)")
+_CHECKED_STATEMENTS = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+# 连接第一次用到全文索引时 FTS5 会读取自己的 _config 表，不是我们的语句
+_FTS_INTERNAL = re.compile(r"_fts_config'?\s*$")
+
+
+def seed(db: SimpleScriptDB, scripts: int):
+    with open(CHARACTERS_JSON, "r", encoding="utf-8") as f:
+        sample = json.load(f)
+    # 每个剧本一个凶手、一个没有头像的角色，和真实数据一样标记列的取值很稀疏
+    characters = [dict(character) for character in sample["characters"]]
+    characters[0]["isKiller"] = True
+    characters[-1]["image"] = None
+    for i in range(scripts):
+        db.save_script({
+            "id": f"plan-{i}", "title": f"剧本 {i}", "globalStory": sample["globalStory"],
+            "characters": characters, "updatedAt": f"2024-01-01T00:00:{i:02d}",
+        })
+        for j in range(5):
+            db.save_evidence({"id": f"plan-{i}-{j}", "scriptId": f"plan-{i}", "name": f"证物 {j}",
+                              "clues": "雨夜的脚印", "createdAt": f"2024-01-01T00:00:{j:02d}"})
+    # 让查询规划器拿到真实的统计信息
+    with db._connect() as conn:
+        conn.execute("ANALYZE")
+
+
+def capture(db: SimpleScriptDB) -> List[Tuple[str, str]]:
+    """依次调用公开方法，返回 (调用标签, SQL)"""
+    first = db.list_script_summaries(limit=2)
+    statements: List[Tuple[str, str]] = []
+    label = [""]
+    trace = lambda sql: statements.append((label[0], sql))  # noqa: E731
+    conn = db._connections.get()
+    conn.set_trace_callback(trace)
+    # 写操作在写线程的连接上执行，同样记录
+    db._write(lambda write_conn: write_conn.set_trace_callback(trace))
+
+    calls = [
+        ("save_script", lambda: db.save_script({"id": "plan-0", "title": "剧本 0", "characters": [{"name": "甲"}]})),
+        ("save_evidence", lambda: db.save_evidence({"id": "plan-0-0", "scriptId": "plan-0", "name": "证物"})),
+        ("save_scripts_bulk", lambda: list(db.save_scripts_bulk([
+            {"id": "plan-3", "title": "剧本 3", "characters": [{"name": "乙"}],
+             "evidences": [{"id": "plan-3-0", "name": "证物"}]},
+        ]))),
+        ("get_all_scripts", db.get_all_scripts),
+        ("get_script", lambda: db.get_script("plan-1")),
+        ("get_script_version", lambda: db.get_script_version("plan-1")),
+        ("get_evidences_version", lambda: db.get_evidences_version("plan-1")),
+        ("get_library_version", db.get_library_version),
+        ("list_script_summaries", lambda: db.list_script_summaries(limit=2)),
+        ("list_script_summaries (cursor)", lambda: db.list_script_summaries(limit=2, cursor=first["next_cursor"])),
+        ("find_characters (all)", lambda: db.find_characters()),
+        ("find_characters (script)", lambda: db.find_characters(script_id="plan-1")),
+        ("find_characters (flag)", lambda: db.find_characters(flag="isKiller")),
+        ("find_characters (missing avatar)", lambda: db.find_characters(missing_avatar=True)),
+        ("find_characters (name)", lambda: db.find_characters(name="甲")),
+        ("find_characters (role_type)", lambda: db.find_characters(role_type="凶手")),
+        ("search (fts)", lambda: db.search("雨夜的")),
+        ("search (like)", lambda: db.search("脚印")),
+        ("get_evidences_by_script", lambda: db.get_evidences_by_script("plan-1")),
+        ("referenced_images", db.referenced_images),
+        ("get_changes", lambda: db.get_changes(since=10, limit=5)),
+        ("delete_evidence", lambda: db.delete_evidence("plan-1-0")),
+        ("delete_script", lambda: db.delete_script("plan-2")),
+    ]
+    for name, call in calls:
+        label[0] = name
+        call()
+    conn.set_trace_callback(None)
+    db._write(lambda write_conn: write_conn.set_trace_callback(None))
+    return [(name, sql) for name, sql in statements
+            if _CHECKED_STATEMENTS.match(sql) and not _FTS_INTERNAL.search(sql)]
+
+
+def explain(db: SimpleScriptDB, sql: str) -> List[str]:
+    with db._connect() as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def partial_indexes(db: SimpleScriptDB) -> Set[str]:
+    with db._connect() as conn:
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")
+        return {row[0] for row in rows}
+
+
+def problems_in(label: str, plan: List[str], partial: Set[str]) -> List[str]:
+    allowed = [re.compile(pattern) for pattern in ALLOWED.get(label, ())]
+    problems = []
+    for detail in plan:
+        detail = detail.strip()
+        if not (_FULL_SCAN.match(detail) or _TEMP_SORT.match(detail)):
+            continue
+        index = _INDEX_SCAN.search(detail)
+        if _FULL_SCAN.match(detail) and index and index.group(1) in partial:
+            continue
+        if any(pattern.search(detail) for pattern in allowed):
+            continue
+        problems.append(detail)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleScriptDB 查询计划回归检查")
+    parser.add_argument("--scripts", type=int, default=20, help="预置剧本数")
+    parser.add_argument("--verbose", action="store_true", help="输出每条语句的查询计划")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="check_query_plans_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = SimpleScriptDB(os.path.join(tmpdir, "plans.db"))
+            seed(db, args.scripts)
+            statements = capture(db)
+
+        partial = partial_indexes(db)
+        seen = set()
+        failures: Dict[str, List[str]] = {}
+        checked = 0
+        for label, sql in statements + EXTRA_QUERIES:
+            if (label, sql) in seen:
+                continue
+            seen.add((label, sql))
+            plan = explain(db, sql)
+            checked += 1
+            problems = problems_in(label, plan, partial)
+            if args.verbose or problems:
+                print(f"{'❌' if problems else '✅'} [{label}] {' '.join(sql.split())[:120]}")
+                for detail in plan:
+                    print(f"      {detail}")
+            if problems:
+                failures.setdefault(label, []).extend(problems)
+        db.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if failures:
+        print(f"\n❌ {len(failures)} 个调用出现未允许的全表扫描或临时排序:")
+        for label, problems in failures.items():
+            print(f"   {label}: {'; '.join(problems)}")
+        sys.exit(1)
+    print(f"✅ 已检查 {checked} 条语句，没有未允许的全表扫描或临时排序")
+
+
+if __name__ == "__main__":
+    main()
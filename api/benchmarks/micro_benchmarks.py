@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+API 中 CPU 密集路径的微基准（asv 风格：每个 *Suite 类的 setup() 准备数据，time_* 方法是被计时的操作）
+
+结果按提交保存为 JSON，便于在两次提交之间比较是否退化。
+
+用法（在 api/ 目录下运行）:
+    python benchmarks/micro_benchmarks.py                      # 运行全部，写入 benchmarks/results/<commit>.json
+    python benchmarks/micro_benchmarks.py -k prompt -k sse     # 只运行名称包含关键字的基准
+    python benchmarks/micro_benchmarks.py --compare benchmarks/results/abc1234.json benchmarks/results/def5678.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+CHARACTERS_JSON = API_DIR.parent / "web" / "src" / "characters.json"
+DOCS_DIR = API_DIR.parent / "docs"
+
+sys.path.insert(0, str(API_DIR))
+
+
+def load_sample_script(story_repeat: int = 1, extra_characters: int = 0):
+    """以 characters.json 为模板构造剧本，按需放大故事长度和角色数量"""
+    with open(CHARACTERS_JSON, "r", encoding="utf-8") as f:
+        script = json.load(f)
+    characters = list(script["characters"])
+    for i in range(extra_characters):
+        template = characters[i % len(script["characters"])]
+        characters.append(dict(template, name=f"{template['name']}{i}"))
+    return {
+        "globalStory": "\n".join([script["globalStory"]] * story_repeat),
+        "characters": characters,
+    }
+
+
+def build_invocation_request(script, partner: bool):
+    from invoke_types import InvocationRequest, Actor, SafeActor, LLMMessage
+
+    character = next((c for c in script["characters"] if c.get("isPartner") == partner), script["characters"][0])
+    actor = Actor(
+        name=character["name"], bio=character.get("bio", ""), personality=character.get("personality", ""),
+        context=character.get("context", ""), secret=character.get("secret", ""),
+        violation=character.get("violation", ""), isPartner=partner, isAssistant=partner,
+        messages=[LLMMessage(role="user", content="你那天晚上在哪里？")],
+    )
+    all_actors = [SafeActor(name=c["name"], bio=c.get("bio", ""), personality=c.get("personality", ""),
+                            context=c.get("context", ""), messages=[], roleType=c.get("roleType"))
+                  for c in script["characters"]]
+    return InvocationRequest(global_story=script["globalStory"], actor=actor, session_id="bench",
+                             character_file_version="bench", all_actors=all_actors)
+
+
+# ===== 提示词构造 =====
+
+class SystemPromptSuite:
+    def setup(self):
+        from llm_service import get_system_prompt
+        self.get_system_prompt = get_system_prompt
+        script = load_sample_script(story_repeat=20, extra_characters=40)
+        self.suspect_request = build_invocation_request(script, partner=False)
+        self.partner_request = build_invocation_request(script, partner=True)
+
+    def time_get_system_prompt_suspect(self):
+        self.get_system_prompt(self.suspect_request)
+
+    def time_get_system_prompt_partner_large_script(self):
+        self.get_system_prompt(self.partner_request)
+
+
+class CharacterNamesSuite:
+    def setup(self):
+        from llm_service import extract_character_names_from_story
+        self.extract = extract_character_names_from_story
+        script = load_sample_script(story_repeat=20, extra_characters=200)
+        self.story = script["globalStory"]
+        self.actors = build_invocation_request(script, partner=True).all_actors
+
+    def time_extract_character_names_from_story(self):
+        self.extract(self.story, self.actors)
+
+
+class BackgroundPromptSuite:
+    def setup(self):
+        from llm_service import generate_character_background_prompt
+        self.generate = generate_character_background_prompt
+        script = load_sample_script()
+        self.actors = [build_invocation_request({"globalStory": "", "characters": [c]}, partner=False).actor
+                       for c in script["characters"]]
+
+    def time_generate_character_background_prompt(self):
+        for actor in self.actors:
+            self.generate(actor)
+
+
+# ===== 数据库与序列化 =====
+
+class SimpleDBListSuite:
+    number = 1
+    repeat = 3
+
+    def setup(self):
+        from simple_db import SimpleScriptDB
+        self.tmpdir = tempfile.mkdtemp(prefix="bench_simple_db_")
+        self.db = SimpleScriptDB(os.path.join(self.tmpdir, "bench.db"))
+        script = load_sample_script()
+        quiz_json = json.dumps([{"question": "谁是凶手？", "choices": ["甲", "乙", "丙"], "correctAnswer": "甲"}],
+                               ensure_ascii=False)
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        rows = [(f"bench-{i}", f"剧本 {i}", "基准测试剧本", "bench", "1.0.0", base.isoformat(),
+                 (base + timedelta(minutes=i)).isoformat(), script["globalStory"], "manual", None, None,
+                 "{}", quiz_json) for i in range(10_000)]
+        with self.db._connect() as conn:
+            # 角色先于剧本行写入，与 save_script 的顺序一致（全文索引触发器读取角色表）
+            for row in rows:
+                self.db._write_characters(conn, row[0], script["characters"])
+            conn.executemany(
+                "INSERT INTO scripts (id, title, description, author, version, created_at, updated_at, global_story, "
+                "source_type, cover_image_path, cover_image_filename, settings_json, quiz_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def time_get_all_scripts_10k(self):
+        self.db.get_all_scripts()
+
+
+class ScriptToDictSuite:
+    def setup(self):
+        from models import Script, Character, QuizQuestion, ScriptEvidence, script_to_dict
+        self.script_to_dict = script_to_dict
+        script = load_sample_script(extra_characters=8)
+        self.script = Script(
+            id="bench", title="基准剧本", description="", author="bench", version="1.0.0",
+            created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1), global_story=script["globalStory"],
+            source_type="manual", cover_image_filename="cover.png",
+            characters=[Character(name=c["name"], bio=c.get("bio"), personality=c.get("personality"),
+                                  context=c.get("context"), secret=c.get("secret"), violation=c.get("violation"),
+                                  image_filename=c.get("image"), is_partner=c.get("isPartner", False))
+                        for c in script["characters"]],
+            quiz_questions=[QuizQuestion(question=f"问题 {i}", choices=json.dumps(["甲", "乙", "丙", "丁"]),
+                                         correct_answer="甲", order_index=i) for i in range(10)],
+            script_evidences=[ScriptEvidence(id=f"ev-{i}", name=f"证物 {i}", description="一把沾血的钥匙",
+                                             related_characters=json.dumps(["甲", "乙"])) for i in range(30)],
+        )
+
+        import fast_json
+        from versioned_cache import VersionedCache
+        self.cache = VersionedCache(16)
+        self.cache.read_through("bench", (1,), lambda: fast_json.dumps_bytes(script_to_dict(self.script)))
+
+    def time_script_to_dict(self):
+        self.script_to_dict(self.script)
+
+    def time_script_response_uncached(self):
+        # 缓存之前的详情接口：每次组装字典，再整体编码
+        json.dumps({"success": True, "script": self.script_to_dict(self.script)}, ensure_ascii=False).encode("utf-8")
+
+    def time_script_response_cached(self):
+        # 版本号命中缓存：只拼接响应外壳（同 http_cache.success_body）
+        b'{"success":true,"script":' + self.cache.read_through("bench", (1,), lambda: None) + b'}'
+
+
+class EvidenceStatsSuite:
+    def setup(self):
+        from evidence_api import calculate_evidence_stats
+        from evidence_models import EvidenceRecord
+        self.calculate = calculate_evidence_stats
+        categories = ["physical", "document", "digital", "testimony", "combination"]
+        states = ["hidden", "surface", "investigated", "analyzed"]
+        importances = ["low", "medium", "high", "critical"]
+        base = datetime(2024, 1, 1)
+        self.evidences = [EvidenceRecord(
+            id=f"ev-{i}", script_id="bench", session_id="bench", name=f"证物 {i}", basic_description="描述",
+            category=categories[i % 5], discovery_state=states[i % 4], unlock_level=i % 3 + 1,
+            importance=importances[i % 4], is_new=i % 7 == 0,
+            discovered_at=base + timedelta(minutes=i) if i % 3 else None,
+        ) for i in range(500)]
+
+    def time_calculate_evidence_stats_500(self):
+        self.calculate(self.evidences)
+
+
+class PotentialEvidencesSuite:
+    def setup(self):
+        from evidence_llm_service import extract_potential_evidences
+        self.extract = extract_potential_evidences
+        self.text = ("（她看了一眼那个信封）这个钥匙我从来没见过，一个陌生人把照片和手机都放在了桌上。"
+                     "那把刀就在文件柜旁边，我还以为是谁的玩具枪。") * 20
+
+    def time_extract_potential_evidences(self):
+        self.extract(self.text)
+
+
+# ===== 响应编码与渲染 =====
+
+class JSONCodecSuite:
+    """characters.json 剧本（放大故事和角色数）的编码、解码：标准库 json 与 fast_json（orjson）对比"""
+
+    def setup(self):
+        import fast_json
+        self.fast_json = fast_json
+        self.script = load_sample_script(story_repeat=10, extra_characters=20)
+        self.text = json.dumps(self.script, ensure_ascii=False)
+        self.raw = self.text.encode("utf-8")
+        # 数据库里的小 JSON 列：每个角色一份 data_json
+        self.small_texts = [json.dumps(c, ensure_ascii=False) for c in self.script["characters"]]
+
+    def time_stdlib_dumps(self):
+        json.dumps(self.script, ensure_ascii=False).encode("utf-8")
+
+    def time_fast_json_dumps(self):
+        self.fast_json.dumps_bytes(self.script)
+
+    def time_stdlib_loads(self):
+        json.loads(self.text)
+
+    def time_fast_json_loads_bytes(self):
+        self.fast_json.loads(self.raw)
+
+    def time_fast_json_loads_str(self):
+        self.fast_json.loads(self.text)
+
+    def time_stdlib_loads_small(self):
+        for text in self.small_texts:
+            json.loads(text)
+
+    def time_fast_json_loads_small(self):
+        for text in self.small_texts:
+            self.fast_json.loads(text)
+
+
+class CompressionSuite:
+    """剧本详情响应体（约 130KB）的 gzip 压缩：每次现压与按 ETag 缓存的压缩版本"""
+
+    def setup(self):
+        import compression
+        self.compression = compression
+        self.body = json.dumps({"success": True, "script": load_sample_script(story_repeat=10, extra_characters=20)},
+                               ensure_ascii=False).encode("utf-8")
+        self.middleware = compression.CompressionMiddleware(app=None)
+        self.scope = {"path": "/api/scripts/bench", "query_string": b""}
+        self.middleware._compress(self.scope, 200, '"v1"', "gzip", self.body)
+
+    def time_gzip_dynamic(self):
+        self.compression.compress("gzip", self.body)
+
+    def time_gzip_cached_variant(self):
+        self.middleware._compress(self.scope, 200, '"v1"', "gzip", self.body)
+
+
+class SSEEncodingSuite:
+    def setup(self):
+        from sse_utils import sse_chunk, sse_end
+        self.sse_chunk = sse_chunk
+        self.sse_end = sse_end
+        text = load_sample_script()["globalStory"][:600]
+        self.chunks = [text[i:i + 2] for i in range(0, len(text), 2)]
+
+    def time_encode_stream_300_chunks(self):
+        for chunk in self.chunks:
+            self.sse_chunk(chunk)
+        self.sse_end()
+
+
+class DocRenderSuite:
+    number = 5
+
+    def setup(self):
+        from docs_renderer import render_doc_page
+        self.render = render_doc_page
+        docs = sorted(DOCS_DIR.glob("*.md"), key=lambda p: p.stat().st_size, reverse=True)
+        if docs:
+            self.doc_name = docs[0].name
+            self.content = docs[0].read_text(encoding="utf-8")
+        else:
+            self.doc_name = "README.md"
+            self.content = (API_DIR.parent / "README.md").read_text(encoding="utf-8")
+
+    def time_render_largest_doc(self):
+        self.render(self.doc_name, self.content)
+
+
+SUITES = [
+    SystemPromptSuite, CharacterNamesSuite, BackgroundPromptSuite, SimpleDBListSuite, ScriptToDictSuite,
+    EvidenceStatsSuite, PotentialEvidencesSuite, JSONCodecSuite, CompressionSuite, SSEEncodingSuite, DocRenderSuite,
+]
+
+
+# ===== 运行与比较 =====
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_suite(suite_cls, keywords, default_repeat):
+    methods = [name for name in dir(suite_cls) if name.startswith("time_")]
+    selected = [name for name in methods
+                if not keywords or any(k in f"{suite_cls.__name__}.{name}".lower() for k in keywords)]
+    if not selected:
+        return {}
+
+    suite = suite_cls()
+    results = {}
+    try:
+        # 被测函数里有调试 print，计时期间丢弃标准输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            suite.setup()
+    except ImportError as e:
+        print(f"⏭️ 跳过 {suite_cls.__name__}: 缺少依赖 {e.name}")
+        return {}
+
+    try:
+        for name in selected:
+            func = getattr(suite, name)
+            timer = timeit.Timer(func)
+            with contextlib.redirect_stdout(io.StringIO()):
+                number = getattr(suite_cls, "number", None) or timer.autorange()[0]
+                samples = [t / number for t in timer.repeat(repeat=getattr(suite_cls, "repeat", default_repeat),
+                                                            number=number)]
+            key = f"{suite_cls.__name__}.{name}"
+            results[key] = {
+                "min_s": min(samples),
+                "median_s": statistics.median(samples),
+                "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+                "number": number,
+                "repeat": len(samples),
+            }
+            print(f"   {key:<65} {format_duration(results[key]['median_s']):>12}")
+    finally:
+        if hasattr(suite, "teardown"):
+            suite.teardown()
+    return results
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
+
+
+def compare(before_path, after_path, threshold):
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"📊 {before.get('commit')} -> {after.get('commit')}（中位数，变化超过 {threshold:.0%} 标记）")
+    regressions = 0
+    for key in sorted(set(before["benchmarks"]) | set(after["benchmarks"])):
+        old = before["benchmarks"].get(key)
+        new = after["benchmarks"].get(key)
+        if not old or not new:
+            print(f"   {key:<65} {'(仅一侧存在)':>12}")
+            continue
+        ratio = new["median_s"] / old["median_s"] if old["median_s"] else 1.0
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "❌ 变慢"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            mark = "✅ 变快"
+        print(f"   {key:<65} {format_duration(old['median_s']):>12} -> {format_duration(new['median_s']):>12}"
+              f"  x{ratio:.2f} {mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 微基准")
+    parser.add_argument("-k", dest="keywords", action="append", default=[], help="只运行名称包含该关键字的基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个基准重复的轮数")
+    parser.add_argument("--output", help="结果文件，默认 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="比较两次结果")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定退化的相对变化")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    commit = git_commit()
+    keywords = [k.lower() for k in args.keywords]
+    print(f"🚀 运行微基准（commit {commit}）")
+    benchmarks = {}
+    for suite_cls in SUITES:
+        benchmarks.update(run_suite(suite_cls, keywords, args.repeat))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "benchmarks": benchmarks,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+本地模拟 LLM 服务（OpenAI 兼容接口），用于压测时替代真实模型
+
+按设定的首 token 延迟和 token 速率输出内容，支持流式和非流式两种调用。
+批评阶段（系统提示词要求返回 "NONE!"）按 --violation-rate 的概率返回违规批评，用于覆盖修订路径。
+
+用法:
+    python benchmarks/mock_llm_server.py --port 11500 --tokens-per-sec 40 --ttft-ms 400
+    # 然后以 INFERENCE_SERVICE=openai OPENAI_API_BASE=http://127.0.0.1:11500/v1 启动后端
+
+只压测本服务、不关心 OpenAI 客户端和网络开销时，可以直接用内置的 INFERENCE_SERVICE=mock（见 mock_llm.py）。
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mock_llm import SAMPLE_SENTENCES, VIOLATION_CRITIQUE, NO_VIOLATION_CRITIQUE  # noqa: E402
+
+config = argparse.Namespace(tokens_per_sec=40.0, ttft_ms=400.0, response_tokens=120, violation_rate=0.2, seed=None)
+rng = random.Random()
+app = FastAPI()
+
+
+def is_critique_request(messages):
+    system_prompt = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    return "NONE!" in system_prompt
+
+
+def build_tokens(messages):
+    """按字符切分作为 token（中文一个字约等于一个 token）"""
+    if is_critique_request(messages):
+        text = VIOLATION_CRITIQUE if rng.random() < config.violation_rate else NO_VIOLATION_CRITIQUE
+        return list(text) if text != NO_VIOLATION_CRITIQUE else [NO_VIOLATION_CRITIQUE]
+    text = ""
+    while len(text) < config.response_tokens:
+        text += rng.choice(SAMPLE_SENTENCES)
+    return list(text[:config.response_tokens])
+
+
+def usage_for(messages, tokens):
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "mock")
+    tokens = build_tokens(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+    token_interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+    if not body.get("stream"):
+        await asyncio.sleep(config.ttft_ms / 1000 + token_interval * len(tokens))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(tokens)}}],
+            "usage": usage_for(messages, tokens),
+        })
+
+    async def event_stream():
+        await asyncio.sleep(config.ttft_ms / 1000)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(token_interval)
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        done = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 LLM 服务（OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0, help="输出速率")
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="首 token 延迟（毫秒）")
+    parser.add_argument("--response-tokens", type=int, default=120, help="每次回复的 token 数")
+    parser.add_argument("--violation-rate", type=float, default=0.2, help="批评阶段返回违规的概率")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    args = parser.parse_args()
+
+    vars(config).update(vars(args))
+    rng.seed(args.seed)
+    print(f"🤖 模拟 LLM 服务: http://{args.host}:{args.port}/v1 "
+          f"(TTFT {args.ttft_ms}ms, {args.tokens_per_sec} tokens/s, 违规率 {args.violation_rate})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+ORM 路由（database_api / spoiler_story_api / evidence_api）在并发读下的吞吐，以及对同一 worker 上其他请求的影响
+
+读请求并发打 ORM 接口的同时，探测线程按固定间隔请求 --probe-path（默认 /health）。
+同步 Session 会在查询期间阻塞事件循环，探测请求的延迟随之上升；换成 AsyncSession 后探测延迟应基本不受读压力影响。
+
+示例（先按线上方式启动 8 个 worker: ./run.sh）:
+    python benchmarks/orm_concurrency.py --script-id demo --concurrency 32 --duration 20 --output before.json
+    python benchmarks/orm_concurrency.py --script-id demo --concurrency 32 --duration 20 --baseline before.json
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.error_samples = []
+
+    def ok(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def fail(self, message):
+        with self.lock:
+            self.errors += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(message)
+
+
+def timed_get(session: requests.Session, url: str, recorder: Recorder, timeout: float):
+    start = time.perf_counter()
+    try:
+        response = session.get(url, timeout=timeout)
+        if response.status_code >= 400:
+            recorder.fail(f"{url} -> HTTP {response.status_code}")
+            return
+        response.content
+        recorder.ok(time.perf_counter() - start)
+    except requests.RequestException as e:
+        recorder.fail(f"{url} -> {e}")
+
+
+def read_paths(script_id: str):
+    return [
+        "/db/orm/scripts/list",
+        f"/db/orm/scripts/{script_id}",
+        f"/db/orm/evidences/{script_id}",
+        f"/db/spoiler-stories/{script_id}",
+    ]
+
+
+def run(args):
+    paths = read_paths(args.script_id) + list(args.extra_path or [])
+    reads = Recorder()
+    probe = Recorder()
+    deadline = time.perf_counter() + args.duration
+    local = threading.local()
+
+    def http():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def reader(worker_index):
+        i = worker_index
+        while time.perf_counter() < deadline:
+            timed_get(http(), args.base_url + paths[i % len(paths)], reads, args.timeout)
+            i += 1
+
+    def prober():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            timed_get(session, args.base_url + args.probe_path, probe, args.timeout)
+            time.sleep(args.probe_interval)
+
+    probe_thread = threading.Thread(target=prober, daemon=True)
+    start = time.perf_counter()
+    probe_thread.start()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(reader, range(args.concurrency)))
+    probe_thread.join()
+    elapsed = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    def latency(recorder):
+        return {
+            "mean": ms(statistics.mean(recorder.latencies)) if recorder.latencies else None,
+            "p50": ms(percentile(recorder.latencies, 50)),
+            "p95": ms(percentile(recorder.latencies, 95)),
+            "p99": ms(percentile(recorder.latencies, 99)),
+        }
+
+    return {
+        "paths": paths,
+        "probe_path": args.probe_path,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "requests": len(reads.latencies) + reads.errors,
+        "errors": reads.errors,
+        "throughput_rps": round(len(reads.latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": latency(reads),
+        "probe_requests": len(probe.latencies) + probe.errors,
+        "probe_errors": probe.errors,
+        "probe_latency_ms": latency(probe),
+        "error_samples": reads.error_samples + probe.error_samples,
+    }
+
+
+def print_report(result, baseline=None):
+    print("\n📊 ORM 并发读结果")
+    print(f"   并发: {result['concurrency']}  请求: {result['requests']}  失败: {result['errors']}  耗时: {result['elapsed_s']}s")
+    print(f"   吞吐: {result['throughput_rps']} req/s")
+
+    def line(label, section, key):
+        value = result[section][key]
+        text = f"   {label:<14}{value if value is not None else '-':>10} ms"
+        if baseline and baseline.get(section, {}).get(key) and value is not None:
+            before = baseline[section][key]
+            text += f"   (基线 {before} ms, {(value - before) / before * 100:+.1f}%)"
+        print(text)
+
+    for key in ("p50", "p95", "p99"):
+        line(f"读延迟 {key}", "latency_ms", key)
+    for key in ("p50", "p95", "p99"):
+        line(f"探测延迟 {key}", "probe_latency_ms", key)
+    if baseline:
+        before = baseline.get("throughput_rps") or 0
+        if before:
+            print(f"   吞吐相对基线: {(result['throughput_rps'] - before) / before * 100:+.1f}%")
+    for sample in result["error_samples"]:
+        print(f"   ❌ {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发读取 ORM 路由，同时测量事件循环的响应延迟")
+    parser.add_argument("--base-url", default="http://127.0.0.1:10000")
+    parser.add_argument("--script-id", required=True, help="已存在于 ORM 数据库中的剧本 ID")
+    parser.add_argument("--extra-path", action="append", help="额外加入轮询的 GET 路径，可重复")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="压测秒数")
+    parser.add_argument("--probe-path", default="/health")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="把结果写入 JSON 文件，作为之后的基线")
+    parser.add_argument("--baseline", help="与之前的结果 JSON 对比")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.concurrency} 并发读取 {args.base_url}，持续 {args.duration}s...")
+    result = run(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
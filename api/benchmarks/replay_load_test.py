@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+按 conversation_turns 中记录的真实会话回放 /invoke 和 /invoke/stream，统计吞吐和延迟
+
+会话来源:
+    --db-url       直接从 PostgreSQL 的 conversation_turns 读取（默认取 DB_CONN_URL）
+    --input        读取之前用 --export 导出的 JSONL 文件（每行一个轮次）
+
+角色的背景、性格等字段不在 conversation_turns 中，按 actor_name 从 --characters 指定的剧本文件补全
+（默认 web/src/characters.json），找不到的角色使用该剧本的第一个角色作为模板。
+
+示例:
+    # 1. 启动模拟 LLM 服务，并让后端指向它
+    python benchmarks/mock_llm_server.py --port 11500 --seed 1
+    INFERENCE_SERVICE=openai OPENAI_API_BASE=http://127.0.0.1:11500/v1 ./run.sh
+    # 2. 导出一次线上会话，之后反复回放同一份数据
+    python benchmarks/replay_load_test.py --export turns.jsonl --limit 2000
+    python benchmarks/replay_load_test.py --input turns.jsonl --concurrency 16 --rate 5 --output after.json --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+API_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CHARACTERS = API_DIR.parent / "web" / "src" / "characters.json"
+
+
+# ===== 会话加载 =====
+
+def load_turns_from_db(db_url: str, limit: int):
+    import psycopg
+
+    with psycopg.connect(db_url) as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT session_id, character_file_version, actor_name, chat_messages, created_at "
+            "FROM conversation_turns ORDER BY created_at DESC LIMIT %s",
+            (limit,)
+        )
+        rows = cur.fetchall()
+    turns = [{
+        "session_id": row[0],
+        "character_file_version": row[1],
+        "actor_name": row[2],
+        "chat_messages": row[3] if isinstance(row[3], list) else json.loads(row[3]),
+        "created_at": row[4].isoformat() if row[4] else None,
+    } for row in rows]
+    turns.reverse()
+    return turns
+
+
+def load_turns_from_file(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def group_sessions(turns):
+    """按 session_id 分组，组内保持记录时间顺序"""
+    sessions = defaultdict(list)
+    for turn in turns:
+        sessions[turn["session_id"]].append(turn)
+    return list(sessions.values())
+
+
+def build_requests_factory(characters_path: Path):
+    with open(characters_path, "r", encoding="utf-8") as f:
+        script = json.load(f)
+    characters = {c["name"]: c for c in script.get("characters", [])}
+    template = next(iter(characters.values()))
+    all_actors = [{
+        "name": c["name"], "bio": c.get("bio", ""), "personality": c.get("personality", ""),
+        "context": c.get("context", ""), "messages": [], "isAssistant": c.get("isAssistant", False),
+        "isPartner": c.get("isPartner", False), "roleType": c.get("roleType"),
+    } for c in characters.values()]
+
+    def build(turn):
+        character = characters.get(turn["actor_name"], template)
+        return {
+            "global_story": script.get("globalStory", ""),
+            "session_id": f"replay-{turn['session_id']}",
+            "character_file_version": turn.get("character_file_version") or script.get("fileKey", "replay"),
+            "actor": {
+                "name": turn["actor_name"],
+                "bio": character.get("bio", ""),
+                "personality": character.get("personality", ""),
+                "context": character.get("context", ""),
+                "secret": character.get("secret", ""),
+                "violation": character.get("violation", ""),
+                "messages": turn["chat_messages"],
+                "isAssistant": character.get("isAssistant", False),
+                "isPartner": character.get("isPartner", False),
+                "roleType": character.get("roleType"),
+            },
+            "all_actors": all_actors,
+        }
+
+    return build
+
+
+# ===== 请求执行 =====
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.ttfts = []
+        self.errors = 0
+        self.error_samples = []
+
+    def ok(self, latency, ttft=None):
+        with self.lock:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.ttfts.append(ttft)
+
+    def fail(self, message):
+        with self.lock:
+            self.errors += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(message)
+
+
+def send_invoke(session: requests.Session, base_url: str, payload, recorder: Recorder, timeout: float):
+    start = time.perf_counter()
+    try:
+        response = session.post(f"{base_url}/invoke", json=payload, timeout=timeout)
+        response.raise_for_status()
+        response.json()
+        latency = time.perf_counter() - start
+        # 非流式接口一次性返回，首字节时间就是完整延迟
+        recorder.ok(latency, latency)
+    except Exception as e:
+        recorder.fail(str(e))
+
+
+def send_invoke_stream(session: requests.Session, base_url: str, payload, recorder: Recorder, timeout: float):
+    start = time.perf_counter()
+    ttft = None
+    try:
+        with session.post(f"{base_url}/invoke/stream", json=payload, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                if event.get("type") == "chunk" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif event.get("type") == "error":
+                    raise RuntimeError(event.get("message"))
+                elif event.get("type") == "end":
+                    break
+        recorder.ok(time.perf_counter() - start, ttft)
+    except Exception as e:
+        recorder.fail(str(e))
+
+
+def run_closed_loop(sessions, build, send, base_url, concurrency, timeout, recorder):
+    """固定并发：每个 worker 依次回放一整个会话的所有轮次"""
+    queue = list(sessions)
+    queue_lock = threading.Lock()
+
+    def worker():
+        http = requests.Session()
+        while True:
+            with queue_lock:
+                if not queue:
+                    return
+                turns = queue.pop(0)
+            for turn in turns:
+                send(http, base_url, build(turn), recorder, timeout)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+
+
+def run_open_loop(sessions, build, send, base_url, concurrency, rate, timeout, recorder, seed):
+    """固定到达率：按泊松过程发出请求，并发上限为 concurrency"""
+    rng = random.Random(seed)
+    turns = [turn for session in sessions for turn in session]
+    local = threading.local()
+
+    def task(turn):
+        if not hasattr(local, "http"):
+            local.http = requests.Session()
+        send(local.http, base_url, build(turn), recorder, timeout)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        next_at = time.perf_counter()
+        for turn in turns:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, turn)
+            next_at += rng.expovariate(rate)
+
+
+# ===== 报告 =====
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(recorder: Recorder, elapsed: float, args):
+    total = len(recorder.latencies) + recorder.errors
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "endpoint": "/invoke/stream" if args.stream else "/invoke",
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "requests": total,
+        "errors": recorder.errors,
+        "error_rate": round(recorder.errors / total, 4) if total else 0.0,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(recorder.latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": ms(statistics.mean(recorder.latencies)) if recorder.latencies else None,
+            "p50": ms(percentile(recorder.latencies, 50)),
+            "p95": ms(percentile(recorder.latencies, 95)),
+            "p99": ms(percentile(recorder.latencies, 99)),
+        },
+        "ttft_ms": {
+            "p50": ms(percentile(recorder.ttfts, 50)),
+            "p95": ms(percentile(recorder.ttfts, 95)),
+            "p99": ms(percentile(recorder.ttfts, 99)),
+        },
+        "error_samples": recorder.error_samples,
+    }
+
+
+def print_report(result, baseline=None):
+    print("\n📊 回放结果")
+    print(f"   端点: {result['endpoint']}  并发: {result['concurrency']}  到达率: {result['rate'] or '不限'}")
+    print(f"   请求: {result['requests']}  失败: {result['errors']} ({result['error_rate'] * 100:.2f}%)")
+    print(f"   吞吐: {result['throughput_rps']} req/s  耗时: {result['elapsed_s']}s")
+
+    def line(label, section, key):
+        value = result[section][key]
+        text = f"   {label:<12}{value if value is not None else '-':>10} ms"
+        if baseline and baseline.get(section, {}).get(key) and value is not None:
+            before = baseline[section][key]
+            text += f"   (基线 {before} ms, {(value - before) / before * 100:+.1f}%)"
+        print(text)
+
+    for key in ("p50", "p95", "p99"):
+        line(f"延迟 {key}", "latency_ms", key)
+    for key in ("p50", "p95", "p99"):
+        line(f"TTFT {key}", "ttft_ms", key)
+    if baseline:
+        before = baseline.get("throughput_rps") or 0
+        if before:
+            print(f"   吞吐相对基线: {(result['throughput_rps'] - before) / before * 100:+.1f}%")
+    for sample in result["error_samples"]:
+        print(f"   ❌ {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放 conversation_turns 对 /invoke 进行压测")
+    parser.add_argument("--base-url", default="http://127.0.0.1:10000")
+    parser.add_argument("--db-url", default=os.getenv("DB_CONN_URL"), help="PostgreSQL 连接串")
+    parser.add_argument("--input", help="之前导出的 JSONL 轮次文件")
+    parser.add_argument("--export", help="只从数据库导出轮次到 JSONL，不发请求")
+    parser.add_argument("--limit", type=int, default=1000, help="从数据库读取的最近轮次数")
+    parser.add_argument("--characters", default=str(DEFAULT_CHARACTERS), help="补全角色信息的剧本文件")
+    parser.add_argument("--stream", action="store_true", help="回放 /invoke/stream 而不是 /invoke")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="每秒到达请求数，0 表示按并发闭环回放")
+    parser.add_argument("--max-requests", type=int, default=0, help="最多回放的轮次数，0 表示全部")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="把结果写入 JSON 文件，作为之后的基线")
+    parser.add_argument("--baseline", help="与之前的结果 JSON 对比")
+    args = parser.parse_args()
+
+    if args.input:
+        turns = load_turns_from_file(args.input)
+    elif args.db_url:
+        turns = load_turns_from_db(args.db_url, args.limit)
+    else:
+        parser.error("需要 --input 或 --db-url（或设置 DB_CONN_URL）")
+
+    if args.export:
+        with open(args.export, "w", encoding="utf-8") as f:
+            for turn in turns:
+                f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+        print(f"✅ 已导出 {len(turns)} 个轮次: {args.export}")
+        return
+
+    if args.max_requests:
+        turns = turns[:args.max_requests]
+    if not turns:
+        print("❌ 没有可回放的轮次")
+        sys.exit(1)
+
+    sessions = group_sessions(turns)
+    build = build_requests_factory(Path(args.characters))
+    send = send_invoke_stream if args.stream else send_invoke
+    recorder = Recorder()
+
+    print(f"🚀 回放 {len(turns)} 个轮次（{len(sessions)} 个会话）-> {args.base_url}")
+    start = time.perf_counter()
+    if args.rate > 0:
+        run_open_loop(sessions, build, send, args.base_url, args.concurrency, args.rate, args.timeout,
+                      recorder, args.seed)
+    else:
+        run_closed_loop(sessions, build, send, args.base_url, args.concurrency, args.timeout, recorder)
+    result = summarize(recorder, time.perf_counter() - start, args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
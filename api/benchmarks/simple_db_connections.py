@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+对比 SimpleScriptDB 的两种连接方式在读操作上的吞吐（ops/sec）
+
+    per-call   旧实现：每次调用 sqlite3.connect，执行一条语句后关闭
+    pooled     当前实现：线程内复用长连接（WAL、页缓存、mmap、预编译语句缓存）
+
+用法（在 api/ 目录下运行）:
+    python benchmarks/simple_db_connections.py --scripts 200 --duration 3 --threads 1 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from simple_db import SimpleScriptDB  # noqa: E402
+
+CHARACTERS_JSON = Path(__file__).resolve().parent.parent.parent / "web" / "src" / "characters.json"
+
+SELECT_SCRIPT = '''
+    SELECT id, title, description, author, version, created_at, updated_at,
+           global_story, source_type, cover_image_path, cover_image_filename,
+           characters_json, settings_json, quiz_json
+    FROM scripts
+    WHERE id = ?
+'''
+SELECT_ALL = '''
+    SELECT id, title, description, author, version, created_at, updated_at,
+           global_story, source_type, cover_image_path, cover_image_filename,
+           characters_json, settings_json, quiz_json
+    FROM scripts
+    ORDER BY updated_at DESC
+'''
+SELECT_EVIDENCES = '''
+    SELECT id, script_id, name, description, overview, clues, category, image_path,
+           importance, initial_state, related_characters, created_at, updated_at
+    FROM evidences
+    WHERE script_id = ?
+    ORDER BY created_at DESC
+'''
+
+
+def seed(db: SimpleScriptDB, scripts: int):
+    with open(CHARACTERS_JSON, "r", encoding="utf-8") as f:
+        sample = json.load(f)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(scripts):
+            db.save_script({
+                "id": f"bench-{i}", "title": f"剧本 {i}", "globalStory": sample["globalStory"],
+                "characters": sample["characters"], "updatedAt": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+            })
+            for j in range(5):
+                db.save_evidence({"id": f"bench-{i}-{j}", "scriptId": f"bench-{i}", "name": f"证物 {j}",
+                                  "relatedCharacters": ["甲", "乙"]})
+
+
+def per_call_query(db_path: str, sql: str, params=(), fetch_all=True):
+    """复现旧实现的连接方式"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    result = cursor.fetchall() if fetch_all else cursor.fetchone()
+    conn.close()
+    return result
+
+
+def pooled_query(db: SimpleScriptDB, sql: str, params=(), fetch_all=True):
+    with db._connect() as conn:
+        cursor = conn.execute(sql, params)
+        return cursor.fetchall() if fetch_all else cursor.fetchone()
+
+
+def measure(operation, threads: int, duration: float) -> float:
+    """在 threads 个线程中循环执行 operation，返回总 ops/sec"""
+    counts = [0] * threads
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            operation(n)
+            n += 1
+        counts[index] = n
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleScriptDB 连接方式基准")
+    parser.add_argument("--scripts", type=int, default=200, help="预置剧本数")
+    parser.add_argument("--duration", type=float, default=3.0, help="每项测量时长（秒）")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_simple_db_conn_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = SimpleScriptDB(os.path.join(tmpdir, "bench.db"))
+        seed(db, args.scripts)
+        ids = [f"bench-{i}" for i in range(args.scripts)]
+
+        operations = {
+            "get_script": (
+                lambda n: per_call_query(db.db_path, SELECT_SCRIPT, (ids[n % len(ids)],), fetch_all=False),
+                lambda n: pooled_query(db, SELECT_SCRIPT, (ids[n % len(ids)],), fetch_all=False),
+            ),
+            "get_evidences_by_script": (
+                lambda n: per_call_query(db.db_path, SELECT_EVIDENCES, (ids[n % len(ids)],)),
+                lambda n: pooled_query(db, SELECT_EVIDENCES, (ids[n % len(ids)],)),
+            ),
+            f"get_all_scripts ({args.scripts})": (
+                lambda n: per_call_query(db.db_path, SELECT_ALL),
+                lambda n: pooled_query(db, SELECT_ALL),
+            ),
+        }
+
+        print(f"{'操作':<32}{'线程':>6}{'per-call ops/s':>18}{'pooled ops/s':>16}{'提升':>10}")
+        for name, (per_call, pooled) in operations.items():
+            for threads in args.threads:
+                before = measure(per_call, threads, args.duration)
+                after = measure(pooled, threads, args.duration)
+                print(f"{name:<32}{threads:>6}{before:>18.0f}{after:>16.0f}{after / before:>9.2f}x")
+        db.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+通过 HTTP 并发保存剧本，统计写入吞吐、延迟，以及各 worker 写线程实际的组提交效果（平均每个事务合并的写操作数）
+
+sqlite_write_stress.py 在进程内直接调用 SimpleScriptDB；这里走完整的请求路径（路由、线程池、写线程），
+写接口如果阻塞了事件循环，同一 worker 同一时刻只会有一个写操作在排队，组提交就合并不起来（每批 1 个）。
+
+组提交统计来自 /db/store 的 writes 字段，每次请求只落到某一个 worker 上，所以压测前后各用新连接请求多次，
+按 pid 汇总；压测期间没被采样到的 worker 不计入。
+
+示例（先按线上方式启动 8 个 worker: ./run.sh）:
+    python benchmarks/sqlite_write_http.py --concurrency 64 --duration 10
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from orm_concurrency import Recorder, percentile
+
+
+def make_script(worker: int, n: int):
+    return {
+        "id": f"http-bench-{worker}-{n % 20}",
+        "title": f"HTTP 压测剧本 {worker} #{n}",
+        "globalStory": "故事" * 200,
+        "characters": [{"name": f"角色{i}", "bio": "简介" * 20, "isKiller": i == 0} for i in range(6)],
+    }
+
+
+def sample_write_stats(base_url: str, samples: int, timeout: float):
+    """多次请求 /db/store（不复用连接，尽量落到不同 worker），返回 {pid: writes}"""
+    by_pid = {}
+    for _ in range(samples):
+        try:
+            body = requests.get(base_url + "/db/store", timeout=timeout, headers={"Connection": "close"}).json()
+        except (requests.RequestException, ValueError):
+            continue
+        if body.get("writes") is not None and body.get("pid") is not None:
+            by_pid[body["pid"]] = body["writes"]
+    return by_pid
+
+
+def run(args):
+    before = sample_write_stats(args.base_url, args.stats_samples, args.timeout)
+    writes = Recorder()
+    deadline = time.perf_counter() + args.duration
+    local = threading.local()
+
+    def http():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def writer(worker_index):
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = http().post(args.base_url + "/db/scripts/save", json=make_script(worker_index, n),
+                                       timeout=args.timeout)
+                if response.status_code >= 400:
+                    writes.fail(f"HTTP {response.status_code}: {response.text[:200]}")
+                else:
+                    writes.ok(time.perf_counter() - start)
+            except requests.RequestException as e:
+                writes.fail(str(e))
+            n += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(writer, range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    after = sample_write_stats(args.base_url, args.stats_samples, args.timeout)
+
+    # 只统计压测前后都采样到的 worker，差值就是压测期间的写入
+    workers = {}
+    for pid, stats in after.items():
+        if pid in before:
+            workers[pid] = {key: stats[key] - before[pid][key] for key in ("jobs", "batches", "failed_jobs", "lock_retries")}
+            workers[pid]["max_batch"] = stats["max_batch"]
+    jobs = sum(w["jobs"] for w in workers.values())
+    batches = sum(w["batches"] for w in workers.values())
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "requests": len(writes.latencies) + writes.errors,
+        "errors": writes.errors,
+        "throughput_rps": round(len(writes.latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": ms(statistics.mean(writes.latencies)) if writes.latencies else None,
+            "p50": ms(percentile(writes.latencies, 50)),
+            "p95": ms(percentile(writes.latencies, 95)),
+            "p99": ms(percentile(writes.latencies, 99)),
+        },
+        "sampled_workers": len(workers),
+        "jobs": jobs,
+        "batches": batches,
+        "jobs_per_batch": round(jobs / batches, 2) if batches else None,
+        "workers": {str(pid): stats for pid, stats in workers.items()},
+        "error_samples": writes.error_samples,
+    }
+
+
+def print_report(result):
+    print("\n📊 HTTP 并发写结果")
+    print(f"   并发: {result['concurrency']}  请求: {result['requests']}  失败: {result['errors']}  耗时: {result['elapsed_s']}s")
+    print(f"   吞吐: {result['throughput_rps']} req/s")
+    for key in ("p50", "p95", "p99"):
+        print(f"   写延迟 {key:<8}{result['latency_ms'][key]:>10} ms")
+    print(f"   组提交: 采样到 {result['sampled_workers']} 个 worker，{result['jobs']} 个写操作 / {result['batches']} 个事务"
+          f" = 平均每个事务 {result['jobs_per_batch']} 个")
+    for pid, stats in result["workers"].items():
+        print(f"      pid {pid}: jobs={stats['jobs']} batches={stats['batches']} max_batch={stats['max_batch']}"
+              f" lock_retries={stats['lock_retries']}")
+    for sample in result["error_samples"]:
+        print(f"   ❌ {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通过 HTTP 并发保存剧本，测量写线程的组提交效果")
+    parser.add_argument("--base-url", default="http://127.0.0.1:10000")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="压测秒数")
+    parser.add_argument("--stats-samples", type=int, default=64, help="压测前后各请求 /db/store 的次数")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.concurrency} 并发保存剧本到 {args.base_url}，持续 {args.duration}s...")
+    result = run(args)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+多进程并发保存剧本和证物，模拟 uvicorn 多 worker 共用一个 SQLite 文件，统计写入吞吐和 database is locked 错误
+
+    queued   当前实现：每个进程一个写线程，排队的写操作组提交，BEGIN IMMEDIATE 跨进程排队
+    direct   旧实现：每个线程在自己的连接上直接写，各自提交
+
+用法（在 api/ 目录下运行）:
+    python benchmarks/sqlite_write_stress.py --processes 8 --threads 4 --duration 10
+    python benchmarks/sqlite_write_stress.py --processes 8 --threads 4 --duration 10 --mode direct queued
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    # 导入时会初始化全局的 simple_db，每个子进程都会打印一遍
+    import simple_db as simple_db_module  # noqa: E402
+    from simple_db import SimpleScriptDB  # noqa: E402
+from sqlite_writer import is_locked_error  # noqa: E402
+
+
+def make_script(worker: str, n: int):
+    return {
+        "id": f"{worker}-{n % 50}",
+        "title": f"压测剧本 {worker} #{n}",
+        "globalStory": "故事" * 200,
+        "characters": [{"name": f"角色{i}", "bio": "简介" * 20, "isKiller": i == 0} for i in range(6)],
+        "updatedAt": f"2024-01-01T00:00:{n % 60:02d}",
+    }
+
+
+def make_evidence(worker: str, n: int):
+    # 挂在上一轮保存的剧本下，满足外键约束
+    return {"id": f"{worker}-e{n % 200}", "scriptId": f"{worker}-{(n - 1) % 50}", "name": f"证物 {n}",
+            "relatedCharacters": ["角色0", "角色1"]}
+
+
+def write_ops(db: SimpleScriptDB, mode: str):
+    """返回 (保存剧本, 保存证物)，两种模式执行相同的 SQL，只是提交路径不同"""
+    def script_write(script_data):
+        row, characters = db._prepare_script_row(script_data)
+
+        def write(conn):
+            db._write_characters(conn, row[0], characters)
+            conn.execute(simple_db_module._UPSERT_SCRIPT_SQL, row)
+        return write
+
+    def evidence_write(evidence_data):
+        row = db._prepare_evidence_row(evidence_data)
+        return lambda conn: conn.execute(simple_db_module._UPSERT_EVIDENCE_SQL, row)
+
+    if mode == "queued":
+        def execute(write):
+            db._write(write)
+    else:
+        def execute(write):
+            with db._connect() as conn:
+                write(conn)
+
+    return lambda data: execute(script_write(data)), lambda data: execute(evidence_write(data))
+
+
+def worker_process(db_path: str, mode: str, process_index: int, threads: int, duration: float, results):
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = SimpleScriptDB(db_path)
+    save_script, save_evidence = write_ops(db, mode)
+    counts = {"ok": 0, "locked": 0, "other": 0}
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def run(thread_index):
+        name = f"p{process_index}t{thread_index}"
+        n = 0
+        while time.perf_counter() < deadline:
+            try:
+                if n % 3 == 2:
+                    save_evidence(make_evidence(name, n))
+                else:
+                    save_script(make_script(name, n))
+                key = "ok"
+            except sqlite3.Error as e:
+                key = "locked" if is_locked_error(e) else "other"
+                if len(samples) < 3:
+                    samples.append(str(e))
+            with lock:
+                counts[key] += 1
+            n += 1
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    writer_stats = db.write_stats()
+    db.close()
+    results.put({**counts, "samples": samples, "writer": writer_stats})
+
+
+def stress(mode: str, args) -> dict:
+    tmpdir = tempfile.mkdtemp(prefix="bench_sqlite_write_")
+    try:
+        db_path = os.path.join(tmpdir, "stress.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            SimpleScriptDB(db_path).close()
+
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        processes = [ctx.Process(target=worker_process, args=(db_path, mode, i, args.threads, args.duration, results))
+                     for i in range(args.processes)]
+        start = time.perf_counter()
+        for p in processes:
+            p.start()
+        collected = [results.get() for _ in processes]
+        for p in processes:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        total = {"ok": 0, "locked": 0, "other": 0, "batches": 0, "jobs": 0, "lock_retries": 0}
+        samples = []
+        for item in collected:
+            for key in ("ok", "locked", "other"):
+                total[key] += item[key]
+            for key in ("batches", "jobs", "lock_retries"):
+                total[key] += item["writer"][key]
+            samples.extend(item["samples"])
+        total["elapsed"] = elapsed
+        total["samples"] = samples[:5]
+        return total
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程 SQLite 写入压测")
+    parser.add_argument("--processes", type=int, default=8, help="进程数，对应 uvicorn worker 数")
+    parser.add_argument("--threads", type=int, default=4, help="每个进程的并发写线程数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每种模式的压测秒数")
+    parser.add_argument("--mode", nargs="+", choices=["queued", "direct"], default=["queued"])
+    args = parser.parse_args()
+
+    print(f"🚀 {args.processes} 进程 × {args.threads} 线程，每种模式 {args.duration}s")
+    print(f"{'模式':<10}{'成功写入':>10}{'写入/秒':>10}{'locked':>8}{'其他错误':>10}{'平均组提交':>12}{'锁重试':>8}")
+    failed = False
+    for mode in args.mode:
+        result = stress(mode, args)
+        per_batch = result["jobs"] / result["batches"] if result["batches"] else 1.0
+        print(f"{mode:<10}{result['ok']:>10}{result['ok'] / args.duration:>10.0f}"
+              f"{result['locked']:>8}{result['other']:>10}{per_batch:>12.1f}{result['lock_retries']:>8}")
+        for sample in result["samples"]:
+            print(f"   ❌ {sample}")
+        if mode == "queued" and (result["locked"] or result["other"]):
+            failed = True
+
+    if failed:
+        print("❌ 当前实现出现了写入错误")
+        sys.exit(1)
+    if "queued" in args.mode:
+        print("✅ 当前实现没有写入错误")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# 响应压缩：按 Accept-Encoding 协商 br / gzip，只压缩超过阈值的一次性响应体
+# 剧本详情、剧透故事都是几十到几百 KB 的中文 UTF-8，压缩后通常只剩 1/3 左右。
+# SSE（text/event-stream）和 StreamingResponse 这类分块发送的响应原样透传，不缓冲、不影响逐字输出。
+# 带强 ETag 的 200 响应（剧本、剧透故事等按版本生成的内容）同一版本的字节不变，压缩结果按 ETag 缓存，
+# 同一版本只压缩一次，之后的请求直接发送缓存的压缩版本。
+import gzip
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from versioned_cache import VersionedCache
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，未安装时只协商 gzip
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # 小于该字节数的响应不压缩
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "256"))  # 每个 worker 缓存的压缩版本条数，0 为关闭
+
+# 每次现压的响应用较快的级别；缓存的版本只压缩一次，用更高的级别换更小的体积
+_GZIP_LEVEL = 6
+_GZIP_CACHED_LEVEL = 9
+_BROTLI_QUALITY = 5
+_BROTLI_CACHED_QUALITY = 9
+
+_COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """从 Accept-Encoding 中选出压缩方式：br 优先于 gzip，q=0 表示不接受；都不接受时返回 None"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(encoding: str, body: bytes, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=_BROTLI_CACHED_QUALITY if cached else _BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=_GZIP_CACHED_LEVEL if cached else _GZIP_LEVEL, mtime=0)
+
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("text/event-stream"):
+        return False
+    return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """响应压缩（纯 ASGI 实现，只缓冲第一段响应体来判断是不是一次性响应）"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache_size: int = COMPRESSION_CACHE_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = VersionedCache(cache_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending = {"start": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                if _is_compressible(Headers(raw=message["headers"])):
+                    # 先不发送响应头，等第一段响应体决定是否压缩
+                    pending["start"] = message
+                    return
+                await send(message)
+                return
+
+            start = pending["start"]
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            pending["start"] = None
+
+            headers = MutableHeaders(scope=start)
+            headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # 流式响应（NDJSON 等）或内容太小：原样发送
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self._compress(scope, start["status"], headers.get("etag"), encoding, body)
+            if len(compressed) >= len(body):
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                # 压缩后的字节和原始表示不同，强 ETag 降为弱 ETag；http_cache.is_not_modified 用弱比较，304 照常命中
+                headers["ETag"] = "W/" + etag
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _compress(self, scope, status: int, etag: Optional[str], encoding: str, body: bytes) -> bytes:
+        if status != 200 or not etag or etag.startswith("W/"):
+            return compress(encoding, body)
+        # 同一路径的新版本直接替换旧版本，缓存条数不随版本增长
+        key = (scope["path"], scope.get("query_string", b""), encoding)
+        return self.cache.read_through(key, etag, lambda: compress(encoding, body, cached=True))
@@ -1,25 +1,65 @@
-# 数据库管理API
-from fastapi import APIRouter, HTTPException, Depends, status
+# ORM 数据库（models.DATABASE_URL）的剧本管理API
+# 剧本的主存储是 script_repository（/db/scripts/...）；这里的接口只维护 ORM 库中的旧数据，
+# 路径加了 /db/orm 前缀，不再和主存储的同名路由冲突。旧数据可用 merge_script_stores.py 合并进主存储。
+# 路由都用 AsyncSession，查询期间不阻塞事件循环；reconcile 等同步辅助函数通过 run_sync 在同一会话里执行
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
-from datetime import datetime
-import json
-import os
-import base64
 
+import asset_store
+import fast_json
+from http_cache import conditional_bytes_async, make_etag, success_body
+from reconcile import assigned_values, reconcile
+from image_ingest import is_data_url
 from models import (
-    Script, Character, QuizQuestion, ScriptEvidence,
-    get_db, create_tables,
-    script_to_dict, dict_to_script, dict_to_character, dict_to_quiz_question, dict_to_script_evidence
+    Script, Character, QuizQuestion, ScriptEvidence, ChangeLog,
+    get_async_db, get_async_write_db, create_tables, record_change, load_script_list, SCRIPT_DETAIL_OPTIONS,
+    script_to_dict, script_evidence_to_dict, dict_to_script, dict_to_character, dict_to_quiz_question,
+    dict_to_script_evidence
 )
+from settings import SCRIPT_CACHE_SIZE
+from versioned_cache import VersionedCache
 
 router = APIRouter()
 
 # 确保数据库表存在
 create_tables()
 
-@router.post("/db/scripts/save")
-async def save_script_to_db(script_data: Dict[str, Any], db: Session = Depends(get_db)):
+# 剧本详情序列化后的 JSON，按 (revision, updated_at) 校验；命中时不再加载 ORM 对象、不再组装字典和编码
+_script_json_cache = VersionedCache(SCRIPT_CACHE_SIZE)
+
+def _reconcile_children(db: Session, script_id: str, existed: bool, characters: List[Dict[str, Any]],
+                        quiz: List[Dict[str, Any]], evidences: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """在 run_sync 中执行：角色、题目、证物按稳定键和现有行比对，只写入有变化的行，并记录变更"""
+    def existing_rows(model, *order_by):
+        if not existed:
+            return []
+        return db.query(model).filter(model.script_id == script_id).order_by(*order_by).all()
+    
+    changes = {
+        'characters': reconcile(db, Character, existing_rows(Character, Character.position, Character.id),
+                                characters, key=lambda values: values['name']),
+        'quiz': reconcile(db, QuizQuestion, existing_rows(QuizQuestion, QuizQuestion.order_index, QuizQuestion.id),
+                          quiz, key=lambda values: values['order_index']),
+        'evidences': reconcile(db, ScriptEvidence, existing_rows(ScriptEvidence, ScriptEvidence.created_at),
+                               evidences, key=lambda values: values['id']),
+    }
+    
+    # 记录变更，供增量同步；没有变化的证物不记录
+    record_change(db, 'script', script_id, script_id, 'updated' if existed else 'created')
+    for evidence_id in changes['evidences'].inserted:
+        record_change(db, 'evidence', evidence_id, script_id, 'created')
+    for evidence_id in changes['evidences'].updated:
+        record_change(db, 'evidence', evidence_id, script_id, 'updated')
+    for evidence_id in changes['evidences'].deleted:
+        record_change(db, 'evidence', evidence_id, script_id, 'deleted')
+    return changes
+
+@router.post("/db/orm/scripts/save")
+async def save_script_to_db(script_data: Dict[str, Any], db: AsyncSession = Depends(get_async_write_db)):
     """保存剧本到数据库"""
     try:
         print(f"💾 保存剧本到数据库: {script_data.get('title')}")
@@ -29,11 +69,12 @@ async def save_script_to_db(script_data: Dict[str, Any], db: Session = Depends(g
             raise HTTPException(status_code=400, detail="剧本ID不能为空")
         
         # 查找现有剧本或创建新剧本
-        existing_script = db.query(Script).filter(Script.id == script_id).first()
+        existing_script = await db.get(Script, script_id)
         
         if existing_script:
-            # 更新现有剧本
+            # 更新现有剧本；角色、题目可能单独变化而剧本行不变，版本号显式加一
             script = dict_to_script(script_data, existing_script)
+            script.revision = (existing_script.revision or 0) + 1
             print(f"🔄 更新现有剧本: {script.title}")
         else:
             # 创建新剧本
@@ -43,78 +84,46 @@ async def save_script_to_db(script_data: Dict[str, Any], db: Session = Depends(g
         
         # 处理封面数据
         cover_image = script_data.get('coverImage')
-        if cover_image and cover_image.startswith('data:image/'):
-            # 保存base64封面为文件
+        if is_data_url(cover_image):
+            # 保存base64封面为文件（分块解码，按内容哈希命名，相同封面只存一份）
             try:
-                base64_data = cover_image.split(',')[1]
-                timestamp = int(datetime.utcnow().timestamp() * 1000)
-                cover_filename = f"script_cover_{script_id}_{timestamp}.png"
-                
                 # 统一保存到web/public目录，符合STATIC_FILES_SETUP.md规范
-                web_dir = os.path.join(os.path.dirname(__file__), '..', 'web')
-                public_dir = os.path.join(web_dir, 'public')
-                cover_dir = os.path.join(public_dir, 'script_covers')
-                
-                os.makedirs(cover_dir, exist_ok=True)
-                
-                image_data = base64.b64decode(base64_data)
-                
-                # 只保存到public目录，符合STATIC_FILES_SETUP.md规范
-                cover_path = os.path.join(cover_dir, cover_filename)
-                with open(cover_path, 'wb') as f:
-                    f.write(image_data)
+                stored = await run_in_threadpool(asset_store.put_data_url, 'cover', cover_image)
                 
                 # 更新数据库中的封面信息
-                script.cover_image_filename = cover_filename
-                script.cover_image_path = f"/script_covers/{cover_filename}"
+                script.cover_image_filename = stored.filename
+                script.cover_image_path = stored.url_path
                 
-                print(f"📁 封面文件已保存: {cover_filename}")
+                print(f"📁 封面文件已保存: {stored.filename}" if stored.created else f"📁 复用已有封面文件: {stored.filename}")
                 
             except Exception as e:
                 print(f"❌ 保存封面文件失败: {e}")
                 # 即使文件保存失败，仍然保存剧本数据
         
-        # 删除现有数据（如果更新）
-        if existing_script:
-            db.query(Character).filter(Character.script_id == script_id).delete()
-            db.query(QuizQuestion).filter(QuizQuestion.script_id == script_id).delete()
-            db.query(ScriptEvidence).filter(ScriptEvidence.script_id == script_id).delete()
-        
-        # 添加角色
-        characters_data = script_data.get('characters', [])
-        for char_data in characters_data:
-            character = dict_to_character(char_data, script_id)
-            
-            # 处理角色头像
-            image = char_data.get('image', 'officer.png')
-            if image and not image.startswith('/character_avatars/'):
-                character.image_filename = image
-                character.image_path = f"/character_avatars/{image}"
-            
-            db.add(character)
-        
-        # 添加题目
-        quiz_data = script_data.get('quiz', [])
-        for i, quiz_data_item in enumerate(quiz_data):
-            quiz = dict_to_quiz_question(quiz_data_item, script_id, i)
-            db.add(quiz)
-        
-        # 添加证物
-        evidences_data = script_data.get('evidences', [])
-        for evidence_data in evidences_data:
-            evidence = dict_to_script_evidence(evidence_data, script_id)
-            
-            # 处理证物图像
-            evidence_image = evidence_data.get('image')
-            if evidence_image and not evidence_image.startswith('/evidence_images/'):
-                evidence.image_filename = evidence_image
-            
-            db.add(evidence)
-            
-        print(f"📦 保存了 {len(evidences_data)} 个证物")
+        # 新剧本先写入剧本行，子表的外键才有父行
+        await db.flush()
+        
+        # 角色、题目、证物按稳定键和现有行比对，只写入有变化的行：角色按名称，题目按顺序，证物按 ID
+        characters = []
+        for position, char_data in enumerate(script_data.get('characters', []) or []):
+            values = assigned_values(dict_to_character(char_data, script_id))
+            values['position'] = position
+            characters.append(values)
+        quiz = [assigned_values(dict_to_quiz_question(item, script_id, i))
+                for i, item in enumerate(script_data.get('quiz', []) or [])]
+        evidences_data = script_data.get('evidences', []) or []
+        evidences = [assigned_values(dict_to_script_evidence(evidence_data, script_id))
+                     for evidence_data in evidences_data]
+        
+        changes = await db.run_sync(_reconcile_children, script_id, existing_script is not None,
+                                    characters, quiz, evidences)
+        print("📦 子表增量保存: " + ", ".join(
+            f"{name} +{len(c.inserted)} ~{len(c.updated)} -{len(c.deleted)} ={c.unchanged}" for name, c in changes.items()
+        ))
         
         # 提交事务
-        db.commit()
+        await db.commit()
+        _script_json_cache.invalidate(script_id)
         
         print(f"✅ 剧本保存到数据库成功: {script.title}")
         
@@ -122,27 +131,26 @@ async def save_script_to_db(script_data: Dict[str, Any], db: Session = Depends(g
             "success": True,
             "message": "剧本保存成功",
             "script_id": script_id,
-            "cover_filename": script.cover_image_filename
+            "cover_filename": script.cover_image_filename,
+            "changes": {name: c.summary() for name, c in changes.items()}
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 保存剧本到数据库失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"保存剧本失败: {str(e)}"
         )
 
-@router.get("/db/scripts/list")
-async def list_scripts_from_db(db: Session = Depends(get_db)):
+@router.get("/db/orm/scripts/list")
+async def list_scripts_from_db(
+    summary: bool = Query(False, description="只返回摘要，不含角色、题目和证物"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """从数据库获取所有剧本列表"""
     try:
-        scripts = db.query(Script).order_by(Script.updated_at.desc()).all()
-        
-        scripts_data = []
-        for script in scripts:
-            script_dict = script_to_dict(script)
-            scripts_data.append(script_dict)
+        scripts_data = await db.run_sync(load_script_list, summary)
         
         print(f"📋 从数据库加载剧本列表: {len(scripts_data)} 个剧本")
         
@@ -158,23 +166,32 @@ async def list_scripts_from_db(db: Session = Depends(get_db)):
             detail=f"获取剧本列表失败: {str(e)}"
         )
 
-@router.get("/db/scripts/{script_id}")
-async def get_script_from_db(script_id: str, db: Session = Depends(get_db)):
-    """从数据库获取指定剧本"""
+@router.get("/db/orm/scripts/{script_id}")
+async def get_script_from_db(script_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """从数据库获取指定剧本；带 If-None-Match 且剧本未修改时返回 304"""
     try:
-        script = db.query(Script).filter(Script.id == script_id).first()
+        version = (await db.execute(
+            select(Script.revision, Script.updated_at).where(Script.id == script_id)
+        )).first()
         
-        if not script:
+        if not version:
             raise HTTPException(status_code=404, detail="剧本不存在")
         
-        script_dict = script_to_dict(script)
+        async def build():
+            script = await db.scalar(select(Script).options(*SCRIPT_DETAIL_OPTIONS).where(Script.id == script_id))
+            if not script:
+                raise HTTPException(status_code=404, detail="剧本不存在")
+            
+            print(f"📖 从数据库加载剧本: {script.title}")
+            
+            return fast_json.dumps_bytes(script_to_dict(script))
         
-        print(f"📖 从数据库加载剧本: {script.title}")
+        async def build_body():
+            # 同一版本的剧本只组装、序列化一次，之后直接返回缓存的字节
+            script_json = await _script_json_cache.read_through_async(script_id, tuple(version), build)
+            return success_body('script', script_json)
         
-        return {
-            "success": True,
-            "script": script_dict
-        }
+        return await conditional_bytes_async(request, make_etag('script', script_id, *version), build_body)
         
     except HTTPException:
         raise
@@ -185,11 +202,13 @@ async def get_script_from_db(script_id: str, db: Session = Depends(get_db)):
             detail=f"获取剧本失败: {str(e)}"
         )
 
-@router.delete("/db/scripts/{script_id}")
-async def delete_script_from_db(script_id: str, db: Session = Depends(get_db)):
+@router.delete("/db/orm/scripts/{script_id}")
+async def delete_script_from_db(script_id: str, db: AsyncSession = Depends(get_async_write_db)):
     """从数据库删除剧本"""
     try:
-        script = db.query(Script).filter(Script.id == script_id).first()
+        script = await db.scalar(
+            select(Script).options(*SCRIPT_DETAIL_OPTIONS).where(Script.id == script_id)
+        )
         
         if not script:
             raise HTTPException(status_code=404, detail="剧本不存在")
@@ -197,23 +216,24 @@ async def delete_script_from_db(script_id: str, db: Session = Depends(get_db)):
         # 删除封面文件
         if script.cover_image_filename:
             try:
-                # 统一从web/public目录删除，符合STATIC_FILES_SETUP.md规范
-                web_dir = os.path.join(os.path.dirname(__file__), '..', 'web')
-                public_dir = os.path.join(web_dir, 'public')
-                cover_dir = os.path.join(public_dir, 'script_covers')
-                
-                cover_path = os.path.join(cover_dir, script.cover_image_filename)
-                
-                if os.path.exists(cover_path):
-                    os.remove(cover_path)
-                    
-                print(f"🗑️ 删除封面文件: {script.cover_image_filename}")
+                # 统一从web/public目录删除，符合STATIC_FILES_SETUP.md规范；按内容哈希命名的封面可能被共用，不删除
+                if await run_in_threadpool(asset_store.release, 'cover', script.cover_image_filename):
+                    print(f"🗑️ 删除封面文件: {script.cover_image_filename}")
             except Exception as e:
                 print(f"⚠️ 删除封面文件失败: {e}")
         
         # 删除数据库记录（级联删除角色和题目）
-        db.delete(script)
-        db.commit()
+        evidence_ids = [evidence.id for evidence in script.script_evidences]
+        
+        def record_deletions(sync_db: Session):
+            record_change(sync_db, 'script', script_id, script_id, 'deleted')
+            for evidence_id in evidence_ids:
+                record_change(sync_db, 'evidence', evidence_id, script_id, 'deleted')
+        
+        await db.run_sync(record_deletions)
+        await db.delete(script)
+        await db.commit()
+        _script_json_cache.invalidate(script_id)
         
         print(f"✅ 从数据库删除剧本成功: {script.title}")
         
@@ -225,15 +245,69 @@ async def delete_script_from_db(script_id: str, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 从数据库删除剧本失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"删除剧本失败: {str(e)}"
         )
 
-@router.post("/db/migrate")
-async def migrate_data_to_db(db: Session = Depends(get_db)):
+@router.get("/db/orm/changes")
+async def get_changes_from_db(
+    since: int = Query(0, ge=0, description="上次同步返回的 next_since，首次传 0"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """增量同步：返回 since 之后新建、修改、删除的剧本和证物，格式与 /db/changes 相同；序号按提交顺序递增，见 models.record_change"""
+    try:
+        current_seq = await db.scalar(select(func.max(ChangeLog.seq))) or 0
+        if since > current_seq:
+            # 序号比当前还大，说明数据库被重建过，客户端需要全量重新加载
+            return {"success": True, "changes": [], "scripts": [], "evidences": [], "next_since": current_seq,
+                    "has_more": False, "current_seq": current_seq, "reset": True}
+        
+        rows = (await db.scalars(
+            select(ChangeLog).where(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit + 1)
+        )).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        script_ids = [row.entity_id for row in rows if row.entity == 'script' and row.op != 'deleted']
+        evidence_ids = [row.entity_id for row in rows if row.entity == 'evidence' and row.op != 'deleted']
+        scripts = (await db.scalars(
+            select(Script).options(*SCRIPT_DETAIL_OPTIONS).where(Script.id.in_(script_ids))
+        )).all() if script_ids else []
+        evidences = (await db.scalars(
+            select(ScriptEvidence).where(ScriptEvidence.id.in_(evidence_ids))
+        )).all() if evidence_ids else []
+        
+        return {
+            "success": True,
+            "changes": [{
+                'seq': row.seq,
+                'entity': row.entity,
+                'id': row.entity_id,
+                'scriptId': row.script_id,
+                'op': row.op,
+                'changedAt': row.changed_at.isoformat() if row.changed_at else None
+            } for row in rows],
+            "scripts": [script_to_dict(script) for script in scripts],
+            "evidences": [{**script_evidence_to_dict(evidence), 'script_id': evidence.script_id} for evidence in evidences],
+            "next_since": rows[-1].seq if rows else since,
+            "has_more": has_more,
+            "current_seq": current_seq,
+            "reset": False
+        }
+        
+    except Exception as e:
+        print(f"❌ 获取变更失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取变更失败: {str(e)}"
+        )
+
+@router.post("/db/orm/migrate")
+async def migrate_data_to_db(db: AsyncSession = Depends(get_async_write_db)):
     """将现有数据迁移到数据库"""
     try:
         print("🔄 开始数据迁移...")
@@ -255,8 +329,8 @@ async def migrate_data_to_db(db: Session = Depends(get_db)):
 
 # ===== 证物单独管理API =====
 
-@router.post("/db/evidences/save")
-async def save_script_evidence(evidence_data: Dict[str, Any], db: Session = Depends(get_db)):
+@router.post("/db/orm/evidences/save")
+async def save_script_evidence(evidence_data: Dict[str, Any], db: AsyncSession = Depends(get_async_write_db)):
     """单独保存/更新剧本证物"""
     try:
         script_id = evidence_data.get('scriptId')
@@ -270,21 +344,20 @@ async def save_script_evidence(evidence_data: Dict[str, Any], db: Session = Depe
         print(f"💾 单独保存证物: {evidence_data.get('name')} (脚本: {script_id})")
         
         # 检查剧本是否存在
-        script = db.query(Script).filter(Script.id == script_id).first()
+        script = await db.get(Script, script_id)
         if not script:
             # 提供更详细的错误信息和解决建议
-            all_scripts = db.query(Script).all()
-            script_ids = [s.id for s in all_scripts]
+            script_ids = (await db.scalars(select(Script.id).limit(5))).all()
             raise HTTPException(
                 status_code=404, 
                 detail=f"剧本不存在 (ID: {script_id})。请先保存剧本到数据库。数据库中现有剧本: {script_ids[:5]}"
             )
         
         # 查找现有证物或创建新证物
-        existing_evidence = db.query(ScriptEvidence).filter(
+        existing_evidence = await db.scalar(select(ScriptEvidence).where(
             ScriptEvidence.id == evidence_id,
             ScriptEvidence.script_id == script_id
-        ).first()
+        ))
         
         if existing_evidence:
             # 更新现有证物
@@ -296,8 +369,13 @@ async def save_script_evidence(evidence_data: Dict[str, Any], db: Session = Depe
             db.add(evidence)
             print(f"➕ 创建新证物: {evidence.name}")
         
-        db.commit()
-        db.refresh(evidence)
+        await db.run_sync(record_change, 'evidence', evidence_id, script_id,
+                          'updated' if existing_evidence else 'created')
+        # 剧本详情里带着证物列表，剧本的版本号跟着变
+        script.revision = (script.revision or 0) + 1
+        await db.commit()
+        _script_json_cache.invalidate(script_id)
+        await db.refresh(evidence)
         
         # 返回保存后的证物数据
         evidence_dict = {
@@ -306,7 +384,7 @@ async def save_script_evidence(evidence_data: Dict[str, Any], db: Session = Depe
             'description': evidence.description,
             'category': evidence.category,
             'importance': evidence.importance,
-            'relatedCharacters': json.loads(evidence.related_characters) if evidence.related_characters else [],
+            'relatedCharacters': fast_json.loads(evidence.related_characters) if evidence.related_characters else [],
             'initialState': evidence.initial_state,
             'image': evidence.image_filename
         }
@@ -320,45 +398,49 @@ async def save_script_evidence(evidence_data: Dict[str, Any], db: Session = Depe
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 保存证物失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"保存证物失败: {str(e)}")
 
-@router.delete("/db/evidences/{script_id}/{evidence_id}")
-async def delete_script_evidence(script_id: str, evidence_id: str, db: Session = Depends(get_db)):
+@router.delete("/db/orm/evidences/{script_id}/{evidence_id}")
+async def delete_script_evidence(script_id: str, evidence_id: str, db: AsyncSession = Depends(get_async_write_db)):
     """删除剧本证物"""
     try:
-        evidence = db.query(ScriptEvidence).filter(
+        evidence = await db.scalar(select(ScriptEvidence).where(
             ScriptEvidence.id == evidence_id,
             ScriptEvidence.script_id == script_id
-        ).first()
+        ))
         
         if not evidence:
             raise HTTPException(status_code=404, detail="证物不存在")
         
         print(f"🗑️ 删除证物: {evidence.name}")
-        db.delete(evidence)
-        db.commit()
+        await db.run_sync(record_change, 'evidence', evidence_id, script_id, 'deleted')
+        script = await db.get(Script, script_id)
+        script.revision = (script.revision or 0) + 1
+        await db.delete(evidence)
+        await db.commit()
+        _script_json_cache.invalidate(script_id)
         
         return {"success": True, "message": "证物删除成功"}
     
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"删除证物失败: {str(e)}")
 
-@router.get("/db/evidences/{script_id}")
-async def get_script_evidences(script_id: str, db: Session = Depends(get_db)):
+@router.get("/db/orm/evidences/{script_id}")
+async def get_script_evidences(script_id: str, db: AsyncSession = Depends(get_async_db)):
     """获取剧本的所有证物"""
     try:
-        evidences = db.query(ScriptEvidence).filter(
-            ScriptEvidence.script_id == script_id
-        ).order_by(ScriptEvidence.created_at.desc()).all()
+        evidences = (await db.scalars(
+            select(ScriptEvidence).where(ScriptEvidence.script_id == script_id).order_by(ScriptEvidence.created_at.desc())
+        )).all()
         
         evidences_data = []
         for evidence in evidences:
-            related_chars = json.loads(evidence.related_characters) if evidence.related_characters else []
+            related_chars = fast_json.loads(evidence.related_characters) if evidence.related_characters else []
             evidences_data.append({
                 'id': evidence.id,
                 'name': evidence.name,
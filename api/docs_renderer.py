@@ -0,0 +1,150 @@
+# 文档页面渲染：把 docs/ 下的 Markdown 渲染为带样式的 HTML 页面
+import markdown2
+
+
+def render_doc_page(doc_name: str, markdown_content: str) -> str:
+    """
+    渲染 Markdown 文档为完整的 HTML 页面
+
+    Args:
+        doc_name: 文档文件名，用作页面标题
+        markdown_content: Markdown 原文
+
+    Returns:
+        完整的 HTML 页面
+    """
+    # 渲染为 HTML
+    html_content = markdown2.markdown(
+        markdown_content,
+        extras=[
+            'fenced-code-blocks',  # 代码块支持
+            'tables',              # 表格支持
+            'task_list',           # 任务列表支持
+            'toc',                 # 目录支持
+            'header-ids',          # 标题ID支持
+            'code-friendly'        # 代码友好
+        ]
+    )
+    
+    # 创建美观的 HTML 页面
+    full_html = f"""
+        <!DOCTYPE html>
+        <html lang="zh-CN">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>{doc_name} - 项目文档</title>
+            <style>
+                body {{
+                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', 'Helvetica Neue', Arial, sans-serif;
+                    line-height: 1.6;
+                    color: #333;
+                    max-width: 1200px;
+                    margin: 0 auto;
+                    padding: 20px;
+                    background-color: #fafafa;
+                }}
+                .container {{
+                    background: white;
+                    padding: 40px;
+                    border-radius: 8px;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+                }}
+                h1, h2, h3, h4, h5, h6 {{
+                    color: #2c3e50;
+                    margin-top: 2em;
+                    margin-bottom: 1em;
+                }}
+                h1 {{
+                    border-bottom: 3px solid #3498db;
+                    padding-bottom: 10px;
+                }}
+                h2 {{
+                    border-bottom: 2px solid #ecf0f1;
+                    padding-bottom: 8px;
+                }}
+                code {{
+                    background-color: #f8f9fa;
+                    padding: 2px 6px;
+                    border-radius: 4px;
+                    font-family: 'SFMono-Regular', Consolas, 'Liberation Mono', Menlo, monospace;
+                    color: #e74c3c;
+                }}
+                pre {{
+                    background-color: #2c3e50;
+                    color: #ecf0f1;
+                    padding: 20px;
+                    border-radius: 8px;
+                    overflow-x: auto;
+                    margin: 20px 0;
+                }}
+                pre code {{
+                    background: none;
+                    color: inherit;
+                    padding: 0;
+                }}
+                blockquote {{
+                    border-left: 4px solid #3498db;
+                    margin: 20px 0;
+                    padding: 10px 20px;
+                    background-color: #ecf0f1;
+                    font-style: italic;
+                }}
+                table {{
+                    border-collapse: collapse;
+                    width: 100%;
+                    margin: 20px 0;
+                }}
+                th, td {{
+                    border: 1px solid #ddd;
+                    padding: 12px;
+                    text-align: left;
+                }}
+                th {{
+                    background-color: #3498db;
+                    color: white;
+                }}
+                tr:nth-child(even) {{
+                    background-color: #f9f9f9;
+                }}
+                .toc {{
+                    background-color: #ecf0f1;
+                    padding: 20px;
+                    border-radius: 8px;
+                    margin: 20px 0;
+                }}
+                .emoji {{
+                    font-size: 1.2em;
+                }}
+                a {{
+                    color: #3498db;
+                    text-decoration: none;
+                }}
+                a:hover {{
+                    text-decoration: underline;
+                }}
+                .back-link {{
+                    display: inline-block;
+                    margin-bottom: 20px;
+                    padding: 8px 16px;
+                    background-color: #3498db;
+                    color: white;
+                    border-radius: 4px;
+                    text-decoration: none;
+                }}
+                .back-link:hover {{
+                    background-color: #2980b9;
+                    text-decoration: none;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <a href="/docs-list" class="back-link">← 返回文档列表</a>
+                {html_content}
+            </div>
+        </body>
+        </html>
+        """
+
+    return full_html
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 import json
 import uuid
@@ -17,7 +19,7 @@ from evidence_models import (
     presentation_record_to_dict,
     dict_to_presentation_record
 )
-from models import get_db
+from models import get_async_db, get_async_write_db
 from evidence_llm_service import invoke_ai_for_evidence_presentation
 from pydantic import BaseModel
 
@@ -85,24 +87,24 @@ async def get_evidences(
     category: Optional[str] = None,
     discovery_state: Optional[str] = None,
     importance: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> EvidenceListResponse:
     """获取指定剧本会话的所有证物"""
     try:
-        query = db.query(EvidenceRecord).filter(
+        query = select(EvidenceRecord).options(selectinload(EvidenceRecord.reactions)).where(
             EvidenceRecord.script_id == script_id,
             EvidenceRecord.session_id == session_id
         )
         
         # 应用过滤条件
         if category:
-            query = query.filter(EvidenceRecord.category == category)
+            query = query.where(EvidenceRecord.category == category)
         if discovery_state:
-            query = query.filter(EvidenceRecord.discovery_state == discovery_state)
+            query = query.where(EvidenceRecord.discovery_state == discovery_state)
         if importance:
-            query = query.filter(EvidenceRecord.importance == importance)
+            query = query.where(EvidenceRecord.importance == importance)
         
-        evidences = query.order_by(EvidenceRecord.updated_at.desc()).all()
+        evidences = (await db.scalars(query.order_by(EvidenceRecord.updated_at.desc()))).all()
         
         # 转换为前端格式
         evidence_list = [evidence_record_to_dict(evidence) for evidence in evidences]
@@ -122,7 +124,7 @@ async def get_evidences(
 @router.post("/create")
 async def create_evidence(
     request: EvidenceCreateRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ) -> EvidenceResponse:
     """创建新证物"""
     try:
@@ -156,8 +158,8 @@ async def create_evidence(
         )
         
         db.add(discovery)
-        db.commit()
-        db.refresh(evidence)
+        await db.commit()
+        evidence = await _load_evidence(db, evidence_id)
         
         return EvidenceResponse(
             success=True,
@@ -166,18 +168,18 @@ async def create_evidence(
         )
     
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"创建证物失败: {str(e)}")
 
 @router.put("/{evidence_id}")
 async def update_evidence(
     evidence_id: str,
     request: EvidenceUpdateRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ) -> EvidenceResponse:
     """更新证物信息"""
     try:
-        evidence = db.query(EvidenceRecord).filter(EvidenceRecord.id == evidence_id).first()
+        evidence = await db.get(EvidenceRecord, evidence_id)
         
         if not evidence:
             raise HTTPException(status_code=404, detail="证物不存在")
@@ -219,8 +221,8 @@ async def update_evidence(
             )
             db.add(discovery)
         
-        db.commit()
-        db.refresh(evidence)
+        await db.commit()
+        evidence = await _load_evidence(db, evidence_id)
         
         return EvidenceResponse(
             success=True,
@@ -231,22 +233,25 @@ async def update_evidence(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"更新证物失败: {str(e)}")
 
 @router.post("/present")
 async def present_evidence_to_actor(
     request: EvidencePresentationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> EvidencePresentationResponse:
     """向角色展示证物并获取反应"""
     try:
         # 获取证物信息
-        evidence = db.query(EvidenceRecord).filter(EvidenceRecord.id == request.evidenceId).first()
+        evidence = await _load_evidence(db, request.evidenceId)
         
         if not evidence:
             raise HTTPException(status_code=404, detail="证物不存在")
         
+        # 结束读事务再调用AI：读事务跨越几秒的模型调用后再写入，期间其他连接提交过的话会直接报 database is locked
+        await db.commit()
+        
         # 调用AI生成反应
         ai_response, reaction_type, new_evidences, updated_info = await invoke_ai_for_evidence_presentation(
             evidence_record_to_dict(evidence),
@@ -276,7 +281,7 @@ async def present_evidence_to_actor(
         if new_evidences or updated_info:
             await process_evidence_updates(db, evidence.session_id, new_evidences, updated_info)
         
-        db.commit()
+        await db.commit()
         
         return EvidencePresentationResponse(
             success=True,
@@ -290,19 +295,19 @@ async def present_evidence_to_actor(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"证物出示失败: {str(e)}")
 
 @router.post("/combine")
 async def combine_evidences(
     request: EvidenceCombinationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ) -> EvidenceResponse:
     """组合两个证物产生新证物"""
     try:
         # 获取两个证物
-        evidence1 = db.query(EvidenceRecord).filter(EvidenceRecord.id == request.primaryEvidenceId).first()
-        evidence2 = db.query(EvidenceRecord).filter(EvidenceRecord.id == request.secondaryEvidenceId).first()
+        evidence1 = await db.get(EvidenceRecord, request.primaryEvidenceId)
+        evidence2 = await db.get(EvidenceRecord, request.secondaryEvidenceId)
         
         if not evidence1 or not evidence2:
             raise HTTPException(status_code=404, detail="证物不存在")
@@ -318,7 +323,7 @@ async def combine_evidences(
                 attempted_by=request.attemptedBy
             )
             db.add(combination)
-            db.commit()
+            await db.commit()
             
             return EvidenceResponse(
                 success=False,
@@ -342,8 +347,8 @@ async def combine_evidences(
         )
         
         db.add(combination)
-        db.commit()
-        db.refresh(combined_evidence)
+        await db.commit()
+        combined_evidence = await _load_evidence(db, combined_evidence.id)
         
         return EvidenceResponse(
             success=True,
@@ -354,19 +359,21 @@ async def combine_evidences(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"证物组合失败: {str(e)}")
 
 @router.get("/{evidence_id}/presentations")
 async def get_evidence_presentations(
     evidence_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     """获取证物的出示历史"""
     try:
-        presentations = db.query(EvidencePresentationRecord).filter(
-            EvidencePresentationRecord.evidence_id == evidence_id
-        ).order_by(EvidencePresentationRecord.presented_at.desc()).all()
+        presentations = (await db.scalars(
+            select(EvidencePresentationRecord)
+            .where(EvidencePresentationRecord.evidence_id == evidence_id)
+            .order_by(EvidencePresentationRecord.presented_at.desc())
+        )).all()
         
         return [presentation_record_to_dict(presentation) for presentation in presentations]
     
@@ -376,28 +383,38 @@ async def get_evidence_presentations(
 @router.delete("/{evidence_id}")
 async def delete_evidence(
     evidence_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ) -> Dict[str, Any]:
     """删除证物（级联删除相关记录）"""
     try:
-        evidence = db.query(EvidenceRecord).filter(EvidenceRecord.id == evidence_id).first()
+        evidence = await db.get(EvidenceRecord, evidence_id)
         
         if not evidence:
             raise HTTPException(status_code=404, detail="证物不存在")
         
-        db.delete(evidence)
-        db.commit()
+        # 级联删除需要加载子记录，AsyncSession.delete 会在 await 中完成
+        await db.delete(evidence)
+        await db.commit()
         
         return {"success": True, "message": "证物删除成功"}
     
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"删除证物失败: {str(e)}")
 
 # 辅助函数
 
+async def _load_evidence(db: AsyncSession, evidence_id: str) -> Optional[EvidenceRecord]:
+    """按 ID 读取证物并预加载 reactions；异步会话不能懒加载，evidence_record_to_dict 之前都要经过这里"""
+    return await db.scalar(
+        select(EvidenceRecord)
+        .options(selectinload(EvidenceRecord.reactions))
+        .where(EvidenceRecord.id == evidence_id)
+        .execution_options(populate_existing=True)
+    )
+
 def calculate_evidence_stats(evidences: List[EvidenceRecord]) -> Dict[str, Any]:
     """计算证物统计信息"""
     total_evidences = len(evidences)
@@ -438,7 +455,7 @@ def calculate_evidence_stats(evidences: List[EvidenceRecord]) -> Dict[str, Any]:
     }
 
 async def process_evidence_updates(
-    db: Session,
+    db: AsyncSession,
     session_id: str,
     new_evidences: List[str],
     updated_info: List[str]
@@ -0,0 +1,46 @@
+# 全项目共用的 JSON 编解码（orjson）
+# 剧本、证物、剧透故事都是大段中文，orjson 直接输出 UTF-8（不转义成 \uXXXX），编码、解码都比标准库快数倍。
+# 接口响应由 main.py 的 default_response_class=http_cache.FastJSONResponse 编码；这里给数据库模块、SSE、文件读写用，不依赖 FastAPI。
+# 和 json.dumps(ensure_ascii=False) 的区别：输出不带多余空格；dict 的键可以是数字等非字符串；NaN/Infinity 编码为 null。
+import json
+from pathlib import Path
+from typing import Any, Union
+
+import orjson
+
+# 两种解码器的错误都是它的实例（orjson.JSONDecodeError 是其子类），也都是 ValueError
+JSONDecodeError = json.JSONDecodeError
+
+# 已经是 str 的长文本（从 SQLite 读出的 TEXT 列）交给标准库解码：它直接扫描 str，
+# orjson 要先转成 UTF-8 再建回 str，中文为主的长文档反而更慢（见 benchmarks/micro_benchmarks.py JSONCodecSuite）
+_STR_DECODE_THRESHOLD = 8192
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """编码成 UTF-8 字节，可以直接作为响应体或写入文件"""
+    return orjson.dumps(value, option=_OPTIONS)
+
+
+def dumps(value: Any) -> str:
+    """编码成字符串，存入数据库的 TEXT 列、拼进 SSE 帧"""
+    return orjson.dumps(value, option=_OPTIONS).decode('utf-8')
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if isinstance(data, str) and len(data) > _STR_DECODE_THRESHOLD:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+def dump_file(value: Any, path: Union[str, Path], indent: bool = True):
+    """写入 JSON 文件；indent 为 True 时缩进两格，和 json.dump(indent=2) 的格式一致，便于人工查看和 diff"""
+    option = _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(value, option=option))
+
+
+def load_file(path: Union[str, Path]) -> Any:
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
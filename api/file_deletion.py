@@ -0,0 +1,125 @@
+# 批量删除文件：在线程池中并行删除，删除前先把路径记入日志，删除失败（或进程中途退出）的路径留在日志里，之后可以重试。
+# 日志是 JSON Lines，每行 {"path", "identity", "attempts", "error"}；多个 uvicorn worker 共用同一个文件，读写时加文件锁。
+# 封面等图片按内容哈希命名，删除失败后同一张图可能又被上传、生成到同一路径。日志里记下记录时文件的
+# inode、修改时间和大小，重试时文件已经不是原来那个就不再删除，直接从日志中移除。
+import fcntl
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import fast_json
+
+DELETE_WORKERS = int(os.getenv("FILE_DELETE_WORKERS", str(min(8, (os.cpu_count() or 1) + 4))))
+JOURNAL_PATH = os.getenv("FILE_DELETE_JOURNAL", os.path.join(os.path.dirname(__file__), "pending_deletes.jsonl"))
+
+
+@contextmanager
+def _locked_journal(path: str):
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_journal(path: str) -> Dict[str, dict]:
+    entries = {}
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    entry = fast_json.loads(line)
+                    entries[entry["path"]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _write_journal(path: str, entries: Dict[str, dict]):
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for entry in entries.values():
+            f.write(fast_json.dumps_bytes(entry) + b"\n")
+    os.replace(tmp_path, path)
+
+
+def _identity(path: str) -> Optional[List[int]]:
+    """[inode, 修改时间(ns), 大小]，文件不存在时为 None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def _remove(entry: dict) -> Optional[str]:
+    """删除日志中的一个文件，返回错误信息；文件本来就不存在、或已被重新写入（不再是要删的那个）都算完成"""
+    path = entry["path"]
+    try:
+        if _identity(path) != entry.get("identity"):
+            return None
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def _delete(targets: List[dict], journal_path: str) -> Dict[str, Optional[str]]:
+    """并行删除并更新日志：成功的从日志中移除，失败的记下错误和尝试次数"""
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as pool:
+        errors = dict(zip((target["path"] for target in targets), pool.map(_remove, targets)))
+
+    with _locked_journal(journal_path):
+        entries = _read_journal(journal_path)
+        for target in targets:
+            path = target["path"]
+            entry = entries.get(path)
+            # 删除期间其他请求为同一路径记了新的文件，那一条留给它自己处理
+            if entry is None or entry.get("identity") != target.get("identity"):
+                continue
+            if errors[path] is None:
+                del entries[path]
+            else:
+                entry["attempts"] += 1
+                entry["error"] = errors[path]
+        _write_journal(journal_path, entries)
+    return errors
+
+
+def delete_files(paths: Iterable[str], journal_path: str = JOURNAL_PATH) -> Dict[str, Optional[str]]:
+    """
+    删除一批文件，返回 {路径: 错误信息}，删除成功的为 None
+
+    删除前先记入日志，进程在删除过程中退出时，没来得及删的文件由 retry_pending 补删。
+    """
+    targets = [{"path": path, "identity": _identity(path), "attempts": 0} for path in dict.fromkeys(paths)]
+    if not targets:
+        return {}
+    with _locked_journal(journal_path):
+        entries = _read_journal(journal_path)
+        for target in targets:
+            if target["identity"] is not None:
+                entries[target["path"]] = dict(target)
+        _write_journal(journal_path, entries)
+    return _delete(targets, journal_path)
+
+
+def retry_pending(journal_path: str = JOURNAL_PATH) -> Dict[str, Optional[str]]:
+    """重试日志中所有未删除的文件，返回本次的结果"""
+    with _locked_journal(journal_path):
+        targets = list(_read_journal(journal_path).values())
+    return _delete(targets, journal_path) if targets else {}
+
+
+def pending(journal_path: str = JOURNAL_PATH) -> List[dict]:
+    """日志中还没删除成功的文件"""
+    with _locked_journal(journal_path):
+        return list(_read_journal(journal_path).values())
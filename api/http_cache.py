@@ -0,0 +1,92 @@
+# HTTP 条件请求：读接口根据数据版本生成强 ETag，客户端带 If-None-Match 且未变化时直接返回 304
+# 版本号只需要一次很小的查询，命中时不再读取完整数据、不再序列化 JSON，响应体也为空。
+# 浏览器的 fetch 会自动保存 ETag 并在下次请求时带上 If-None-Match，前端无需改动。
+import hashlib
+import os
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+import fast_json
+
+# 剧本、证物随时可能被编辑：允许浏览器缓存，但每次使用前都要回源校验（校验命中只返回 304）
+REVALIDATE = os.getenv("HTTP_CACHE_CONTROL", "private, no-cache")
+
+
+class FastJSONResponse(JSONResponse):
+    """用 fast_json（orjson）编码的 JSON 响应，main.py 中设为默认响应类；FastAPI 自带的 ORJSONResponse 已弃用"""
+
+    def render(self, content: Any) -> bytes:
+        return fast_json.dumps_bytes(content)
+
+
+def make_etag(*parts: Any) -> str:
+    """由数据版本（ID、版本号、更新时间等）生成强 ETag；同一版本的数据序列化结果相同，满足强校验语义"""
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match 中任意一个 ETag 与当前版本相同即未变化；按 RFC 9110 用弱比较，忽略 W/ 前缀"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_json(request: Request, etag: str, build: Callable[[], Any],
+                     cache_control: str = REVALIDATE) -> Response:
+    """
+    ETag 未变化时返回 304，否则调用 build() 生成响应内容
+
+    Args:
+        etag: make_etag 生成的当前版本
+        build: 读取并组装完整数据，只在需要返回内容时调用
+        cache_control: Cache-Control 响应头
+    """
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(content=jsonable_encoder(build()), headers=headers)
+
+
+async def conditional_json_async(request: Request, etag: str, build: Callable[[], Awaitable[Any]],
+                                 cache_control: str = REVALIDATE) -> Response:
+    """conditional_json 的异步版本，build 为协程函数（使用 AsyncSession 查询的路由）"""
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(content=jsonable_encoder(await build()), headers=headers)
+
+
+def success_body(key: str, raw_json: bytes) -> bytes:
+    """拼出 {"success": true, key: ...} 的响应体，raw_json 是已经序列化好的内容，不再解析、重新编码"""
+    return b'{"success":true,"' + key.encode('utf-8') + b'":' + raw_json + b'}'
+
+
+def conditional_bytes(request: Request, etag: str, build: Callable[[], bytes],
+                      cache_control: str = REVALIDATE) -> Response:
+    """同 conditional_json，build() 直接返回序列化好的 JSON 字节（如按版本缓存的剧本）"""
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=build(), media_type='application/json', headers=headers)
+
+
+async def conditional_bytes_async(request: Request, etag: str, build: Callable[[], Awaitable[bytes]],
+                                  cache_control: str = REVALIDATE) -> Response:
+    """conditional_bytes 的异步版本"""
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=await build(), media_type='application/json', headers=headers)
@@ -0,0 +1,167 @@
+# 图片入库：把请求中的 data:image/...;base64, 字符串写成 web/public 下的静态文件
+# 分块解码写入同目录的临时文件，边写边算 sha256，完成后以内容哈希命名并用 os.replace 原子落盘。
+# 相同内容只存一份：目标文件已存在时直接复用，丢弃临时文件。
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+PUBLIC_DIR = os.path.join(os.path.dirname(__file__), '..', 'web', 'public')
+
+# 每次解码的 base64 字符数，必须是 4 的倍数
+DECODE_CHUNK_CHARS = 1024 * 1024
+# 写入中的临时文件名前缀；进程中途退出留下的临时文件由 asset_store 的垃圾回收清理
+TEMP_PREFIX = '.ingest-'
+
+# data URL 头部，例如 data:image/png;base64,
+_DATA_URL_HEADER = re.compile(r'data:(image/[\w.+-]+)?((?:;[\w-]+=[^;,]*)*);base64,', re.IGNORECASE)
+_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+# 按内容哈希命名的文件：{prefix}{sha256 前 32 位}.{扩展名}，前缀只含字母和下划线
+_CONTENT_ADDRESSED = re.compile(r'^(?:[A-Za-z]+_)*[0-9a-f]{32}\.(?:png|jpg|webp|gif)$')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ImageIngestError(ValueError):
+    """data URL 格式错误或 base64 内容无法解码"""
+
+
+class StoredImage(NamedTuple):
+    filename: str
+    url_path: str     # 前端使用的路径，如 /script_covers/xxx.png
+    size: int         # 解码后的字节数
+    sha256: str
+    created: bool     # False 表示已存在相同内容的文件，本次没有写入
+
+
+def is_data_url(value) -> bool:
+    return isinstance(value, str) and value.startswith('data:image/')
+
+
+def is_content_addressed(filename: Optional[str]) -> bool:
+    """文件是否按内容哈希命名；这类文件可能被多个剧本/证物共用"""
+    return bool(filename) and bool(_CONTENT_ADDRESSED.match(filename))
+
+
+def store_data_url(data_url: str, subdir: str, prefix: str = '') -> StoredImage:
+    """
+    把 data URL 中的图片保存到 web/public/{subdir}/，文件名为 {prefix}{内容哈希}.{扩展名}
+
+    不做 split(',') 也不一次性 b64decode，内存占用只有一个解码块，和图片大小无关。
+
+    Args:
+        data_url: data:image/...;base64,... 字符串
+        subdir: public 下的子目录，如 'script_covers'
+        prefix: 文件名前缀，如 'script_cover_'
+
+    Raises:
+        ImageIngestError: 不是 base64 图片 data URL，或内容无法解码
+    """
+    header = _DATA_URL_HEADER.match(data_url, 0, 256)
+    if not header:
+        raise ImageIngestError("不是 base64 编码的图片 data URL")
+    extension = _EXTENSIONS.get((header.group(1) or '').lower(), 'png')
+    return _write_content_addressed(_decode_chunks(data_url, header.end()), subdir, prefix, extension)
+
+
+def store_base64(base64_data: str, subdir: str, prefix: str = '', extension: str = 'png') -> StoredImage:
+    """保存不带 data: 头的 base64 图片（图片生成接口的返回值），其余同 store_data_url"""
+    return _write_content_addressed(_decode_chunks(base64_data, 0), subdir, prefix, extension)
+
+
+def store_bytes(data: bytes, subdir: str, prefix: str = '', extension: str = 'png') -> StoredImage:
+    """保存已在内存中的图片数据；先算哈希，已有相同内容时不写文件"""
+    if not data:
+        raise ImageIngestError("图片内容为空")
+    sha256 = hashlib.sha256(data).hexdigest()
+    filename = f"{prefix}{sha256[:32]}.{extension}"
+    if _reuse(os.path.join(PUBLIC_DIR, subdir, filename)):
+        return StoredImage(filename, f"/{subdir}/{filename}", len(data), sha256, False)
+    return _write_content_addressed([data], subdir, prefix, extension)
+
+
+def _reuse(final_path: str) -> bool:
+    """相同内容的文件已存在时刷新其修改时间并返回 True；垃圾回收按修改时间留出宽限期，避免删掉马上要被引用的文件"""
+    try:
+        os.utime(final_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _decode_chunks(text: str, start: int) -> Iterator[bytes]:
+    """从 text[start:] 开始分块解码 base64"""
+    pending = ''
+    for offset in range(start, len(text), DECODE_CHUNK_CHARS):
+        chunk = pending + text[offset:offset + DECODE_CHUNK_CHARS]
+        # 有的客户端会按行折断 base64
+        if _WHITESPACE.search(chunk):
+            chunk = _WHITESPACE.sub('', chunk)
+        # 不足 4 个字符的尾部留到下一块一起解码
+        usable = len(chunk) - len(chunk) % 4
+        pending = chunk[usable:]
+        yield _decode(chunk[:usable])
+    if pending:
+        yield _decode(pending + '=' * (-len(pending) % 4))
+
+
+def _write_content_addressed(chunks: Iterable[bytes], subdir: str, prefix: str, extension: str) -> StoredImage:
+    """把数据块写入临时文件并计算哈希，再按哈希命名原子落盘；相同内容的文件已存在时丢弃临时文件"""
+    target_dir = os.path.join(PUBLIC_DIR, subdir)
+    os.makedirs(target_dir, exist_ok=True)
+    # 临时文件放在目标目录里，保证 os.replace 在同一文件系统内是原子的
+    fd, temp_path = tempfile.mkstemp(dir=target_dir, prefix=TEMP_PREFIX, suffix='.tmp')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for data in chunks:
+                digest.update(data)
+                size += len(data)
+                f.write(data)
+        if size == 0:
+            raise ImageIngestError("图片内容为空")
+
+        sha256 = digest.hexdigest()
+        filename = f"{prefix}{sha256[:32]}.{extension}"
+        final_path = os.path.join(target_dir, filename)
+        created = not _reuse(final_path)
+        if created:
+            os.replace(temp_path, final_path)
+        else:
+            os.remove(temp_path)
+        return StoredImage(filename, f"/{subdir}/{filename}", size, sha256, created)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def remove_image(subdir: str, filename: Optional[str]) -> bool:
+    """
+    删除 web/public/{subdir}/ 下的图片，返回是否删除了文件
+
+    按内容哈希命名的文件可能仍被其他剧本或另一个数据库引用，这里不删除。
+    """
+    if not filename or is_content_addressed(filename):
+        return False
+    file_path = os.path.join(PUBLIC_DIR, subdir, os.path.basename(filename))
+    if os.path.exists(file_path):
+        os.remove(file_path)
+        return True
+    return False
+
+
+def _decode(chunk: str) -> bytes:
+    try:
+        return base64.b64decode(chunk, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ImageIngestError(f"base64 内容无法解码: {e}")
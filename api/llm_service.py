@@ -4,6 +4,9 @@ from datetime import datetime, timezone
 from invoke_types import InvocationRequest, Actor, LLMMessage
 from settings import MODEL, MODEL_KEY, MAX_TOKENS, INFERENCE_SERVICE, API_KEY, OLLAMA_URL, GROQ_API_BASE, OPENROUTER_API_BASE, OPENAI_API_BASE
 import json
+import tracing
+import metrics
+import mock_llm
 import anthropic
 import openai
 import requests
@@ -266,6 +269,15 @@ def invoke_ollama(system_prompt: str, messages: list[LLMMessage]):
     result = response.json()
     return result['response'], None, None  # Ollama doesn't provide token counts
 
+# 支持流式输出的推理服务
+STREAMING_SERVICES = ['openai', 'groq', 'openrouter', 'mock']
+
+def invoke_stream(system_prompt: str, messages: list[LLMMessage], temperature: float = 0.7):
+    """按推理服务选择流式调用"""
+    if INFERENCE_SERVICE == 'mock':
+        return mock_llm.invoke_mock_stream("initial", system_prompt, messages)
+    return invoke_openai_stream(system_prompt, messages, temperature)
+
 def invoke_ai(conn,
               turn_id: int,
               prompt_role: str,
@@ -273,33 +285,45 @@ def invoke_ai(conn,
               messages: list[LLMMessage],
               temperature: float = 0.7):
 
-    started_at = datetime.now(timezone.utc)
+    with tracing.span(f"llm.{prompt_role}", prompt_role=prompt_role, model_key=MODEL_KEY,
+                      inference_service=INFERENCE_SERVICE) as llm_span:
+        started_at = datetime.now(timezone.utc)
+        provider_start = time.perf_counter()
 
-    if INFERENCE_SERVICE == 'anthropic':
-        text_response, input_tokens, output_tokens = invoke_anthropic(system_prompt, messages)
-    elif INFERENCE_SERVICE in ['openai', 'groq', 'openrouter']:
-        text_response, input_tokens, output_tokens = invoke_openai(system_prompt, messages, temperature)
-    elif INFERENCE_SERVICE == 'ollama':
-        text_response, input_tokens, output_tokens = invoke_ollama(system_prompt, messages)
-    else:
-        raise ValueError(f"Unknown inference service: {INFERENCE_SERVICE}")
-
-    finished_at = datetime.now(timezone.utc)
-
-    if conn is not None:
-        with conn.cursor() as cur:
-            total_tokens = (input_tokens or 0) + (output_tokens or 0)
-            # Convert LLMMessage objects to dictionaries
-            serialized_messages = [msg.model_dump() for msg in messages]
-            cur.execute(
-                "INSERT INTO ai_invocations (conversation_turn_id, model, model_key, prompt_messages, system_prompt, prompt_role, "
-                "input_tokens, output_tokens, total_tokens, response, started_at, finished_at) "
-                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                (turn_id, MODEL, MODEL_KEY, json.dumps(serialized_messages), system_prompt, prompt_role,
-                 input_tokens, output_tokens, total_tokens,
-                 text_response, started_at, finished_at)
-            )   
-            conn.commit()
+        try:
+            if INFERENCE_SERVICE == 'anthropic':
+                text_response, input_tokens, output_tokens = invoke_anthropic(system_prompt, messages)
+            elif INFERENCE_SERVICE in ['openai', 'groq', 'openrouter']:
+                text_response, input_tokens, output_tokens = invoke_openai(system_prompt, messages, temperature)
+            elif INFERENCE_SERVICE == 'ollama':
+                text_response, input_tokens, output_tokens = invoke_ollama(system_prompt, messages)
+            elif INFERENCE_SERVICE == 'mock':
+                text_response, input_tokens, output_tokens = mock_llm.invoke_mock(prompt_role, system_prompt, messages)
+            else:
+                raise ValueError(f"Unknown inference service: {INFERENCE_SERVICE}")
+        except Exception:
+            metrics.LLM_ERRORS.labels(prompt_role, MODEL_KEY).inc()
+            raise
+
+        latency = time.perf_counter() - provider_start
+        tracing.record_llm_usage(llm_span, latency, input_tokens, output_tokens)
+        metrics.observe_llm_call(prompt_role, MODEL_KEY, latency, input_tokens, output_tokens)
+        finished_at = datetime.now(timezone.utc)
+
+        if conn is not None:
+            with tracing.span("db.log_invocation"), conn.cursor() as cur:
+                total_tokens = (input_tokens or 0) + (output_tokens or 0)
+                # Convert LLMMessage objects to dictionaries
+                serialized_messages = [msg.model_dump() for msg in messages]
+                cur.execute(
+                    "INSERT INTO ai_invocations (conversation_turn_id, model, model_key, prompt_messages, system_prompt, prompt_role, "
+                    "input_tokens, output_tokens, total_tokens, response, started_at, finished_at) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    (turn_id, MODEL, MODEL_KEY, json.dumps(serialized_messages), system_prompt, prompt_role,
+                     input_tokens, output_tokens, total_tokens,
+                     text_response, started_at, finished_at)
+                )   
+                conn.commit()
 
     return text_response
 
@@ -308,40 +332,68 @@ def respond_initial(conn, turn_id: int,
 
     print(f"\nrequest.actor.messages {request.actor.messages}")
 
+    with tracing.span("system_prompt"):
+        system_prompt = get_system_prompt(request)
+
     return invoke_ai(
         conn,
         turn_id,
         "initial",
-        system_prompt=get_system_prompt(request),
+        system_prompt=system_prompt,
         messages=request.actor.messages,
         temperature=request.temperature,
     )
 
-def respond_initial_stream(conn, turn_id: int, request: InvocationRequest):
-    """流式版本的初始响应"""
+def respond_initial_stream(conn, turn_id: int, request: InvocationRequest, trace: "tracing.Trace" = None):
+    """流式版本的初始响应
+
+    流式生成器在线程池中逐块迭代，拿不到请求上下文里的当前链路，所以由调用方显式传入 trace。
+    """
     print(f"\nrequest.actor.messages {request.actor.messages}")
+
+    with tracing.span("system_prompt", trace=trace):
+        system_prompt = get_system_prompt(request)
     
-    if INFERENCE_SERVICE in ['openai', 'groq', 'openrouter']:
-        full_content = ""
-        for chunk in invoke_openai_stream(get_system_prompt(request), request.actor.messages, request.temperature):
-            full_content += chunk
-            yield chunk
-        
-        # 保存完整响应到数据库
-        if conn is not None:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO ai_invocations (conversation_turn_id, model, model_key, prompt_messages, system_prompt, prompt_role, "
-                    "input_tokens, output_tokens, total_tokens, response, started_at, finished_at) "
-                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                    (turn_id, MODEL, MODEL_KEY, json.dumps([msg.model_dump() for msg in request.actor.messages]), 
-                     get_system_prompt(request), "initial", 0, 0, 0, full_content, 
-                     datetime.now(timezone.utc), datetime.now(timezone.utc))
-                )
-                conn.commit()
+    if INFERENCE_SERVICE in STREAMING_SERVICES:
+        with tracing.span("llm.initial", trace=trace, prompt_role="initial", model_key=MODEL_KEY,
+                          inference_service=INFERENCE_SERVICE, streaming=True) as llm_span:
+            started_at = datetime.now(timezone.utc)
+            provider_start = time.perf_counter()
+            ttft = None
+            chunk_count = 0
+            full_content = ""
+            try:
+                for chunk in invoke_stream(system_prompt, request.actor.messages, request.temperature):
+                    if ttft is None:
+                        ttft = time.perf_counter() - provider_start
+                    chunk_count += 1
+                    full_content += chunk
+                    yield chunk
+            except Exception:
+                metrics.LLM_ERRORS.labels("initial", MODEL_KEY).inc()
+                raise
+            # 流式接口不返回用量，按增量块数近似输出 token 数
+            latency = time.perf_counter() - provider_start
+            tracing.record_llm_usage(llm_span, latency, None, chunk_count, ttft_s=ttft)
+            metrics.observe_llm_call("initial", MODEL_KEY, latency, None, chunk_count, ttft_s=ttft)
+            finished_at = datetime.now(timezone.utc)
+
+            # 保存完整响应到数据库
+            if conn is not None:
+                with tracing.span("db.log_invocation", trace=trace), conn.cursor() as cur:
+                    cur.execute(
+                        "INSERT INTO ai_invocations (conversation_turn_id, model, model_key, prompt_messages, system_prompt, prompt_role, "
+                        "input_tokens, output_tokens, total_tokens, response, started_at, finished_at) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                        (turn_id, MODEL, MODEL_KEY, json.dumps([msg.model_dump() for msg in request.actor.messages]), 
+                         system_prompt, "initial", 0, 0, 0, full_content, 
+                         started_at, finished_at)
+                    )
+                    conn.commit()
     else:
         # 对于不支持流式的服务，回退到普通调用
-        response = invoke_ai(conn, turn_id, "initial", get_system_prompt(request), request.actor.messages, request.temperature)
+        with tracing.use_trace(trace):
+            response = invoke_ai(conn, turn_id, "initial", system_prompt, request.actor.messages, request.temperature)
         yield response
 
 def get_critique_prompt(
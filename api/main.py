@@ -1,8 +1,8 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse, HTMLResponse
-import markdown2
+from fastapi.responses import StreamingResponse, HTMLResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from invoke_types import InvocationRequest, InvocationResponse
 from db import pool
 from scripts_api import router as scripts_router
@@ -10,21 +10,45 @@ from simple_db_api import router as simple_db_router
 from spoiler_story_api import router as spoiler_story_router
 from evidence_api import router as evidence_router
 from database_api import router as database_router
+from assets_api import router as assets_router
+import asset_store
+import file_deletion
+from image_ingest import is_content_addressed
 import json
 import os
 import base64
-import re
+import shutil
 from settings import MODEL, MODEL_KEY
 from llm_service import respond_initial, critique, refine, check_whether_to_refine, respond_initial_stream
 from avatar_generator import generate_avatar_for_character
 from cover_generator import generate_cover_for_script
 from background_generator import generate_background_for_character
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 import time
+import tracing
+import metrics
+from compression import CompressionMiddleware
+from http_cache import FastJSONResponse
+from docs_renderer import render_doc_page
+from sse_utils import sse_chunk, sse_end, sse_error
 from pydantic import BaseModel
 from typing import Optional
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 上次删除失败或进程中途退出而没删掉的文件，启动时补删
+    retried = await run_in_threadpool(file_deletion.retry_pending)
+    if retried:
+        failed = sum(1 for error in retried.values() if error)
+        print(f"🗑️ 补删日志中的文件: {len(retried)} 个，仍失败 {failed} 个")
+    yield
+    metrics.mark_process_dead()
+    from simple_db import simple_db
+    simple_db.close()
+
+# 接口返回的 dict 统一用 orjson 编码（中文不转义、比标准库 json 快数倍），见 fast_json.py
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 origins = [
     "*"
@@ -37,6 +61,9 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 剧本、剧透故事等大响应按 Accept-Encoding 压缩，SSE 流式输出不经过压缩，见 compression.py
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.PrometheusMiddleware)
 
 # 配置静态文件服务
 web_dir = os.path.join(os.path.dirname(__file__), '..', 'web')
@@ -72,6 +99,7 @@ app.include_router(simple_db_router, tags=["simple_database"])
 app.include_router(spoiler_story_router, tags=["spoiler_stories"])
 app.include_router(evidence_router, tags=["evidence"])
 app.include_router(database_router, tags=["database"])
+app.include_router(assets_router, tags=["assets"])
 
 # 头像生成请求模型
 class AvatarGenerationRequest(BaseModel):
@@ -94,6 +122,23 @@ class BackgroundGenerationRequest(BaseModel):
     character_personality: str
     character_context: str = ""
 
+# 上传文件扩展名 -> 保存时使用的扩展名和 PIL 格式
+_PIL_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'webp': 'WEBP', 'gif': 'GIF'}
+COVER_ASSETS_DIR = asset_store.COVER_ASSETS_DIR
+
+def _image_extension(filename: Optional[str]) -> str:
+    """取上传文件名的扩展名，不认识的按 png 处理"""
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else 'png'
+    extension = 'jpg' if extension == 'jpeg' else extension
+    return extension if extension in _PIL_FORMATS else 'png'
+
+def _copy_cover_to_assets(cover_filename: str):
+    """旧的封面列表接口还会读 src/assets 目录，保留一份同名副本；文件名即内容哈希，已存在就不用再复制"""
+    assets_path = os.path.join(COVER_ASSETS_DIR, cover_filename)
+    if not os.path.exists(assets_path):
+        os.makedirs(COVER_ASSETS_DIR, exist_ok=True)
+        shutil.copyfile(os.path.join(public_dir, 'script_covers', cover_filename), assets_path)
+
 @app.post("/generate_avatar")
 async def generate_avatar(request: AvatarGenerationRequest):
     """
@@ -103,10 +148,12 @@ async def generate_avatar(request: AvatarGenerationRequest):
         print(f'🎭 收到头像生成请求: {request.character_name}')
         
         # 调用头像生成器（只使用名称和背景，不使用性格）
-        base64_image = generate_avatar_for_character(
-            request.character_name,
-            request.character_bio
-        )
+        with metrics.track_image_generation("avatar") as outcome:
+            base64_image = generate_avatar_for_character(
+                request.character_name,
+                request.character_bio
+            )
+            outcome["success"] = bool(base64_image)
         
         if base64_image:
             # 确保头像目录存在（使用与静态文件服务相同的路径配置）
@@ -161,35 +208,20 @@ async def generate_cover(request: CoverGenerationRequest):
         print(f'🎬 开始为剧本生成封面: {request.script_title}')
         
         # 调用封面生成器
-        base64_image = generate_cover_for_script(
-            request.script_title, 
-            request.script_description
-        )
+        with metrics.track_image_generation("cover") as outcome:
+            base64_image = generate_cover_for_script(
+                request.script_title, 
+                request.script_description
+            )
+            outcome["success"] = bool(base64_image)
         
         if base64_image:
-            # 生成唯一文件名
-            timestamp = int(time.time() * 1000)
-            cover_filename = f"script_cover_{timestamp}.png"
-            
-            # 保存到两个位置：assets目录和public目录
-            cover_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'src', 'assets', 'script_covers')
-            public_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'script_covers')
-            
-            cover_path = os.path.join(cover_dir, cover_filename)
-            public_path = os.path.join(public_dir, cover_filename)
+            # 按内容哈希保存到public目录，assets目录保留同名副本
+            stored = asset_store.put_base64('cover', base64_image)
+            cover_filename = stored.filename
+            _copy_cover_to_assets(cover_filename)
             
-            # 确保目录存在
-            os.makedirs(cover_dir, exist_ok=True)
-            os.makedirs(public_dir, exist_ok=True)
-            
-            # 解码base64并保存到两个位置
-            image_data = base64.b64decode(base64_image)
-            with open(cover_path, 'wb') as f:
-                f.write(image_data)
-            with open(public_path, 'wb') as f:
-                f.write(image_data)
-            
-            print(f'✅ 封面已保存: {cover_path} 和 {public_path}')
+            print(f'✅ 封面已保存: {cover_filename}')
             
             return {
                 "success": True,
@@ -233,7 +265,9 @@ async def generate_background(request: BackgroundGenerationRequest):
         )
         
         # 生成背景图片
-        result = generate_background_for_character(actor)
+        with metrics.track_image_generation("background") as outcome:
+            result = generate_background_for_character(actor)
+            outcome["success"] = bool(result)
         
         if result:
             # 检查返回的是路径还是base64数据
@@ -302,30 +336,13 @@ async def upload_cover(request: CoverUploadRequest):
     try:
         print(f'🖼️ 开始上传剧本封面: {request.script_id}')
         
-        # 生成唯一文件名
-        timestamp = int(time.time() * 1000)
-        file_extension = request.filename.split('.')[-1] if '.' in request.filename else 'png'
-        cover_filename = f"script_cover_{request.script_id}_{timestamp}.{file_extension}"
-        
-        # 保存到两个位置：assets目录和public目录
-        cover_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'src', 'assets', 'script_covers')
-        public_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'script_covers')
-        
-        cover_path = os.path.join(cover_dir, cover_filename)
-        public_path = os.path.join(public_dir, cover_filename)
+        # 按内容哈希保存，重复上传同一张图片不会产生新文件
+        file_extension = _image_extension(request.filename)
+        stored = asset_store.put_base64('cover', request.base64_image, file_extension)
+        cover_filename = stored.filename
+        _copy_cover_to_assets(cover_filename)
         
-        # 确保目录存在
-        os.makedirs(cover_dir, exist_ok=True)
-        os.makedirs(public_dir, exist_ok=True)
-        
-        # 解码base64并保存到两个位置
-        image_data = base64.b64decode(request.base64_image)
-        with open(cover_path, 'wb') as f:
-            f.write(image_data)
-        with open(public_path, 'wb') as f:
-            f.write(image_data)
-        
-        print(f'✅ 封面上传成功: {cover_path} 和 {public_path}')
+        print(f'✅ 封面上传成功: {cover_filename}' if stored.created else f'✅ 复用已有封面: {cover_filename}')
         
         return {
             "success": True,
@@ -474,6 +491,9 @@ async def delete_cover_images(request: CoverDeleteRequest):
     """
     批量删除封面图片
     
+    assets 和 public 两个目录下的文件在线程池中并行删除；删除失败的文件记在删除日志里，
+    可以通过 /delete_cover_images/retry 重试，进程启动时也会自动重试。
+    
     Args:
         request: 包含要删除的文件名列表的请求
         
@@ -487,31 +507,27 @@ async def delete_cover_images(request: CoverDeleteRequest):
         cover_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'src', 'assets', 'script_covers')
         public_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'script_covers')
         
-        deleted_files = []
         failed_files = []
-        
+        paths = {}
         for filename in request.filenames:
-            try:
-                # 删除assets目录中的文件
-                cover_path = os.path.join(cover_dir, filename)
-                if os.path.exists(cover_path):
-                    os.remove(cover_path)
-                    print(f'✅ 已删除assets文件: {filename}')
-                
-                # 删除public目录中的文件
-                public_path = os.path.join(public_dir, filename)
-                if os.path.exists(public_path):
-                    os.remove(public_path)
-                    print(f'✅ 已删除public文件: {filename}')
-                
+            # 只接受文件名，不允许带目录跳出封面目录
+            if not filename or os.path.basename(filename) != filename or filename in ('.', '..'):
+                failed_files.append({"filename": filename, "error": "无效的文件名"})
+                continue
+            paths[filename] = [os.path.join(cover_dir, filename), os.path.join(public_dir, filename)]
+        
+        errors = await run_in_threadpool(
+            file_deletion.delete_files, [path for file_paths in paths.values() for path in file_paths]
+        )
+        
+        deleted_files = []
+        for filename, file_paths in paths.items():
+            file_errors = [errors[path] for path in file_paths if errors[path]]
+            if file_errors:
+                print(f'❌ 删除文件失败 {filename}: {file_errors[0]}')
+                failed_files.append({"filename": filename, "error": file_errors[0]})
+            else:
                 deleted_files.append(filename)
-                
-            except Exception as e:
-                print(f'❌ 删除文件失败 {filename}: {str(e)}')
-                failed_files.append({
-                    "filename": filename,
-                    "error": str(e)
-                })
         
         print(f'🎯 批量删除完成: 成功 {len(deleted_files)} 个，失败 {len(failed_files)} 个')
         
@@ -526,6 +542,24 @@ async def delete_cover_images(request: CoverDeleteRequest):
         print(f'❌ 批量删除封面图片异常: {str(e)}')
         raise HTTPException(status_code=500, detail=f"批量删除封面图片失败: {str(e)}")
 
+@app.post("/delete_cover_images/retry")
+async def retry_delete_cover_images():
+    """重试删除日志中还没删掉的文件，返回本次结果和仍未删除的文件"""
+    try:
+        errors = await run_in_threadpool(file_deletion.retry_pending)
+        pending = await run_in_threadpool(file_deletion.pending)
+        
+        return {
+            "success": True,
+            "retried": len(errors),
+            "deleted": sum(1 for error in errors.values() if error is None),
+            "pending": pending
+        }
+        
+    except Exception as e:
+        print(f'❌ 重试删除文件异常: {str(e)}')
+        raise HTTPException(status_code=500, detail=f"重试删除文件失败: {str(e)}")
+
 def create_conversation_turn(conn, request: InvocationRequest) -> int:
     if conn is None:
         return 0
@@ -547,22 +581,39 @@ def create_conversation_turn(conn, request: InvocationRequest) -> int:
         print(f"Error in create_conversation_turn: {e}")
         return 0
 
-def store_response(conn, turn_id: int, response: InvocationResponse):
+def store_response(conn, turn_id: int, response: InvocationResponse, stage_timings: Optional[dict] = None):
     try:
         with conn.cursor() as cur:
             cur.execute(
                "UPDATE conversation_turns SET original_response = %s, critique_response = %s, problems_detected = %s, "
-               "final_response = %s, refined_response = %s, finished_at= %s WHERE id=%s",
+               "final_response = %s, refined_response = %s, stage_timings = %s, finished_at= %s WHERE id=%s",
                   (response.original_response, response.critique_response, response.problems_detected, response.final_response,
-                    response.refined_response, datetime.now(tz=timezone.utc).isoformat(), turn_id, )
+                    response.refined_response, json.dumps(stage_timings) if stage_timings else None,
+                    datetime.now(tz=timezone.utc).isoformat(), turn_id, )
             )
         conn.commit()
     except Exception as e:
         conn.rollback()
         print(f"Error in store_response: {e}")
 
+def store_stage_timings(conn, turn_id: int, stage_timings: dict):
+    """流式轮次没有完整的 InvocationResponse，结束时只回写各阶段耗时"""
+    if conn is None or not turn_id:
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE conversation_turns SET stage_timings = %s, finished_at = %s WHERE id = %s",
+                (json.dumps(stage_timings), datetime.now(tz=timezone.utc).isoformat(), turn_id, )
+            )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error in store_stage_timings: {e}")
+
 def prompt_ai(conn, request: InvocationRequest) -> InvocationResponse:
-    turn_id = create_conversation_turn(conn, request)
+    with tracing.span("db.create_turn"):
+        turn_id = create_conversation_turn(conn, request)
     print(f"Serving turn {turn_id}")
 
     # UNREFINED
@@ -575,6 +626,7 @@ def prompt_ai(conn, request: InvocationRequest) -> InvocationResponse:
     print(f"\ncritique_response: {critique_response}\n")
 
     problems_found = check_whether_to_refine(critique_response)
+    metrics.REFINE_DECISIONS.labels(MODEL_KEY, str(problems_found).lower()).inc()
 
     if problems_found:
         refined_response = refine(conn, turn_id, request, critique_response, unrefined_response)
@@ -593,78 +645,133 @@ def prompt_ai(conn, request: InvocationRequest) -> InvocationResponse:
     )
 
     if conn is not None:
-        store_start = time.time()
-        store_response(conn, turn_id, response)
-        print(f"Stored in {time.time() - store_start:.2f}s")
+        # 写库前的各阶段耗时随结果一并保存，写库本身的耗时只进入导出的链路
+        trace = tracing.current_trace()
+        stage_timings = trace.summary() if trace else None
+        with tracing.span("db.store_response"):
+            store_response(conn, turn_id, response, stage_timings)
 
     return response
 
 @app.post("/invoke")
 async def invoke(request: InvocationRequest):
-    start_time = time.time()
     connection_pool = pool()
     
     conn = None
-    try:
-        # Use a mock connection object or None if the pool is not available
-        conn = connection_pool.getconn() if connection_pool else None
-        
-        conn_time = time.time()
-        print(f"Conn in {conn_time - start_time:.2f}s")
-        response = prompt_ai(conn, request)
-        response_time = time.time()
-        print(f"Response in {response_time - conn_time:.2f}s")
+    with tracing.trace_turn("invoke", session_id=request.session_id, actor_name=request.actor.name,
+                            model_key=MODEL_KEY, streaming=False):
+        try:
+            # Use a mock connection object or None if the pool is not available
+            with tracing.span("pool_checkout"):
+                conn = connection_pool.getconn() if connection_pool else None
+            metrics.set_db_pool_stats(connection_pool)
 
-        return response.model_dump()
-    finally:
-        if conn:
-            connection_pool.putconn(conn)
+            response = prompt_ai(conn, request)
+
+            return response.model_dump()
+        finally:
+            if conn:
+                connection_pool.putconn(conn)
+            metrics.set_db_pool_stats(connection_pool)
 
 @app.post("/invoke/stream")
 async def invoke_stream(request: InvocationRequest):
     """流式版本的invoke端点"""
-    start_time = time.time()
     connection_pool = pool()
+    trace = tracing.Trace("invoke_stream", session_id=request.session_id, actor_name=request.actor.name,
+                          model_key=MODEL_KEY, streaming=True)
     
     conn = None
     try:
-        conn = connection_pool.getconn() if connection_pool else None
+        with trace.span("pool_checkout"):
+            conn = connection_pool.getconn() if connection_pool else None
+        metrics.set_db_pool_stats(connection_pool)
         
         # 创建对话轮次
-        turn_id = create_conversation_turn(conn, request)
+        with trace.span("db.create_turn"):
+            turn_id = create_conversation_turn(conn, request)
         print(f"Serving turn {turn_id} (streaming)")
-        
-        def generate_response():
-            try:
-                # 使用流式响应
-                for chunk in respond_initial_stream(conn, turn_id, request):
-                    # 发送SSE格式的数据
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
-                
-                # 发送结束信号
-                yield f"data: {json.dumps({'type': 'end'})}\n\n"
-                
-            except Exception as e:
-                print(f"Error in streaming response: {e}")
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-        
-        return StreamingResponse(
-            generate_response(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Content-Type": "text/event-stream",
-            }
-        )
-    finally:
+    except Exception:
         if conn:
             connection_pool.putconn(conn)
+        trace.finish()
+        raise
+    
+    def generate_response():
+        metrics.SSE_STREAMS_IN_FLIGHT.inc()
+        try:
+            # 使用流式响应
+            for chunk in respond_initial_stream(conn, turn_id, request, trace=trace):
+                # 发送SSE格式的数据
+                yield sse_chunk(chunk)
+            
+            # 发送结束信号
+            yield sse_end()
+            
+        except Exception as e:
+            print(f"Error in streaming response: {e}")
+            trace.root.status = "error"
+            yield sse_error(str(e))
+        finally:
+            metrics.SSE_STREAMS_IN_FLIGHT.dec()
+            # 连接要在流结束后才归还，生成器里还会用它记录调用
+            store_stage_timings(conn, turn_id, trace.summary())
+            if conn:
+                connection_pool.putconn(conn)
+            metrics.set_db_pool_stats(connection_pool)
+            trace.finish()
+    
+    return StreamingResponse(
+        generate_response(),
+        media_type="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Content-Type": "text/event-stream",
+        }
+    )
 
 @app.get("/health")
 async def health_check():
-    # TODO: Implement a better health check mechanism here
-    return {"status": "ok"}
+    """检查各存储后端是否可用，任一失败返回 503"""
+    checks = {}
+
+    try:
+        from simple_db import simple_db
+        simple_db.ping()
+        checks["simple_db"] = "ok"
+    except Exception as e:
+        checks["simple_db"] = f"error: {e}"
+
+    try:
+        from sqlalchemy import text
+        from models import async_engine
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        checks["orm_db"] = "ok"
+    except Exception as e:
+        checks["orm_db"] = f"error: {e}"
+
+    connection_pool = pool()
+    if connection_pool is not None:
+        try:
+            with connection_pool.connection(timeout=2) as conn:
+                conn.execute("SELECT 1")
+            checks["postgres"] = "ok"
+        except Exception as e:
+            checks["postgres"] = f"error: {e}"
+
+    healthy = all(value == "ok" for value in checks.values())
+    return FastJSONResponse(
+        status_code=200 if healthy else 503,
+        content={"status": "ok" if healthy else "degraded", "checks": checks}
+    )
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 抓取端点（多 worker 时汇总所有进程）"""
+    content, content_type = metrics.render_latest()
+    return Response(content=content, media_type=content_type)
 
 # 证物图像生成和管理API
 @app.post("/generate-evidence-image")
@@ -686,26 +793,17 @@ async def generate_evidence_image(request: dict):
         print(f"🔍 开始生成证物图像: {name}")
         
         # 调用新的证物图像生成器
-        base64_image = generate_evidence_image_for_item(name, description, style)
+        with metrics.track_image_generation("evidence") as outcome:
+            base64_image = generate_evidence_image_for_item(name, description, style)
+            outcome["success"] = bool(base64_image)
         
         if base64_image:
-            # 确保证物图像目录存在
-            evidence_dir = "../web/public/evidence_images"
-            os.makedirs(evidence_dir, exist_ok=True)
-            
-            # 生成唯一文件名
-            timestamp = str(int(time.time() * 1000))
-            safe_name = re.sub(r'[^\w\-_]', '_', name)
-            filename = f"evidence_{safe_name}_{timestamp}.png"
-            filepath = os.path.join(evidence_dir, filename)
-            
-            # 保存base64图像为文件
+            # 按内容哈希保存base64图像
             try:
-                image_data = base64.b64decode(base64_image)
-                with open(filepath, 'wb') as f:
-                    f.write(image_data)
+                stored = asset_store.put_base64('evidence', base64_image)
+                filename = stored.filename
                 
-                print(f"✅ 证物图像保存成功: {filepath}")
+                print(f"✅ 证物图像保存成功: {filename}")
                 
                 return {
                     "success": True,
@@ -743,25 +841,20 @@ async def upload_evidence_image(file: UploadFile = File(...), name: str = Form(.
         if len(file_content) > 5 * 1024 * 1024:
             return {"success": False, "error": "图片大小不能超过 5MB"}
         
-        # 确保证物图像目录存在
-        evidence_dir = "web/public/evidence_images"
-        os.makedirs(evidence_dir, exist_ok=True)
-        
-        # 生成文件名
-        timestamp = str(int(time.time() * 1000))
-        safe_name = re.sub(r'[^\w\-_]', '_', name)
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'png'
-        filename = f"evidence_{safe_name}_{timestamp}.{file_extension}"
-        filepath = os.path.join(evidence_dir, filename)
-        
-        # 压缩并保存图像
+        # 压缩图像
+        file_extension = _image_extension(file.filename)
         image = Image.open(io.BytesIO(file_content))
         if image.mode in ('RGBA', 'LA', 'P'):
             image = image.convert('RGB')
         
         # 调整尺寸
         image.thumbnail((512, 512), Image.Resampling.LANCZOS)
-        image.save(filepath, optimize=True, quality=85)
+        buffer = io.BytesIO()
+        image.save(buffer, format=_PIL_FORMATS[file_extension], optimize=True, quality=85)
+        
+        # 按内容哈希保存，同一张图片重复上传只存一份
+        stored = asset_store.put_bytes('evidence', buffer.getvalue(), file_extension)
+        filename = stored.filename
         
         return {
             "success": True,
@@ -787,9 +880,11 @@ async def delete_evidence_image(request: dict):
         if not image_name.startswith('evidence_'):
             return {"success": False, "error": "只能删除证物图像"}
         
-        filepath = f"web/public/evidence_images/{image_name}"
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        # 按内容哈希命名的图片可能被其他证物共用，不在这里删除，没有引用后由 /assets/gc 回收
+        if is_content_addressed(image_name):
+            return {"success": True}
+        
+        if asset_store.release('evidence', image_name):
             return {"success": True}
         else:
             return {"success": False, "error": "图像文件不存在"}
@@ -872,139 +967,8 @@ async def get_rendered_doc(doc_name: str):
         with open(doc_path, 'r', encoding='utf-8') as f:
             markdown_content = f.read()
         
-        # 渲染为 HTML
-        html_content = markdown2.markdown(
-            markdown_content, 
-            extras=[
-                'fenced-code-blocks',  # 代码块支持
-                'tables',              # 表格支持
-                'task_list',           # 任务列表支持
-                'toc',                 # 目录支持
-                'header-ids',          # 标题ID支持
-                'code-friendly'        # 代码友好
-            ]
-        )
-        
-        # 创建美观的 HTML 页面
-        full_html = f"""
-        <!DOCTYPE html>
-        <html lang="zh-CN">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{doc_name} - 项目文档</title>
-            <style>
-                body {{
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', 'Helvetica Neue', Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: 20px;
-                    background-color: #fafafa;
-                }}
-                .container {{
-                    background: white;
-                    padding: 40px;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                }}
-                h1, h2, h3, h4, h5, h6 {{
-                    color: #2c3e50;
-                    margin-top: 2em;
-                    margin-bottom: 1em;
-                }}
-                h1 {{
-                    border-bottom: 3px solid #3498db;
-                    padding-bottom: 10px;
-                }}
-                h2 {{
-                    border-bottom: 2px solid #ecf0f1;
-                    padding-bottom: 8px;
-                }}
-                code {{
-                    background-color: #f8f9fa;
-                    padding: 2px 6px;
-                    border-radius: 4px;
-                    font-family: 'SFMono-Regular', Consolas, 'Liberation Mono', Menlo, monospace;
-                    color: #e74c3c;
-                }}
-                pre {{
-                    background-color: #2c3e50;
-                    color: #ecf0f1;
-                    padding: 20px;
-                    border-radius: 8px;
-                    overflow-x: auto;
-                    margin: 20px 0;
-                }}
-                pre code {{
-                    background: none;
-                    color: inherit;
-                    padding: 0;
-                }}
-                blockquote {{
-                    border-left: 4px solid #3498db;
-                    margin: 20px 0;
-                    padding: 10px 20px;
-                    background-color: #ecf0f1;
-                    font-style: italic;
-                }}
-                table {{
-                    border-collapse: collapse;
-                    width: 100%;
-                    margin: 20px 0;
-                }}
-                th, td {{
-                    border: 1px solid #ddd;
-                    padding: 12px;
-                    text-align: left;
-                }}
-                th {{
-                    background-color: #3498db;
-                    color: white;
-                }}
-                tr:nth-child(even) {{
-                    background-color: #f9f9f9;
-                }}
-                .toc {{
-                    background-color: #ecf0f1;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin: 20px 0;
-                }}
-                .emoji {{
-                    font-size: 1.2em;
-                }}
-                a {{
-                    color: #3498db;
-                    text-decoration: none;
-                }}
-                a:hover {{
-                    text-decoration: underline;
-                }}
-                .back-link {{
-                    display: inline-block;
-                    margin-bottom: 20px;
-                    padding: 8px 16px;
-                    background-color: #3498db;
-                    color: white;
-                    border-radius: 4px;
-                    text-decoration: none;
-                }}
-                .back-link:hover {{
-                    background-color: #2980b9;
-                    text-decoration: none;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <a href="/docs-list" class="back-link">← 返回文档列表</a>
-                {html_content}
-            </div>
-        </body>
-        </html>
-        """
+        # 渲染为 HTML 页面
+        full_html = render_doc_page(doc_name, markdown_content)
         
         return HTMLResponse(content=full_html)
         
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+把分散在三处的剧本合并到当前的剧本存储（SCRIPT_STORE）
+
+来源：
+  - 简化数据库 murder_mystery_simple.db（旧的 /db/scripts/* 接口写入）
+  - ORM 数据库 models.DATABASE_URL（旧的 database_api 写入，现在挂在 /db/orm/* 下）
+  - ../scripts/*.json（/scripts/save 导出的剧本文件）
+
+同一个剧本 ID 出现在多处时以 updatedAt 最新的为准，时间相同时优先级为 简化数据库 > ORM > JSON 文件；
+证物取胜出来源的全部证物，再补上其他来源中有而它没有的证物。可以重复执行。
+
+用法（在 api/ 目录下运行）:
+    python merge_script_stores.py --dry-run
+    python merge_script_stores.py
+    SCRIPT_STORE=postgres python merge_script_stores.py --skip-json
+"""
+
+import argparse
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from image_ingest import is_data_url
+from script_repository import create_script_repository
+from simple_db import simple_db
+
+SOURCES = ('simple', 'orm', 'json')
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+
+
+def _timestamp(value: Any) -> datetime:
+    """updatedAt 转成可比较的时间，缺失或无法解析的视为最旧"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def load_simple() -> List[Dict[str, Any]]:
+    scripts = simple_db.get_all_scripts()
+    for script in scripts:
+        script['evidences'] = simple_db.get_evidences_by_script(script['id'])
+    return scripts
+
+
+def load_orm() -> List[Dict[str, Any]]:
+    from models import SessionLocal, create_tables, load_script_list
+    create_tables()
+    db = SessionLocal()
+    try:
+        scripts = load_script_list(db)
+    finally:
+        db.close()
+    for script in scripts:
+        # ORM 的题目为空时是 None；证物图片只存了文件名，补成主存储能识别的路径
+        script['quiz'] = script.get('quiz') or []
+        for evidence in script.get('evidences') or []:
+            image = evidence.get('image')
+            if image and not image.startswith('/') and not is_data_url(image):
+                evidence['image'] = f"/evidence_images/{image}"
+    return scripts
+
+
+def load_json(scripts_dir: Path = SCRIPTS_DIR) -> List[Dict[str, Any]]:
+    scripts = []
+    for script_file in sorted(scripts_dir.glob("*.json")):
+        try:
+            with open(script_file, 'r', encoding='utf-8') as f:
+                script_data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"  ⚠️ 跳过无法读取的文件 {script_file.name}: {e}")
+            continue
+        # 导出文件没有 ID 时和 migrate_scripts_to_db.py 一样按文件名生成
+        script_data.setdefault('id', script_file.stem.replace(' ', '_').replace('，', '_').replace('。', '_'))
+        script_data.setdefault('title', script_file.stem)
+        script_data.setdefault('updatedAt', script_data.get('savedAt'))
+        # 导出时附加的文件信息不属于剧本
+        script_data.pop('savedAt', None)
+        script_data.pop('filePath', None)
+        scripts.append(script_data)
+    return scripts
+
+
+def merge(sources: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any], int]]:
+    """返回 [(胜出来源, 合并后的剧本, 从其他来源补充的证物数)]"""
+    candidates: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for source in SOURCES:
+        for script in sources.get(source, []):
+            if script.get('id'):
+                candidates.setdefault(script['id'], []).append((source, script))
+
+    merged = []
+    for script_id, entries in candidates.items():
+        # max 取第一个最大值：时间相同时排在前面的来源优先
+        source, winner = max(entries, key=lambda entry: _timestamp(entry[1].get('updatedAt')))
+        evidences = list(winner.get('evidences') or [])
+        known = {evidence.get('id') for evidence in evidences}
+        added = 0
+        for other_source, other in entries:
+            if other is winner:
+                continue
+            for evidence in other.get('evidences') or []:
+                if evidence.get('id') and evidence['id'] not in known:
+                    evidences.append(evidence)
+                    known.add(evidence['id'])
+                    added += 1
+        merged.append((source, {**winner, 'evidences': evidences}, added))
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合并简化数据库、ORM 数据库和剧本文件到当前剧本存储")
+    parser.add_argument("--dry-run", action="store_true", help="只打印合并计划，不写入")
+    parser.add_argument("--skip-orm", action="store_true", help="不读取 ORM 数据库")
+    parser.add_argument("--skip-json", action="store_true", help="不读取 ../scripts 下的剧本文件")
+    args = parser.parse_args()
+
+    repository = create_script_repository(cache_size=0)
+    print(f"🔄 合并剧本到 {repository.backend} 存储...")
+
+    sources = {'simple': load_simple()}
+    if not args.skip_orm:
+        sources['orm'] = load_orm()
+    if not args.skip_json:
+        sources['json'] = load_json()
+    for source, scripts in sources.items():
+        print(f"📖 {source}: {len(scripts)} 个剧本")
+
+    to_write = []
+    for source, script, added in merge(sources):
+        # 胜出的就是目标存储里现有的数据、也没有补充证物时不用重写
+        if source == 'simple' and repository.sqlite_db is simple_db and not added:
+            continue
+        print(f"  {'📝' if args.dry_run else '💾'} {script['id']} - {script.get('title', '')}（来自 {source}"
+              + (f"，补充 {added} 个证物" if added else "") + "）")
+        to_write.append(script)
+
+    if args.dry_run:
+        print(f"\n📋 预演结束: 将写入 {len(to_write)} 个剧本")
+        return
+
+    results = list(repository.save_scripts_bulk(to_write))
+    failed = [result for result in results if not result['success']]
+    for result in failed:
+        print(f"  ❌ {result['id']}: {result.get('error')}")
+    print(f"\n🎉 合并完成: 写入 {len(results) - len(failed)} 个剧本，失败 {len(failed)} 个")
+
+
+if __name__ == "__main__":
+    main()
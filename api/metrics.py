@@ -0,0 +1,146 @@
+# Prometheus 指标
+# run.sh 以多 worker 进程启动 uvicorn，设置 PROMETHEUS_MULTIPROC_DIR 后各进程把指标写入共享目录，
+# /metrics 由 MultiProcessCollector 汇总所有进程的数据（必须在导入 prometheus_client 之前设置该环境变量）
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# ===== HTTP =====
+REQUEST_COUNT = Counter(
+    "api_requests_total", "HTTP 请求数", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds", "HTTP 请求耗时", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+SSE_STREAMS_IN_FLIGHT = Gauge(
+    "api_sse_streams_in_flight", "正在推送的 SSE 流数量", multiprocess_mode="livesum"
+)
+
+# ===== LLM =====
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "模型调用耗时", ["prompt_role", "model_key"], buckets=LLM_LATENCY_BUCKETS
+)
+LLM_TTFT = Histogram(
+    "llm_time_to_first_token_seconds", "流式调用首 token 耗时", ["prompt_role", "model_key"],
+    buckets=LLM_LATENCY_BUCKETS
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens", "单次模型调用的 token 数", ["prompt_role", "model_key", "direction"], buckets=TOKEN_BUCKETS
+)
+LLM_ERRORS = Counter(
+    "llm_errors_total", "模型调用失败次数", ["prompt_role", "model_key"]
+)
+REFINE_DECISIONS = Counter(
+    "llm_refine_decisions_total", "批评阶段后是否触发修订（refined=true 的占比即修订率）", ["model_key", "refined"]
+)
+
+# ===== 图像生成 =====
+IMAGE_GENERATION_IN_PROGRESS = Gauge(
+    "image_generation_in_progress", "正在排队或执行的图像生成任务数", ["kind"], multiprocess_mode="livesum"
+)
+IMAGE_GENERATION_LATENCY = Histogram(
+    "image_generation_duration_seconds", "图像生成耗时", ["kind", "outcome"], buckets=LLM_LATENCY_BUCKETS
+)
+
+# ===== 数据库连接池 =====
+DB_POOL_SIZE = Gauge("db_pool_size", "连接池当前连接数", multiprocess_mode="livesum")
+DB_POOL_AVAILABLE = Gauge("db_pool_available", "连接池空闲连接数", multiprocess_mode="livesum")
+DB_POOL_WAITING = Gauge("db_pool_requests_waiting", "等待连接的请求数", multiprocess_mode="livesum")
+
+
+def observe_llm_call(prompt_role: str, model_key: str, latency_s: float,
+                     input_tokens=None, output_tokens=None, ttft_s=None):
+    """记录一次模型调用"""
+    LLM_LATENCY.labels(prompt_role, model_key).observe(latency_s)
+    if ttft_s is not None:
+        LLM_TTFT.labels(prompt_role, model_key).observe(ttft_s)
+    if input_tokens is not None:
+        LLM_TOKENS.labels(prompt_role, model_key, "input").observe(input_tokens)
+    if output_tokens is not None:
+        LLM_TOKENS.labels(prompt_role, model_key, "output").observe(output_tokens)
+
+
+@contextmanager
+def track_image_generation(kind: str):
+    """统计进行中的图像生成任务（队列深度）和耗时"""
+    gauge = IMAGE_GENERATION_IN_PROGRESS.labels(kind)
+    gauge.inc()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        result = {}
+        yield result
+        outcome = "success" if result.get("success", True) else "failure"
+    finally:
+        gauge.dec()
+        IMAGE_GENERATION_LATENCY.labels(kind, outcome).observe(time.perf_counter() - start)
+
+
+def set_db_pool_stats(connection_pool):
+    """psycopg 连接池统计，每个进程写自己的值，汇总时求和"""
+    if connection_pool is None:
+        return
+    stats = connection_pool.get_stats()
+    DB_POOL_SIZE.set(stats.get("pool_size", 0))
+    DB_POOL_AVAILABLE.set(stats.get("pool_available", 0))
+    DB_POOL_WAITING.set(stats.get("requests_waiting", 0))
+
+
+def render_latest():
+    """返回 (内容, Content-Type)；多进程模式下汇总共享目录中的所有进程"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """worker 退出时清理 livesum 类型 gauge 的残留值"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class PrometheusMiddleware:
+    """按路由模板统计请求数和耗时（纯 ASGI 实现，不缓冲流式响应）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 用路由模板而不是原始路径作为标签，避免 /db/scripts/{script_id} 之类的路径撑爆基数
+            route = scope.get("route")
+            route_path = getattr(route, "path", None)
+            if route_path is None:
+                # 静态文件挂载点没有 route，使用挂载前缀
+                route_path = scope.get("root_path") if scope.get("endpoint") is not None else None
+            route_path = route_path or "<unmatched>"
+            if route_path != "/metrics":
+                method = scope.get("method", "GET")
+                REQUEST_COUNT.labels(method, route_path, str(status_holder["status"])).inc()
+                REQUEST_LATENCY.labels(method, route_path).observe(time.perf_counter() - start)
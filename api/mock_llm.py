@@ -0,0 +1,97 @@
+# 内置的模拟推理后端（INFERENCE_SERVICE=mock），用于离线压测和基准测试
+# 延迟、输出速率、流式分块大小、错误率和批评阶段的违规率都由 MOCK_* 环境变量控制。
+# 每次调用的随机数种子由 MOCK_SEED 和提示词内容共同决定，同一请求在任意并发顺序、任意 worker 上的结果都相同。
+import hashlib
+import math
+import random
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from invoke_types import LLMMessage
+from settings import (
+    MOCK_LATENCY_MS, MOCK_LATENCY_DISTRIBUTION, MOCK_LATENCY_JITTER, MOCK_TOKENS_PER_SEC, MOCK_RESPONSE_TOKENS,
+    MOCK_STREAM_CHUNK_CHARS, MOCK_ERROR_RATE, MOCK_VIOLATION_RATE, MOCK_SEED
+)
+
+# 回复内容由这些句子循环拼出，长度与真实角色回复相近
+SAMPLE_SENTENCES = [
+    "（她微微皱眉，目光移向窗外）那天晚上我一直待在自己的房间里。",
+    "我听到楼上传来一阵脚步声，大概是十一点左右。",
+    "你为什么要问这个？我和他之间并没有什么过节。",
+    "（他轻轻叹了口气）如果你一定要知道的话，我确实见过那只背包。",
+    "比赛结束以后，大家都在大厅里喝酒，只有文斯早早离开了。",
+    "我不记得钥匙架上少了哪一把钥匙，那不是我负责的事情。",
+]
+NO_VIOLATION_CRITIQUE = "NONE!"
+VIOLATION_CRITIQUE = "引用：“作为一个AI助手，我无法回答。” 批评：发言提到了AI助手。违反的原则：原则A：谈论AI助手。"
+
+
+class MockInferenceError(RuntimeError):
+    """按 MOCK_ERROR_RATE 注入的模拟调用失败"""
+
+
+def _rng_for(prompt_role: str, system_prompt: str, messages: List[LLMMessage]) -> random.Random:
+    digest = hashlib.sha256()
+    digest.update(f"{MOCK_SEED}:{prompt_role}:{system_prompt}".encode("utf-8"))
+    for msg in messages:
+        digest.update(f"\n{msg.role}:{msg.content}".encode("utf-8"))
+    return random.Random(int.from_bytes(digest.digest()[:8], "big"))
+
+
+def _sample_latency_s(rng: random.Random) -> float:
+    """首 token 延迟；lognormal 的 MOCK_LATENCY_MS 为中位数，MOCK_LATENCY_JITTER 为 sigma"""
+    base = MOCK_LATENCY_MS / 1000
+    if MOCK_LATENCY_DISTRIBUTION == "uniform":
+        return max(0.0, rng.uniform(base * (1 - MOCK_LATENCY_JITTER), base * (1 + MOCK_LATENCY_JITTER)))
+    if MOCK_LATENCY_DISTRIBUTION == "lognormal":
+        return rng.lognormvariate(math.log(base), MOCK_LATENCY_JITTER) if base > 0 else 0.0
+    return base
+
+
+def _build_response(rng: random.Random, prompt_role: str) -> str:
+    if prompt_role == "critique":
+        return VIOLATION_CRITIQUE if rng.random() < MOCK_VIOLATION_RATE else NO_VIOLATION_CRITIQUE
+    text = ""
+    while len(text) < MOCK_RESPONSE_TOKENS:
+        text += rng.choice(SAMPLE_SENTENCES)
+    return text[:MOCK_RESPONSE_TOKENS]
+
+
+def _count_input_tokens(system_prompt: str, messages: List[LLMMessage]) -> int:
+    # 中文一个字约等于一个 token，按字符数估算
+    return len(system_prompt) + sum(len(msg.content) for msg in messages)
+
+
+def _prepare(prompt_role: str, system_prompt: str, messages: List[LLMMessage]) -> Tuple[float, str]:
+    rng = _rng_for(prompt_role, system_prompt, messages)
+    latency_s = _sample_latency_s(rng)
+    fail = rng.random() < MOCK_ERROR_RATE
+    text = _build_response(rng, prompt_role)
+    if fail:
+        time.sleep(latency_s)
+        raise MockInferenceError(f"模拟推理失败（prompt_role={prompt_role}）")
+    return latency_s, text
+
+
+def _token_interval_s() -> float:
+    return 1.0 / MOCK_TOKENS_PER_SEC if MOCK_TOKENS_PER_SEC > 0 else 0.0
+
+
+def invoke_mock(prompt_role: str, system_prompt: str, messages: List[LLMMessage]) -> Tuple[str, int, int]:
+    """非流式调用：等待首 token 延迟加上按速率生成全部内容的时间后一次性返回"""
+    latency_s, text = _prepare(prompt_role, system_prompt, messages)
+    time.sleep(latency_s + _token_interval_s() * len(text))
+    return text, _count_input_tokens(system_prompt, messages), len(text)
+
+
+def invoke_mock_stream(prompt_role: str, system_prompt: str, messages: List[LLMMessage],
+                       chunk_chars: Optional[int] = None) -> Iterator[str]:
+    """流式调用：每 chunk_chars 个字符为一块，按 token 速率输出"""
+    latency_s, text = _prepare(prompt_role, system_prompt, messages)
+    chunk_chars = max(1, chunk_chars or MOCK_STREAM_CHUNK_CHARS)
+    time.sleep(latency_s)
+    for start in range(0, len(text), chunk_chars):
+        chunk = text[start:start + chunk_chars]
+        if start:
+            time.sleep(_token_interval_s() * len(chunk))
+        yield chunk
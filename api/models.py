@@ -1,10 +1,17 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import (
+    create_engine, event, inspect, text, select, func, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float,
+    Index, UniqueConstraint
+)
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, selectinload, raiseload
 from datetime import datetime
-import json
+import asyncio
 import os
 
+import fast_json
+from sqlite_pool import SQLITE_BUSY_TIMEOUT_MS
+
 Base = declarative_base()
 
 class Script(Base):
@@ -15,6 +22,7 @@ class Script(Base):
     description = Column(Text)
     author = Column(String)
     version = Column(String, default='1.0.0')
+    revision = Column(Integer, nullable=False, default=1)  # 每次保存加一，读接口据此生成 ETag
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     global_story = Column(Text)
@@ -35,8 +43,10 @@ class Script(Base):
     killer_role = Column(String)
     
     # 关联关系
-    characters = relationship("Character", back_populates="script", cascade="all, delete-orphan")
-    quiz_questions = relationship("QuizQuestion", back_populates="script", cascade="all, delete-orphan")
+    characters = relationship("Character", back_populates="script", cascade="all, delete-orphan",
+                              order_by="[Character.position, Character.id]")
+    quiz_questions = relationship("QuizQuestion", back_populates="script", cascade="all, delete-orphan",
+                                  order_by="QuizQuestion.order_index")
     spoiler_stories = relationship("SpoilerStory", back_populates="script", cascade="all, delete-orphan")
     script_evidences = relationship("ScriptEvidence", back_populates="script", cascade="all, delete-orphan")
 
@@ -44,9 +54,10 @@ class Character(Base):
     __tablename__ = 'characters'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    script_id = Column(String, ForeignKey('scripts.id'), nullable=False)
+    script_id = Column(String, ForeignKey('scripts.id'), nullable=False, index=True)
     
     name = Column(String, nullable=False)
+    position = Column(Integer, default=0)  # 在剧本中的顺序；增量保存时角色行不重建，顺序单独存
     bio = Column(Text)
     personality = Column(Text)
     context = Column(Text)
@@ -73,7 +84,7 @@ class QuizQuestion(Base):
     __tablename__ = 'quiz_questions'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    script_id = Column(String, ForeignKey('scripts.id'), nullable=False)
+    script_id = Column(String, ForeignKey('scripts.id'), nullable=False, index=True)
     
     question = Column(Text, nullable=False)
     choices = Column(Text)  # JSON格式存储选择项
@@ -87,13 +98,14 @@ class SpoilerStory(Base):
     __tablename__ = 'spoiler_stories'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    script_id = Column(String, ForeignKey('scripts.id'), nullable=False)
+    script_id = Column(String, ForeignKey('scripts.id'), nullable=False, index=True)
     
     title = Column(String, nullable=False)  # 故事标题
     content = Column(Text, nullable=False)  # 故事内容（Markdown格式）
     generated_at = Column(DateTime, default=datetime.utcnow)  # 生成时间
     word_count = Column(Integer, default=0)  # 字数统计
     generation_duration = Column(Float, default=0.0)  # 生成耗时（秒）
+    revision = Column(Integer, nullable=False, default=1)  # 每次修改加一，读接口据此生成 ETag
     
     # AI生成相关信息
     ai_model = Column(String, default='gpt-4')  # 使用的AI模型
@@ -102,12 +114,15 @@ class SpoilerStory(Base):
     
     # 关联关系
     script = relationship("Script", back_populates="spoiler_stories")
+    
+    # 历史列表按剧本筛选、按生成时间分页排序，走这个索引不需要排序
+    __table_args__ = (Index('ix_spoiler_stories_script_generated', 'script_id', 'generated_at'),)
 
 class ScriptEvidence(Base):
     __tablename__ = 'script_evidences'
     
     id = Column(String, primary_key=True)
-    script_id = Column(String, ForeignKey('scripts.id'), nullable=False)
+    script_id = Column(String, ForeignKey('scripts.id'), nullable=False, index=True)
     
     name = Column(String, nullable=False)  # 物品名称
     description = Column(Text, nullable=False)  # 物品描述（用于文生图）
@@ -125,19 +140,135 @@ class ScriptEvidence(Base):
     # 关联关系
     script = relationship("Script", back_populates="script_evidences")
 
+class ChangeLog(Base):
+    """剧本、证物的变更记录，供 /db/changes 增量同步；每个对象只保留最近一次变更"""
+    __tablename__ = 'change_log'
+    # sqlite_autoincrement：删除的序号不会被复用，保证序号单调递增
+    __table_args__ = (UniqueConstraint('entity', 'entity_id'), {'sqlite_autoincrement': True})
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)  # 'script' 或 'evidence'
+    entity_id = Column(String, nullable=False)
+    script_id = Column(String)
+    op = Column(String, nullable=False)  # 'created', 'updated', 'deleted'
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
 # 数据库配置
 # 使用专门的data文件夹存放数据库文件
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{os.path.join(DATA_DIR, "murder_mystery.db")}')
-engine = create_engine(DATABASE_URL, echo=False)
+
+# 服务端数据库（PostgreSQL）的连接池，每个 worker 一个池：常驻 ORM_POOL_SIZE 个连接，高峰时最多再借 ORM_MAX_OVERFLOW 个
+ORM_POOL_SIZE = int(os.getenv('ORM_POOL_SIZE', '5'))
+ORM_MAX_OVERFLOW = int(os.getenv('ORM_MAX_OVERFLOW', '10'))
+ORM_POOL_TIMEOUT = float(os.getenv('ORM_POOL_TIMEOUT', '10'))  # 等待空闲连接的秒数
+ORM_POOL_RECYCLE = int(os.getenv('ORM_POOL_RECYCLE', '1800'))  # 连接用了这么久就重建，避开服务端的空闲断开
+
+def _to_async_url(url: str) -> str:
+    """同步驱动的地址换成对应的异步驱动：sqlite -> aiosqlite，postgresql -> asyncpg"""
+    if url.startswith('sqlite:'):
+        return 'sqlite+aiosqlite:' + url[len('sqlite:'):]
+    for prefix in ('postgresql+psycopg2:', 'postgresql+psycopg:', 'postgresql:', 'postgres:'):
+        if url.startswith(prefix):
+            return 'postgresql+asyncpg:' + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or _to_async_url(DATABASE_URL)
+
+def _engine_options(url: str) -> dict:
+    if url.startswith('sqlite'):
+        # SQLite 打开连接很便宜，写入本来就串行，用默认连接池
+        return {}
+    return {
+        'pool_size': ORM_POOL_SIZE,
+        'max_overflow': ORM_MAX_OVERFLOW,
+        'pool_timeout': ORM_POOL_TIMEOUT,
+        'pool_recycle': ORM_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新连接都设置：WAL 让读写互不阻塞，busy_timeout 让写锁冲突时等待而不是立即报 database is locked"""
+    # 关掉驱动自己的事务管理（它把 BEGIN 推迟到第一条写语句），事务改由 _begin_sqlite_transaction 发出
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+def _begin_sqlite_transaction(conn):
+    """
+    读会话用普通 BEGIN；写会话带 sqlite_begin='BEGIN IMMEDIATE'，事务一开始就拿写锁。
+    
+    先读后写的 DEFERRED 事务在 WAL 下升级写锁时，如果其他连接已经提交过，SQLite 直接返回
+    database is locked，busy_timeout 不起作用；IMMEDIATE 则在 BEGIN 时按 busy_timeout 排队等锁。
+    """
+    conn.exec_driver_sql(conn.get_execution_options().get('sqlite_begin', 'BEGIN'))
+
+engine = create_engine(DATABASE_URL, echo=False, **_engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎供 async 路由使用，查询期间不阻塞事件循环；和同步引擎指向同一个数据库
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **_engine_options(ASYNC_DATABASE_URL))
+# expire_on_commit=False：提交后还要把对象转成字典返回，过期的属性在异步会话里无法隐式重新加载
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncWriteSessionLocal = async_sessionmaker(
+    async_engine.execution_options(sqlite_begin='BEGIN IMMEDIATE'), autoflush=False, expire_on_commit=False
+)
+
+_sqlite_write_lock = None
+if DATABASE_URL.startswith('sqlite'):
+    for _sync_engine in (engine, async_engine.sync_engine):
+        event.listen(_sync_engine, 'connect', _set_sqlite_pragmas)
+        event.listen(_sync_engine, 'begin', _begin_sqlite_transaction)
+    # 本进程的 ORM 写会话逐个执行，多个 worker 之间靠 BEGIN IMMEDIATE + busy_timeout 排队
+    _sqlite_write_lock = asyncio.Lock()
+
 def create_tables():
     """创建所有数据库表"""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+    _backfill_change_log()
     print("✅ 数据库表创建成功")
 
+# create_all 不会给已存在的表加列，后加的列在这里补齐：(表名, 列名, 列定义)
+_ADDED_COLUMNS = [
+    ('scripts', 'revision', 'INTEGER NOT NULL DEFAULT 1'),
+    ('spoiler_stories', 'revision', 'INTEGER NOT NULL DEFAULT 1'),
+    ('characters', 'position', 'INTEGER DEFAULT 0'),
+]
+
+def _add_missing_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, definition in _ADDED_COLUMNS:
+            if column not in {c['name'] for c in inspector.get_columns(table)}:
+                conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+                print(f"✅ 添加字段: {table}.{column}")
+
+def _create_missing_indexes():
+    """create_all 只在建表时建索引，已存在的表上后加的索引在这里补建"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def _backfill_change_log():
+    """变更记录表刚建好时，把已有的剧本和证物记为新建，首次增量同步（since=0）才能拿到全部数据"""
+    db = SessionLocal()
+    try:
+        if db.query(ChangeLog.seq).first() is not None:
+            return
+        for (script_id,) in db.query(Script.id).order_by(Script.updated_at, Script.id):
+            db.add(ChangeLog(entity='script', entity_id=script_id, script_id=script_id, op='created'))
+        for evidence_id, script_id in db.query(ScriptEvidence.id, ScriptEvidence.script_id).order_by(ScriptEvidence.created_at):
+            db.add(ChangeLog(entity='evidence', entity_id=evidence_id, script_id=script_id, op='created'))
+        db.commit()
+    finally:
+        db.close()
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
@@ -146,7 +277,85 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """获取异步数据库会话，供 async 路由使用；同步的辅助函数（如 reconcile）通过 run_sync 在同一会话里执行"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_write_db():
+    """写路由用的异步会话：SQLite 下本进程同一时刻只有一个写会话，事务以 BEGIN IMMEDIATE 开始"""
+    if _sqlite_write_lock is None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    async with _sqlite_write_lock:
+        async with AsyncWriteSessionLocal() as db:
+            yield db
+
+# PostgreSQL 上写变更记录的事务持有的 advisory lock 键
+_CHANGE_LOG_LOCK_KEY = 0x636861_6e6765
+
+def record_change(db, entity: str, entity_id: str, script_id: str, op: str):
+    """
+    在当前会话里记录一次变更，和数据修改一起提交；旧记录删除后重新插入，取得新的序号
+    
+    增量同步要求序号按提交顺序递增：客户端拿到 next_since 之后，不能再出现更小的序号。
+    这只在同一时刻只有一个事务写变更记录时成立。SQLite 的写事务本身就是串行的；
+    PostgreSQL 的序号在 INSERT 时分配、和提交顺序无关，这里先取事务级 advisory lock，
+    写变更记录的事务逐个分配序号、逐个提交（锁在提交或回滚时释放）。
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        db.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': _CHANGE_LOG_LOCK_KEY})
+    db.query(ChangeLog).filter(ChangeLog.entity == entity, ChangeLog.entity_id == entity_id).delete()
+    db.add(ChangeLog(entity=entity, entity_id=entity_id, script_id=script_id, op=op))
+    # 立即写入，同一会话里对同一对象再次记录时能删掉这一条
+    db.flush()
+
+# 剧本详情需要的关联：每个关联一条 WHERE script_id IN (...) 批量查询，查询数和剧本数量无关
+SCRIPT_DETAIL_OPTIONS = (
+    selectinload(Script.characters),
+    selectinload(Script.quiz_questions),
+    selectinload(Script.script_evidences),
+)
+
+def load_script_list(db, summary: bool = False) -> list:
+    """
+    按更新时间倒序读取全部剧本
+    
+    Args:
+        summary: 只返回摘要（与简化数据库 /db/scripts/summaries 的字段一致），不加载任何关联；
+                 完整模式共 4 条查询，摘要模式 1 条
+    """
+    if summary:
+        character_count = (
+            select(func.count(Character.id))
+            .where(Character.script_id == Script.id)
+            .correlate(Script)
+            .scalar_subquery()
+        )
+        # raiseload：摘要模式下误用关联属性会直接报错，而不是悄悄退化成 N+1 查询
+        rows = (db.query(Script, character_count.label('character_count'))
+                .options(raiseload('*'))
+                .order_by(Script.updated_at.desc())
+                .all())
+        return [script_summary_to_dict(script, count) for script, count in rows]
+    
+    scripts = db.query(Script).options(*SCRIPT_DETAIL_OPTIONS).order_by(Script.updated_at.desc()).all()
+    return [script_to_dict(script) for script in scripts]
+
 # 数据转换工具函数
+def script_summary_to_dict(script: Script, character_count: int) -> dict:
+    """剧本摘要，只用剧本表自身的列"""
+    return {
+        'id': script.id,
+        'title': script.title,
+        'description': script.description or '',
+        'author': script.author or '',
+        'coverImage': f"/script_covers/{script.cover_image_filename}" if script.cover_image_filename else None,
+        'updatedAt': script.updated_at.isoformat() if script.updated_at else '',
+        'characterCount': character_count or 0
+    }
+
 def script_to_dict(script: Script) -> dict:
     """将数据库Script对象转换为前端需要的字典格式"""
     characters_data = []
@@ -170,26 +379,14 @@ def script_to_dict(script: Script) -> dict:
     
     quiz_data = []
     for quiz in script.quiz_questions:
-        choices = json.loads(quiz.choices) if quiz.choices else []
+        choices = fast_json.loads(quiz.choices) if quiz.choices else []
         quiz_data.append({
             'question': quiz.question,
             'choices': choices,
             'correctAnswer': quiz.correct_answer
         })
     
-    evidences_data = []
-    for evidence in script.script_evidences:
-        related_chars = json.loads(evidence.related_characters) if evidence.related_characters else []
-        evidences_data.append({
-            'id': evidence.id,
-            'name': evidence.name,
-            'description': evidence.description,
-            'category': evidence.category,
-            'importance': evidence.importance,
-            'relatedCharacters': related_chars,
-            'initialState': evidence.initial_state,
-            'image': evidence.image_filename
-        })
+    evidences_data = [script_evidence_to_dict(evidence) for evidence in script.script_evidences]
     
     # 构建封面图片路径
     cover_image = None
@@ -317,7 +514,7 @@ def dict_to_quiz_question(data: dict, script_id: str, order_index: int = 0) -> Q
     quiz = QuizQuestion()
     quiz.script_id = script_id
     quiz.question = data.get('question', '')
-    quiz.choices = json.dumps(data.get('choices', []), ensure_ascii=False)
+    quiz.choices = fast_json.dumps(data.get('choices', []))
     quiz.correct_answer = data.get('correctAnswer')
     quiz.order_index = order_index
     
@@ -339,10 +536,24 @@ def dict_to_script_evidence(data: dict, script_id: str, evidence: ScriptEvidence
     
     # 处理关联角色（JSON格式存储）
     related_characters = data.get('relatedCharacters', [])
-    evidence.related_characters = json.dumps(related_characters, ensure_ascii=False)
+    evidence.related_characters = fast_json.dumps(related_characters)
     
     return evidence
 
+def script_evidence_to_dict(evidence: ScriptEvidence) -> dict:
+    """将数据库ScriptEvidence对象转换为前端需要的字典格式"""
+    related_chars = fast_json.loads(evidence.related_characters) if evidence.related_characters else []
+    return {
+        'id': evidence.id,
+        'name': evidence.name,
+        'description': evidence.description,
+        'category': evidence.category,
+        'importance': evidence.importance,
+        'relatedCharacters': related_chars,
+        'initialState': evidence.initial_state,
+        'image': evidence.image_filename
+    }
+
 def spoiler_story_to_dict(story: 'SpoilerStory') -> dict:
     """将数据库SpoilerStory对象转换为前端需要的字典格式"""
     return {
@@ -358,6 +569,27 @@ def spoiler_story_to_dict(story: 'SpoilerStory') -> dict:
         'sessionId': story.session_id
     }
 
+# 历史列表只读这些列，不读正文；正文只取开头一段作为预览
+SPOILER_STORY_SUMMARY_COLUMNS = (
+    SpoilerStory.id, SpoilerStory.script_id, SpoilerStory.title, SpoilerStory.generated_at,
+    SpoilerStory.word_count, SpoilerStory.generation_duration, SpoilerStory.ai_model, SpoilerStory.prompt_version,
+    func.substr(SpoilerStory.content, 1, 150).label('excerpt'),
+)
+
+def spoiler_story_summary_to_dict(row) -> dict:
+    """SPOILER_STORY_SUMMARY_COLUMNS 查询出的一行转换为前端格式，正文通过 /db/spoiler-stories/story/{id} 获取"""
+    return {
+        'id': row.id,
+        'scriptId': row.script_id,
+        'title': row.title,
+        'excerpt': row.excerpt or '',
+        'generatedAt': row.generated_at.isoformat() if row.generated_at else '',
+        'wordCount': row.word_count,
+        'generationDuration': row.generation_duration,
+        'aiModel': row.ai_model,
+        'promptVersion': row.prompt_version
+    }
+
 def dict_to_spoiler_story(data: dict, script_id: str, story: 'SpoilerStory' = None) -> 'SpoilerStory':
     """将前端字典格式转换为数据库SpoilerStory对象"""
     if story is None:
@@ -0,0 +1,90 @@
+# 子表增量保存：按稳定键比对提交的数据和数据库里的现有行，只执行需要的 INSERT/UPDATE/DELETE
+# 三类语句各自批量执行（bulk_insert_mappings / bulk_update_mappings / IN 删除），没有变化的行不产生任何写入，
+# 自增 ID 保持不变，写锁持有时间也只和实际变化的行数有关。
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple
+
+from sqlalchemy import inspect
+
+
+class ChildChanges(NamedTuple):
+    inserted: List[Any]   # 新增行的稳定键
+    updated: List[Any]    # 有列发生变化的行的稳定键
+    deleted: List[Any]    # 删除行的稳定键
+    unchanged: int        # 完全相同、没有写入的行数
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'inserted': len(self.inserted),
+            'updated': len(self.updated),
+            'deleted': len(self.deleted),
+            'unchanged': self.unchanged,
+        }
+
+
+def assigned_values(obj) -> Dict[str, Any]:
+    """dict_to_* 转换函数在临时对象上赋过值的列；没赋值的列不参与比较，插入时由列默认值填充"""
+    return {key: value for key, value in vars(obj).items() if not key.startswith('_sa_')}
+
+
+def _with_occurrence(keys: Iterable[Hashable]) -> List[tuple]:
+    """同一批数据里稳定键可能重复（比如两个同名角色），按出现次序编号区分"""
+    seen: Counter = Counter()
+    result = []
+    for key in keys:
+        result.append((key, seen[key]))
+        seen[key] += 1
+    return result
+
+
+def reconcile(db, model, existing: List[Any], incoming: List[Dict[str, Any]],
+              key: Callable[[Dict[str, Any]], Hashable]) -> ChildChanges:
+    """
+    把 model 子表中属于同一个父对象的行同步成 incoming
+
+    Args:
+        existing: 数据库中的现有行（ORM 对象），按原有顺序排列
+        incoming: 提交的数据，每项是要写入的列值（通常来自 assigned_values）
+        key: 从列值取稳定键，现有行和提交的数据用同一个函数
+
+    Returns:
+        ChildChanges；调用方负责提交事务
+    """
+    mapper = inspect(model)
+    primary_key = mapper.primary_key[0]
+    columns = [attr.key for attr in mapper.column_attrs]
+
+    existing_values = [{column: getattr(row, column) for column in columns} for row in existing]
+    existing_by_key = dict(zip(_with_occurrence(key(values) for values in existing_values), existing_values))
+
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    inserted, updated = [], []
+    unchanged = 0
+    for stable_key, values in zip(_with_occurrence(key(values) for values in incoming), incoming):
+        current = existing_by_key.pop(stable_key, None)
+        if current is None:
+            inserts.append(values)
+            inserted.append(stable_key[0])
+            continue
+        changed = {column: value for column, value in values.items()
+                   if column != primary_key.key and current.get(column) != value}
+        if changed:
+            updates.append({primary_key.key: current[primary_key.key], **changed})
+            updated.append(stable_key[0])
+        else:
+            unchanged += 1
+
+    # 剩下的现有行在提交的数据里已经不存在
+    deleted = [stable_key[0] for stable_key in existing_by_key]
+    delete_ids = [values[primary_key.key] for values in existing_by_key.values()]
+
+    # 先删除再插入：新行可能复用被删除行的主键（例如证物 ID）
+    if delete_ids:
+        db.query(model).filter(primary_key.in_(delete_ids)).delete(synchronize_session=False)
+    if updates:
+        db.bulk_update_mappings(model, updates)
+    if inserts:
+        db.bulk_insert_mappings(model, inserts)
+
+    return ChildChanges(inserted, updated, deleted, unchanged)
@@ -1,3 +1,5 @@
 #!/usr/bin/env bash
+# 多 worker 进程共享 Prometheus 指标目录，启动前清空上次运行残留的数据
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/murder_mystery_metrics}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 pipenv run uvicorn main:app --host 0.0.0.0 --port 10000 --workers 8
-
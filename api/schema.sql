@@ -52,3 +52,36 @@ CREATE TABLE IF NOT EXISTS "public".ai_invocations (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+
+-- Per-stage durations of a turn (pool checkout, prompt building, initial/critique/refine calls, DB writes),
+-- written by the tracing layer as {"trace_id": ..., "stages_ms": {...}}
+ALTER TABLE "public".conversation_turns ADD COLUMN IF NOT EXISTS stage_timings JSONB;
+
+
+-- Script library for SCRIPT_STORE=postgres (see script_repository.py). Scripts and evidences are stored as JSONB
+-- documents in the exact format the read endpoints return. revision increases on every save of a script (ETag);
+-- version is taken from a shared sequence on every write, so MAX(version) + COUNT(*) changes whenever the library does.
+CREATE SEQUENCE IF NOT EXISTS "public".script_store_version;
+
+CREATE TABLE IF NOT EXISTS "public".script_documents (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    document JSONB NOT NULL,
+    cover_image_filename TEXT,
+    revision INTEGER NOT NULL DEFAULT 1,
+    version BIGINT NOT NULL DEFAULT nextval('script_store_version'),
+    updated_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS script_documents_updated_at_idx ON "public".script_documents (updated_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS "public".evidence_documents (
+    id TEXT PRIMARY KEY,
+    script_id TEXT NOT NULL REFERENCES script_documents(id) ON DELETE CASCADE,
+    document JSONB NOT NULL,
+    image_filename TEXT,
+    version BIGINT NOT NULL DEFAULT nextval('script_store_version'),
+    created_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS evidence_documents_script_id_idx ON "public".evidence_documents (script_id, id);
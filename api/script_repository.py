@@ -0,0 +1,384 @@
+# 剧本存储：所有剧本、证物的读写都经过 ScriptRepository，路由不再直接依赖某一个数据库
+# 后端由 SCRIPT_STORE 选择：sqlite 为 simple_db（murder_mystery_simple.db），postgres 为 DB_CONN_URL 指向的 PostgreSQL。
+# 两个后端读出的数据格式完全相同（都由 SimpleScriptDB 的转换函数生成），切换后端不影响前端。
+# 外面再包一层 CachedScriptRepository：按版本号校验的读穿缓存，多个 worker 各自缓存也不会读到旧数据。
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import asset_store
+import fast_json
+from settings import SCRIPT_CACHE_SIZE, SCRIPT_STORE
+from simple_db import SimpleScriptDB, simple_db
+from versioned_cache import VersionedCache
+
+
+class ScriptRepository(ABC):
+    """剧本和证物的存储接口；写方法返回是否成功，读方法在数据不存在时返回 None 或空列表"""
+
+    backend = ''
+    # SQLite 后端的 SimpleScriptDB；摘要分页、全文检索、角色查询、增量同步依赖它的索引表，其他后端为 None
+    sqlite_db: Optional[SimpleScriptDB] = None
+
+    @abstractmethod
+    def save_script(self, script_data: Dict[str, Any]) -> bool:
+        """新建或覆盖剧本（不含 evidences 字段中的证物）"""
+
+    @abstractmethod
+    def get_script(self, script_id: str) -> Optional[Dict[str, Any]]:
+        """剧本详情，剧本不存在时返回 None"""
+
+    def get_script_json(self, script_id: str) -> Optional[bytes]:
+        """剧本详情序列化好的 JSON（UTF-8 字节），剧本不存在时返回 None；读接口直接作为响应体的一部分"""
+        script = self.get_script(script_id)
+        return None if script is None else fast_json.dumps_bytes(script)
+
+    @abstractmethod
+    def get_script_version(self, script_id: str) -> Optional[Tuple[Any, ...]]:
+        """剧本的 (版本号, 更新时间)，剧本不存在时返回 None；剧本每次保存都会变化"""
+
+    @abstractmethod
+    def list_scripts(self) -> List[Dict[str, Any]]:
+        """全部剧本，按更新时间倒序"""
+
+    @abstractmethod
+    def get_library_version(self) -> Any:
+        """剧本库的版本；任何剧本新建、修改、删除后都会变化"""
+
+    @abstractmethod
+    def delete_script(self, script_id: str) -> bool:
+        """删除剧本及其证物"""
+
+    @abstractmethod
+    def save_evidence(self, evidence_data: Dict[str, Any]) -> bool:
+        """新建或覆盖证物，剧本 ID 取自 script_id 或 scriptId"""
+
+    @abstractmethod
+    def get_evidences(self, script_id: str) -> List[Dict[str, Any]]:
+        """剧本的全部证物，按创建时间倒序"""
+
+    @abstractmethod
+    def get_evidences_version(self, script_id: str) -> List[Tuple[Any, ...]]:
+        """剧本下证物的版本；证物增删改、移到其他剧本都会变化"""
+
+    @abstractmethod
+    def delete_evidence(self, evidence_id: str) -> bool:
+        """删除证物，证物图片交给 asset_store 释放"""
+
+    @abstractmethod
+    def referenced_images(self) -> List[Tuple[str, str]]:
+        """所有被引用的图片，(资源类型, 文件名)，供 asset_store 统计引用和垃圾回收"""
+
+    def save_scripts_bulk(self, scripts: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        批量保存剧本及其证物，逐个产出结果，格式同 SimpleScriptDB.save_scripts_bulk
+
+        默认实现逐个剧本保存，后端有批量写入时应覆盖
+        """
+        for index, script_data in enumerate(scripts):
+            script_id = script_data.get('id') if isinstance(script_data, dict) else None
+            result = {'index': index, 'id': script_id, 'success': False, 'evidence_count': 0}
+            if not script_id:
+                result['error'] = "缺少剧本 id"
+            elif not self.save_script(script_data):
+                result['error'] = "剧本保存失败"
+            else:
+                evidences = script_data.get('evidences') or []
+                saved = sum(1 for evidence in evidences if self.save_evidence({**evidence, 'script_id': script_id}))
+                result['success'] = saved == len(evidences)
+                result['evidence_count'] = saved
+                if not result['success']:
+                    result['error'] = f"{len(evidences) - saved} 个证物保存失败"
+            yield result
+
+
+class SQLiteScriptRepository(ScriptRepository):
+    """simple_db 的 SQLite 存储"""
+
+    backend = 'sqlite'
+
+    def __init__(self, db: SimpleScriptDB = simple_db):
+        self.sqlite_db = db
+
+    def save_script(self, script_data):
+        return self.sqlite_db.save_script(script_data)
+
+    def get_script(self, script_id):
+        return self.sqlite_db.get_script(script_id)
+
+    def get_script_version(self, script_id):
+        return self.sqlite_db.get_script_version(script_id)
+
+    def list_scripts(self):
+        return self.sqlite_db.get_all_scripts()
+
+    def get_library_version(self):
+        return self.sqlite_db.get_library_version()
+
+    def delete_script(self, script_id):
+        return self.sqlite_db.delete_script(script_id)
+
+    def save_evidence(self, evidence_data):
+        return self.sqlite_db.save_evidence(evidence_data)
+
+    def get_evidences(self, script_id):
+        return self.sqlite_db.get_evidences_by_script(script_id)
+
+    def get_evidences_version(self, script_id):
+        return self.sqlite_db.get_evidences_version(script_id)
+
+    def delete_evidence(self, evidence_id):
+        return self.sqlite_db.delete_evidence(evidence_id)
+
+    def referenced_images(self):
+        return self.sqlite_db.referenced_images()
+
+    def save_scripts_bulk(self, scripts):
+        return self.sqlite_db.save_scripts_bulk(scripts)
+
+
+# PostgreSQL 后端的写入语句；version 取自共享序列，每次写入都取新值，表结构见 schema.sql
+_PG_UPSERT_SCRIPT_SQL = '''
+    INSERT INTO script_documents (id, title, document, cover_image_filename, updated_at)
+    VALUES (%s, %s, %s::jsonb, %s, %s)
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title, document = EXCLUDED.document,
+        cover_image_filename = EXCLUDED.cover_image_filename, updated_at = EXCLUDED.updated_at,
+        revision = script_documents.revision + 1, version = nextval('script_store_version')
+'''
+_PG_UPSERT_EVIDENCE_SQL = '''
+    INSERT INTO evidence_documents (id, script_id, document, image_filename, created_at)
+    VALUES (%s, %s, %s::jsonb, %s, %s)
+    ON CONFLICT (id) DO UPDATE SET
+        script_id = EXCLUDED.script_id, document = EXCLUDED.document,
+        image_filename = EXCLUDED.image_filename, created_at = EXCLUDED.created_at,
+        version = nextval('script_store_version')
+'''
+
+
+class PostgresScriptRepository(ScriptRepository):
+    """
+    PostgreSQL 存储：剧本、证物以读接口返回的格式存成 JSONB 文档
+
+    角色、题目、设置都在剧本文档里，读一个剧本只查一行；剧本库版本取 (MAX(version), COUNT(*))，
+    任何写入都会增大 MAX(version)，只有删除时它可能变小，但此时 COUNT(*) 一定变小。
+    """
+
+    backend = 'postgres'
+
+    def __init__(self, conn_pool=None, converter: SimpleScriptDB = simple_db):
+        if conn_pool is None:
+            from db import pool
+            conn_pool = pool()
+        if conn_pool is None:
+            raise RuntimeError("SCRIPT_STORE=postgres 需要配置 DB_CONN_URL")
+        self._pool = conn_pool
+        self._converter = converter
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _fetchone(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        with self._pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def save_script(self, script_data):
+        try:
+            document, cover_filename = self._converter.script_document(script_data)
+            with self._pool.connection() as conn:
+                conn.execute(_PG_UPSERT_SCRIPT_SQL, (
+                    document['id'], document['title'], fast_json.dumps(document),
+                    cover_filename, document['updatedAt']
+                ))
+            print(f"✅ 剧本保存到 PostgreSQL 成功: {document['title']}")
+            return True
+        except Exception as e:
+            print(f"❌ 保存剧本到 PostgreSQL 失败: {e}")
+            return False
+
+    def get_script(self, script_id):
+        row = self._fetchone('SELECT document FROM script_documents WHERE id = %s', (script_id,))
+        return row[0] if row else None
+
+    def get_script_json(self, script_id):
+        # 直接取 JSONB 的文本形式，不经过 Python 对象再编码一次
+        row = self._fetchone('SELECT document::text FROM script_documents WHERE id = %s', (script_id,))
+        return row[0].encode('utf-8') if row else None
+
+    def get_script_version(self, script_id):
+        return self._fetchone('SELECT revision, updated_at FROM script_documents WHERE id = %s', (script_id,))
+
+    def list_scripts(self):
+        return [row[0] for row in self._fetchall(
+            'SELECT document FROM script_documents ORDER BY updated_at DESC, id DESC'
+        )]
+
+    def get_library_version(self):
+        return self._fetchone('SELECT COALESCE(MAX(version), 0), COUNT(*) FROM script_documents')
+
+    def delete_script(self, script_id):
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute('SELECT cover_image_filename FROM script_documents WHERE id = %s',
+                                   (script_id,)).fetchone()
+                evidence_images = [r[0] for r in conn.execute(
+                    'SELECT image_filename FROM evidence_documents WHERE script_id = %s AND image_filename IS NOT NULL',
+                    (script_id,)
+                )]
+                # 证物由外键级联删除
+                conn.execute('DELETE FROM script_documents WHERE id = %s', (script_id,))
+
+            # 按内容哈希命名的文件可能被共用，由垃圾回收处理
+            images = [('cover', row[0])] if row and row[0] else []
+            images += [('evidence', filename) for filename in evidence_images]
+            for kind, filename in images:
+                try:
+                    asset_store.release(kind, filename)
+                except Exception as e:
+                    print(f"⚠️ 删除图片失败 {filename}: {e}")
+
+            print(f"✅ 从 PostgreSQL 删除剧本成功: {script_id}")
+            return True
+        except Exception as e:
+            print(f"❌ 从 PostgreSQL 删除剧本失败: {e}")
+            return False
+
+    def save_evidence(self, evidence_data):
+        try:
+            document, image_filename = self._converter.evidence_document(evidence_data)
+            with self._pool.connection() as conn:
+                conn.execute(_PG_UPSERT_EVIDENCE_SQL, (
+                    document['id'], document['script_id'], fast_json.dumps(document),
+                    image_filename, document['createdAt']
+                ))
+            print(f"✅ 证物保存到 PostgreSQL 成功: {document['name']}")
+            return True
+        except Exception as e:
+            print(f"❌ 保存证物到 PostgreSQL 失败: {e}")
+            return False
+
+    def get_evidences(self, script_id):
+        return [row[0] for row in self._fetchall(
+            'SELECT document FROM evidence_documents WHERE script_id = %s ORDER BY created_at DESC', (script_id,)
+        )]
+
+    def get_evidences_version(self, script_id):
+        return self._fetchall(
+            'SELECT id, version FROM evidence_documents WHERE script_id = %s ORDER BY id', (script_id,)
+        )
+
+    def delete_evidence(self, evidence_id):
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute('DELETE FROM evidence_documents WHERE id = %s RETURNING image_filename',
+                                   (evidence_id,)).fetchone()
+            if row and row[0]:
+                try:
+                    asset_store.release('evidence', row[0])
+                except Exception as e:
+                    print(f"⚠️ 删除证物图片失败: {e}")
+            print(f"✅ 从 PostgreSQL 删除证物成功: {evidence_id}")
+            return True
+        except Exception as e:
+            print(f"❌ 从 PostgreSQL 删除证物失败: {e}")
+            return False
+
+    def referenced_images(self):
+        return self._fetchall(
+            "SELECT 'cover', cover_image_filename FROM script_documents WHERE cover_image_filename IS NOT NULL "
+            "UNION ALL "
+            "SELECT 'evidence', image_filename FROM evidence_documents WHERE image_filename IS NOT NULL"
+        )
+
+
+class CachedScriptRepository(ScriptRepository):
+    """
+    读穿缓存：剧本、剧本序列化后的 JSON、剧本列表、证物列表按版本号缓存（见 versioned_cache），
+    版本号没变就直接返回缓存的数据。返回的是缓存中的同一个对象，调用方不要修改。
+    """
+
+    def __init__(self, inner: ScriptRepository, max_entries: int = SCRIPT_CACHE_SIZE):
+        self.inner = inner
+        self.backend = inner.backend
+        self.sqlite_db = inner.sqlite_db
+        self._cache = VersionedCache(max_entries)
+
+    def _read_through(self, key: Hashable, version: Any, load: Callable[[], Any]) -> Any:
+        return self._cache.read_through(key, version, load)
+
+    def _invalidate(self, *keys: Hashable):
+        self._cache.invalidate(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def save_script(self, script_data):
+        script_id = script_data.get('id')
+        self._invalidate(('script', script_id), ('script-json', script_id), ('list',))
+        return self.inner.save_script(script_data)
+
+    def get_script(self, script_id):
+        version = self.inner.get_script_version(script_id)
+        if version is None:
+            return None
+        return self._read_through(('script', script_id), tuple(version), lambda: self.inner.get_script(script_id))
+
+    def get_script_json(self, script_id):
+        version = self.inner.get_script_version(script_id)
+        if version is None:
+            return None
+        return self._read_through(('script-json', script_id), tuple(version),
+                                  lambda: self.inner.get_script_json(script_id))
+
+    def get_script_version(self, script_id):
+        return self.inner.get_script_version(script_id)
+
+    def list_scripts(self):
+        version = self.inner.get_library_version()
+        return self._read_through(('list',), version, self.inner.list_scripts)
+
+    def get_library_version(self):
+        return self.inner.get_library_version()
+
+    def delete_script(self, script_id):
+        self._invalidate(('script', script_id), ('script-json', script_id), ('evidences', script_id), ('list',))
+        return self.inner.delete_script(script_id)
+
+    def save_evidence(self, evidence_data):
+        self._invalidate(('evidences', evidence_data.get('script_id') or evidence_data.get('scriptId')))
+        return self.inner.save_evidence(evidence_data)
+
+    def get_evidences(self, script_id):
+        version = tuple(tuple(row) for row in self.inner.get_evidences_version(script_id))
+        return self._read_through(('evidences', script_id), version, lambda: self.inner.get_evidences(script_id))
+
+    def get_evidences_version(self, script_id):
+        return self.inner.get_evidences_version(script_id)
+
+    def delete_evidence(self, evidence_id):
+        # 不知道证物属于哪个剧本，缓存的证物列表靠版本号失效
+        return self.inner.delete_evidence(evidence_id)
+
+    def referenced_images(self):
+        return self.inner.referenced_images()
+
+    def save_scripts_bulk(self, scripts):
+        return self.inner.save_scripts_bulk(scripts)
+
+
+def create_script_repository(store: str = SCRIPT_STORE, cache_size: int = SCRIPT_CACHE_SIZE) -> ScriptRepository:
+    """按配置创建存储；cache_size 为 0 时不加缓存"""
+    if store == 'sqlite':
+        repository: ScriptRepository = SQLiteScriptRepository()
+    elif store == 'postgres':
+        repository = PostgresScriptRepository()
+    else:
+        raise ValueError(f"未知的剧本存储后端: {store}（可选 sqlite、postgres）")
+    if cache_size > 0:
+        repository = CachedScriptRepository(repository, cache_size)
+    print(f"📚 剧本存储: {repository.backend}" + (f"，缓存 {cache_size} 条" if cache_size > 0 else ""))
+    return repository
+
+
+# 全局存储实例
+script_repository = create_script_repository()
@@ -1,12 +1,13 @@
 # 剧本文件管理API
 import os
-import json
 from datetime import datetime
 from pathlib import Path
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 
+import fast_json
+
 router = APIRouter()
 
 # 剧本文件存储目录
@@ -72,8 +73,7 @@ async def save_script(request: ScriptSaveRequest):
         }
         
         # 写入文件
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(script_data, f, ensure_ascii=False, indent=2)
+        fast_json.dump_file(script_data, file_path)
         
         print(f"💾 剧本保存成功: {file_path}")
         
@@ -106,13 +106,12 @@ async def load_script(filename: str):
             )
         
         # 读取文件
-        with open(file_path, 'r', encoding='utf-8') as f:
-            script_data = json.load(f)
+        script_data = fast_json.load_file(file_path)
         
         print(f"📖 剧本加载成功: {file_path}")
         return script_data
         
-    except json.JSONDecodeError as e:
+    except fast_json.JSONDecodeError as e:
         print(f"❌ JSON解析失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -138,8 +137,7 @@ async def list_scripts():
                 stat = file_path.stat()
                 
                 # 尝试读取剧本数据获取详细信息
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    script_data = json.load(f)
+                script_data = fast_json.load_file(file_path)
                 
                 script_info = ScriptFileInfo(
                     id=script_data.get('id', f"script_{file_path.stem}"),
@@ -153,7 +151,7 @@ async def list_scripts():
                 
                 scripts_list.append(script_info)
                 
-            except (json.JSONDecodeError, KeyError) as e:
+            except (fast_json.JSONDecodeError, KeyError) as e:
                 print(f"⚠️ 跳过无效的剧本文件: {file_path.name}, 错误: {e}")
                 continue
         
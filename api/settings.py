@@ -27,7 +27,7 @@ DB_CONN_URL = os.getenv("DB_CONN_URL")
 # Use a generic API_KEY environment variable
 API_KEY = os.getenv("API_KEY")
 
-# Set the inference service (anthropic, openai, groq, openrouter, ollama)
+# Set the inference service (anthropic, openai, groq, openrouter, ollama, mock)
 INFERENCE_SERVICE = os.getenv("INFERENCE_SERVICE", "anthropic")
 
 # Set the model based on the inference service
@@ -37,6 +37,8 @@ elif INFERENCE_SERVICE in ["openai", "groq", "openrouter"]:
     MODEL = os.getenv("MODEL", "gpt-3.5-turbo")
 elif INFERENCE_SERVICE == "ollama":
     MODEL = os.getenv("MODEL", "llama2")
+elif INFERENCE_SERVICE == "mock":
+    MODEL = os.getenv("MODEL", "mock-llm")
 else:
     raise ValueError(f"Unknown inference service: {INFERENCE_SERVICE}")
 
@@ -52,3 +54,22 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1")
 OPENROUTER_API_BASE = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+
+# 链路追踪导出方式：none / jsonl / otel / both
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", str(BASE_DIR / "traces.jsonl"))
+
+# 模拟推理后端（INFERENCE_SERVICE=mock）参数
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "400"))  # 首 token 延迟
+MOCK_LATENCY_DISTRIBUTION = os.getenv("MOCK_LATENCY_DISTRIBUTION", "fixed")  # fixed / uniform / lognormal
+MOCK_LATENCY_JITTER = float(os.getenv("MOCK_LATENCY_JITTER", "0.3"))  # uniform 为相对幅度，lognormal 为 sigma
+MOCK_TOKENS_PER_SEC = float(os.getenv("MOCK_TOKENS_PER_SEC", "40"))
+MOCK_RESPONSE_TOKENS = int(os.getenv("MOCK_RESPONSE_TOKENS", "120"))
+MOCK_STREAM_CHUNK_CHARS = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "2"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_VIOLATION_RATE = float(os.getenv("MOCK_VIOLATION_RATE", "0.2"))  # 批评阶段返回违规（触发修订）的概率
+MOCK_SEED = os.getenv("MOCK_SEED", "0")
+
+# 剧本存储后端：sqlite（murder_mystery_simple.db）/ postgres（DB_CONN_URL），见 script_repository
+SCRIPT_STORE = os.getenv("SCRIPT_STORE", "sqlite")
+SCRIPT_CACHE_SIZE = int(os.getenv("SCRIPT_CACHE_SIZE", "256"))  # 每个 worker 缓存的剧本/证物列表条数，0 为关闭
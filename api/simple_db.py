@@ -1,20 +1,179 @@
 # 简化的SQLite数据库管理
-import sqlite3
-import json
+import base64
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+import asset_store
+import fast_json
+from image_ingest import is_data_url
+from sqlite_pool import ThreadLocalConnections
+from sqlite_writer import writer_for
+
+# 全文检索：FTS5 trigram 分词按三字组切分，不依赖空格，适合中文；少于 3 个字的词改用 LIKE 扫描
+FTS_MIN_TERM_LENGTH = 3
+
+# 从 characters 表取出角色名和简介，供 scripts_fts.characters 列检索
+_CHARACTERS_TEXT_SQL = '''(
+    SELECT COALESCE(group_concat(c.name || ' ' || COALESCE(json_extract(c.data_json, '$.bio'), ''), ' '), '')
+    FROM characters AS c
+    WHERE c.script_id = {src}.id
+)'''
+
+# 角色身份标记：前端字段名 -> characters 表列名
+CHARACTER_FLAGS = {
+    'isKiller': 'is_killer',
+    'isVictim': 'is_victim',
+    'isDetective': 'is_detective',
+    'isAssistant': 'is_assistant',
+    'isPartner': 'is_partner',
+    'isPlayer': 'is_player',
+}
+
+# 检索表的列和对应的取值表达式，{src} 在触发器中为 NEW，回填时为主表名
+_SCRIPTS_FTS_COLUMNS = 'rowid, script_id, title, description, global_story, characters'
+_SCRIPTS_FTS_VALUES = ("{src}.rowid, {src}.id, {src}.title, COALESCE({src}.description, ''), "
+                       "COALESCE({src}.global_story, ''), " + _CHARACTERS_TEXT_SQL)
+_EVIDENCES_FTS_COLUMNS = 'rowid, evidence_id, script_id, name, description, clues'
+_EVIDENCES_FTS_VALUES = ("{src}.rowid, {src}.id, {src}.script_id, {src}.name, COALESCE({src}.description, ''), "
+                         "COALESCE({src}.clues, '')")
+_FTS_TABLES = (
+    ('scripts', 'scripts_fts', _SCRIPTS_FTS_COLUMNS, _SCRIPTS_FTS_VALUES),
+    ('evidences', 'evidences_fts', _EVIDENCES_FTS_COLUMNS, _EVIDENCES_FTS_VALUES),
+)
+
+# 写入语句，单条保存和批量导入共用。不能用 INSERT OR REPLACE：它会先删除旧行，触发外键级联删掉该剧本的证物和角色
+_UPSERT_SCRIPT_SQL = '''
+    INSERT INTO scripts 
+    (id, title, description, author, version, created_at, updated_at, 
+     global_story, source_type, cover_image_path, cover_image_filename,
+     characters_json, settings_json, quiz_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        title = excluded.title, description = excluded.description, author = excluded.author,
+        version = excluded.version, created_at = excluded.created_at, updated_at = excluded.updated_at,
+        global_story = excluded.global_story, source_type = excluded.source_type,
+        cover_image_path = excluded.cover_image_path, cover_image_filename = excluded.cover_image_filename,
+        characters_json = NULL, settings_json = excluded.settings_json, quiz_json = excluded.quiz_json,
+        revision = scripts.revision + 1
+'''
+_UPSERT_EVIDENCE_SQL = '''
+    INSERT INTO evidences 
+    (id, script_id, name, description, overview, clues, category, image_path, image_filename, 
+     importance, initial_state, related_characters, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        script_id = excluded.script_id, name = excluded.name, description = excluded.description,
+        overview = excluded.overview, clues = excluded.clues, category = excluded.category,
+        image_path = excluded.image_path, image_filename = excluded.image_filename,
+        importance = excluded.importance, initial_state = excluded.initial_state,
+        related_characters = excluded.related_characters,
+        created_at = excluded.created_at, updated_at = excluded.updated_at
+'''
+_INSERT_CHARACTER_SQL = (
+    f"INSERT INTO characters (script_id, position, name, role_type, {', '.join(CHARACTER_FLAGS.values())}, "
+    f"has_avatar, data_json) VALUES (?, ?, ?, ?, {', '.join('?' for _ in CHARACTER_FLAGS)}, ?, ?)"
+)
+
+# 读取剧本、证物时的列，顺序与 _script_from_row / _evidence_from_row 对应
+_SCRIPT_COLUMNS = '''id, title, description, author, version, created_at, updated_at,
+                           global_story, source_type, cover_image_path, cover_image_filename,
+                           characters_json, settings_json, quiz_json'''
+_EVIDENCE_COLUMNS = '''id, script_id, name, description, overview, clues, category, image_path, 
+                           importance, initial_state, related_characters, created_at, updated_at'''
+
+# 变更记录：每个剧本/证物只保留最近一次变更，序号取自 AUTOINCREMENT，单调递增且不会复用
+_CHANGE_SOURCES = (
+    # (主表, 实体类型, 剧本 ID 列)
+    ('scripts', 'script', 'id'),
+    ('evidences', 'evidence', 'script_id'),
+)
+CHANGES_PAGE_LIMIT = 1000
+
+# 批量导入：每个事务写入的剧本数；封面和证物图片的解码、写文件用的线程数
+BULK_CHUNK_SIZE = int(os.getenv("SIMPLE_DB_BULK_CHUNK_SIZE", "200"))
+BULK_IMAGE_WORKERS = int(os.getenv("SIMPLE_DB_BULK_IMAGE_WORKERS", str(min(8, (os.cpu_count() or 1) + 4))))
 
 class SimpleScriptDB:
     def __init__(self, db_path: str = "murder_mystery_simple.db"):
         self.db_path = db_path
+        self._connections = ThreadLocalConnections(db_path)
+        self._writer = writer_for(db_path)
         self.init_database()
     
+    @contextmanager
+    def _connect(self):
+        """当前线程的长连接：正常退出提交，异常回滚"""
+        with self._connections.connection() as conn:
+            yield conn
+    
+    def _write(self, fn):
+        """写操作交给本进程的写线程执行，和同时排队的其他写操作一起组提交；返回 fn(conn) 的结果"""
+        return self._writer.run(fn)
+    
+    def write_stats(self) -> Dict[str, int]:
+        return self._writer.stats()
+    
+    def ping(self) -> bool:
+        """健康检查"""
+        with self._connect() as conn:
+            conn.execute("SELECT 1").fetchone()
+        return True
+    
+    def close(self):
+        """关闭所有线程持有的连接"""
+        self._connections.close_all()
+    
     def init_database(self):
-        """初始化数据库表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """初始化数据库：执行未应用的结构迁移，重建全文索引触发器"""
+        with self._connect() as conn:
+            # IMMEDIATE 在开始时就拿到写锁，多个 worker 同时启动时只有一个会执行迁移，其余等待后看到新版本
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+            # 迁移期间不让触发器同步检索表、记录变更，需要同步的迁移自己重建检索表
+            self._drop_search_triggers(cursor)
+            self._drop_change_triggers(cursor)
+            self._apply_migrations(cursor)
+            self._create_search_triggers(cursor)
+            self._create_change_triggers(cursor)
+        print("✅ 简化数据库初始化完成")
+    
+    # 结构迁移：(版本号, 方法名)，已应用的最高版本记录在 PRAGMA user_version。
+    # 只能在末尾追加新迁移，不要修改已发布的迁移。迁移需要可重复执行，
+    # 引入版本号之前创建的数据库 user_version 为 0，会从头执行一遍。
+    MIGRATIONS = [
+        (1, '_migration_001_base_tables'),
+        (2, '_migration_002_characters_table'),
+        (3, '_migration_003_search_index'),
+        (4, '_migration_004_query_indexes'),
+        (5, '_migration_005_foreign_keys'),
+        (6, '_migration_006_change_log'),
+        (7, '_migration_007_revisions'),
+        (8, '_migration_008_backfill_updated_at'),
+    ]
+    
+    @property
+    def schema_version(self) -> int:
+        return self.MIGRATIONS[-1][0]
+    
+    def _apply_migrations(self, cursor):
+        """在调用方的事务中依次执行版本号大于 user_version 的迁移，任一失败则整体回滚"""
+        current = cursor.execute('PRAGMA user_version').fetchone()[0]
+        if current > self.schema_version:
+            raise RuntimeError(f"数据库结构版本 {current} 高于程序支持的版本 {self.schema_version}")
+        for version, method_name in self.MIGRATIONS:
+            if version <= current:
+                continue
+            migration = getattr(self, method_name)
+            print(f"🔧 数据库迁移 v{version}: {migration.__doc__.strip().splitlines()[0]}")
+            migration(cursor)
+            # user_version 写在数据库文件头里，随事务一起提交或回滚
+            cursor.execute(f'PRAGMA user_version = {version}')
+    
+    def _migration_001_base_tables(self, cursor):
+        """剧本表、证物表，补齐旧版证物表缺少的列"""
         # 创建剧本表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS scripts (
@@ -56,160 +215,465 @@ class SimpleScriptDB:
             )
         ''')
         
-        # 升级现有数据库表结构
-        self._upgrade_evidences_table(cursor)
-        
-        conn.commit()
-        conn.close()
-        print("✅ 简化数据库初始化完成")
+        # 早期版本的证物表没有这些列
+        cursor.execute("PRAGMA table_info(evidences)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        columns_to_add = {
+            'overview': 'TEXT',
+            'clues': 'TEXT',
+            'initial_state': "TEXT DEFAULT 'surface'",
+            'related_characters': 'TEXT'
+        }
+        for column_name, column_type in columns_to_add.items():
+            if column_name not in existing_columns:
+                cursor.execute(f'ALTER TABLE evidences ADD COLUMN {column_name} {column_type}')
+                print(f"✅ 添加证物表字段: {column_name}")
     
-    def _upgrade_evidences_table(self, cursor):
-        """升级证物表结构，添加缺失的字段"""
-        try:
-            # 检查表是否存在
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='evidences'")
-            if not cursor.fetchone():
-                return  # 表不存在，不需要升级
-            
-            # 获取现有列
-            cursor.execute("PRAGMA table_info(evidences)")
-            existing_columns = {row[1] for row in cursor.fetchall()}
-            
-            # 需要添加的列
-            columns_to_add = {
-                'overview': 'TEXT',
-                'clues': 'TEXT',
-                'initial_state': "TEXT DEFAULT 'surface'",
-                'related_characters': 'TEXT'
-            }
-            
-            # 添加缺失的列
-            for column_name, column_type in columns_to_add.items():
-                if column_name not in existing_columns:
-                    try:
-                        cursor.execute(f'ALTER TABLE evidences ADD COLUMN {column_name} {column_type}')
-                        print(f"✅ 添加证物表字段: {column_name}")
-                    except Exception as e:
-                        print(f"⚠️ 添加字段 {column_name} 失败: {e}")
+        # 剧本列表按更新时间倒序分页
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_scripts_updated_at_id ON scripts (updated_at DESC, id DESC)')
+    
+    def _migration_002_characters_table(self, cursor):
+        """角色表：每个角色一行，完整数据存在 data_json，身份标记拆成带索引的列"""
+        flag_columns = ''.join(f'{column} INTEGER NOT NULL DEFAULT 0,\n                '
+                               for column in CHARACTER_FLAGS.values())
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS characters (
+                script_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                role_type TEXT,
+                {flag_columns}has_avatar INTEGER NOT NULL DEFAULT 0,
+                data_json TEXT NOT NULL,
+                PRIMARY KEY (script_id, position),
+                FOREIGN KEY (script_id) REFERENCES scripts (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_characters_name ON characters (name)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_characters_role_type ON characters (role_type)')
+        # 标记为真的角色很少，用部分索引只收录这些行
+        for column in CHARACTER_FLAGS.values():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_characters_{column} ON characters (script_id) WHERE {column} = 1')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_characters_missing_avatar ON characters (script_id) WHERE has_avatar = 0')
+    
+        # 把旧数据 scripts.characters_json 拆分到角色表，之后清空该列
+        cursor.execute("SELECT id, characters_json FROM scripts WHERE characters_json IS NOT NULL")
+        rows = cursor.fetchall()
+        migrated = 0
+        for script_id, characters_json in rows:
+            try:
+                characters = fast_json.loads(characters_json)
+            except (TypeError, ValueError):
+                print(f"⚠️ 剧本 {script_id} 的角色数据无法解析，跳过")
+                continue
+            if isinstance(characters, list):
+                self._write_characters(cursor, script_id, characters)
+                migrated += 1
+        cursor.execute("UPDATE scripts SET characters_json = NULL WHERE characters_json IS NOT NULL")
+        if rows:
+            print(f"✅ 角色数据已迁移到角色表: {migrated} 个剧本")
+    
+    @staticmethod
+    def _character_rows(script_id: str, characters: List[Dict[str, Any]]) -> List[tuple]:
+        """角色列表转成 characters 表的行，顺序与 _INSERT_CHARACTER_SQL 的列一致"""
+        return [(
+            script_id, position, character.get('name') or '', character.get('roleType'),
+            *(1 if character.get(key) else 0 for key in CHARACTER_FLAGS),
+            1 if character.get('image') else 0,
+            fast_json.dumps(character)
+        ) for position, character in enumerate(characters)]
+    
+    @staticmethod
+    def _write_characters(cursor, script_id: str, characters: List[Dict[str, Any]]):
+        """替换剧本的全部角色"""
+        cursor.execute('DELETE FROM characters WHERE script_id = ?', (script_id,))
+        cursor.executemany(_INSERT_CHARACTER_SQL, SimpleScriptDB._character_rows(script_id, characters))
+    
+    @staticmethod
+    def _load_characters(conn, script_ids: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """按剧本分组读取角色，保持保存时的顺序；script_ids 为空时读取全部"""
+        if script_ids is None:
+            rows = conn.execute('SELECT script_id, data_json FROM characters ORDER BY script_id, position').fetchall()
+        else:
+            rows = []
+            # SQLite 单条语句的参数个数有限，分批查询
+            for start in range(0, len(script_ids), 500):
+                batch = script_ids[start:start + 500]
+                rows.extend(conn.execute(
+                    f'''SELECT script_id, data_json FROM characters
+                        WHERE script_id IN ({', '.join('?' for _ in batch)})
+                        ORDER BY script_id, position''', batch
+                ).fetchall())
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for script_id, data_json in rows:
+            grouped.setdefault(script_id, []).append(fast_json.loads(data_json))
+        return grouped
+    
+    def _migration_003_search_index(self, cursor):
+        """FTS5 检索表，从现有数据重建内容"""
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS scripts_fts USING fts5(
+                script_id UNINDEXED, title, description, global_story, characters,
+                tokenize = 'trigram'
+            )
+        ''')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS evidences_fts USING fts5(
+                evidence_id UNINDEXED, script_id UNINDEXED, name, description, clues,
+                tokenize = 'trigram'
+            )
+        ''')
+        # 旧库可能已经有检索表，清空后整体重建
+        for table, fts_table, columns, values in _FTS_TABLES:
+            cursor.execute(f"DELETE FROM {fts_table}")
+            cursor.execute(f"INSERT INTO {fts_table} ({columns}) SELECT {values.format(src=table)} FROM {table}")
+            print(f"✅ 全文索引已回填: {fts_table}")
+    
+    def _migration_004_query_indexes(self, cursor):
+        """按实际查询补齐索引，让过滤和排序都走索引（见 benchmarks/check_query_plans.py）"""
+        # 证物按剧本查询并按创建时间倒序；外键级联删除也用它查找子行
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_evidences_script_created ON evidences (script_id, created_at DESC)')
+        # find_characters 按 (script_id, position) 排序，索引里带上排序列就不需要临时排序
+        cursor.execute('DROP INDEX IF EXISTS idx_characters_name')
+        cursor.execute('DROP INDEX IF EXISTS idx_characters_role_type')
+        cursor.execute('CREATE INDEX idx_characters_name ON characters (name, script_id, position)')
+        cursor.execute('CREATE INDEX idx_characters_role_type ON characters (role_type, script_id, position)')
+        for column in [*CHARACTER_FLAGS.values(), 'missing_avatar']:
+            cursor.execute(f'DROP INDEX IF EXISTS idx_characters_{column}')
+        for column in CHARACTER_FLAGS.values():
+            cursor.execute(f'CREATE INDEX idx_characters_{column} ON characters (script_id, position) WHERE {column} = 1')
+        cursor.execute('CREATE INDEX idx_characters_missing_avatar ON characters (script_id, position) WHERE has_avatar = 0')
+    
+    def _migration_005_foreign_keys(self, cursor):
+        """清理剧本已删除的证物和角色，之后由外键约束保证一致（连接上开启 foreign_keys）"""
+        cursor.execute('DELETE FROM evidences WHERE script_id NOT IN (SELECT id FROM scripts)')
+        orphan_evidences = cursor.rowcount
+        cursor.execute('DELETE FROM characters WHERE script_id NOT IN (SELECT id FROM scripts)')
+        orphan_characters = cursor.rowcount
+        # 迁移期间触发器不在，检索表里对应的行要手动删掉
+        cursor.execute('DELETE FROM evidences_fts WHERE rowid NOT IN (SELECT rowid FROM evidences)')
+        if orphan_evidences or orphan_characters:
+            print(f"🗑️ 清理孤立数据: 证物 {orphan_evidences} 个, 角色 {orphan_characters} 个")
+        violations = cursor.execute('PRAGMA foreign_key_check').fetchall()
+        if violations:
+            raise RuntimeError(f"外键检查未通过: {violations[:5]}")
+    
+    def _migration_006_change_log(self, cursor):
+        """变更记录表，供 /db/changes 增量同步；已有的剧本和证物记为新建"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                script_id TEXT,
+                op TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                UNIQUE (entity, entity_id)
+            )
+        ''')
+        for table, entity, script_column in _CHANGE_SOURCES:
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO changes (entity, entity_id, script_id, op, changed_at)
+                SELECT '{entity}', id, {script_column}, 'created', COALESCE(updated_at, strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+                FROM {table} ORDER BY updated_at, id
+            ''')
+    
+    def _migration_007_revisions(self, cursor):
+        """剧本版本号（每次保存加一），和按剧本查找证物变更的索引，供读接口生成 ETag"""
+        cursor.execute("PRAGMA table_info(scripts)")
+        if 'revision' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE scripts ADD COLUMN revision INTEGER NOT NULL DEFAULT 1')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_changes_script_entity ON changes (script_id, entity, entity_id)')
+    
+    def _migration_008_backfill_updated_at(self, cursor):
+        """补齐为空的剧本更新时间：摘要分页按 (updated_at, id) 比较，NULL 的行会被跳过或提前结束分页"""
+        cursor.execute('''
+            UPDATE scripts SET updated_at = COALESCE(created_at, strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+            WHERE updated_at IS NULL
+        ''')
+    
+    @staticmethod
+    def _drop_change_triggers(cursor):
+        for table, _, _ in _CHANGE_SOURCES:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS changes_{table}_{suffix}')
+    
+    @staticmethod
+    def _create_change_triggers(cursor):
+        """剧本、证物的每次写入都在 changes 表记一笔；外键级联删除的证物同样会触发"""
+        # 先删后插而不是 INSERT OR REPLACE：触发器里的冲突处理会被外层语句的 OR 子句覆盖
+        for table, entity, script_column in _CHANGE_SOURCES:
+            for suffix, event, ref, op in (('ai', 'INSERT', 'NEW', 'created'),
+                                           ('au', 'UPDATE', 'NEW', 'updated'),
+                                           ('ad', 'DELETE', 'OLD', 'deleted')):
+                cursor.execute(f'''
+                    CREATE TRIGGER changes_{table}_{suffix} AFTER {event} ON {table} BEGIN
+                        DELETE FROM changes WHERE entity = '{entity}' AND entity_id = {ref}.id;
+                        INSERT INTO changes (entity, entity_id, script_id, op, changed_at)
+                        VALUES ('{entity}', {ref}.id, {ref}.{script_column}, '{op}', strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+                    END
+                ''')
+    
+    @staticmethod
+    def _drop_search_triggers(cursor):
+        for _, fts_table, _, _ in _FTS_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+    
+    @staticmethod
+    def _create_search_triggers(cursor):
+        """创建检索表同步触发器；定义可能随版本变化，每次启动都重建"""
+        # 检索表与主表按 rowid 对应。插入触发器里先按 rowid 清理一次，防止 INSERT OR REPLACE 残留旧行。
+        # 剧本的角色列取自角色表，所以 save_script 要先写角色再写剧本行
+        for table, fts_table, columns, values in _FTS_TABLES:
+            insert_new = f"INSERT INTO {fts_table} ({columns}) VALUES ({values.format(src='NEW')})"
+            cursor.execute(f'''
+                CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                    DELETE FROM {fts_table} WHERE rowid = NEW.rowid;
+                    {insert_new};
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                    DELETE FROM {fts_table} WHERE rowid = OLD.rowid;
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER {fts_table}_au AFTER UPDATE ON {table} BEGIN
+                    DELETE FROM {fts_table} WHERE rowid = OLD.rowid;
+                    {insert_new};
+                END
+            ''')
+    
+    def _prepare_script_row(self, script_data: Dict[str, Any]) -> Tuple[tuple, List[Dict[str, Any]]]:
+        """把前端剧本数据转成 scripts 表的一行，base64 封面写成文件；返回 (行, 角色列表)"""
+        script_id = script_data.get('id')
+        title = script_data.get('title', '')
+        description = script_data.get('description', '')
+        author = script_data.get('author', '')
+        version = script_data.get('version', '1.0.0')
+        # 显式传 null 也按当前时间处理：updated_at 是摘要分页游标的一部分，不能为空
+        created_at = script_data.get('createdAt') or datetime.utcnow().isoformat()
+        updated_at = script_data.get('updatedAt') or datetime.utcnow().isoformat()
+        global_story = script_data.get('globalStory', '')
+        source_type = script_data.get('sourceType', 'manual')
         
-        except Exception as e:
-            print(f"⚠️ 升级证物表结构失败: {e}")
+        # 处理封面
+        cover_image = script_data.get('coverImage')
+        cover_image_path = None
+        cover_image_filename = None
+        
+        if cover_image:
+            if is_data_url(cover_image):
+                # 保存base64封面为文件，相同内容的封面只存一份
+                try:
+                    stored = asset_store.put_data_url('cover', cover_image)
+                    cover_image_filename = stored.filename
+                    cover_image_path = stored.url_path
+                    
+                    print(f"📁 封面文件已保存: {stored.filename}" if stored.created else f"📁 复用已有封面文件: {stored.filename}")
+                    
+                except Exception as e:
+                    print(f"⚠️ 保存封面文件失败: {e}")
+            elif cover_image.startswith('/script_covers/'):
+                # 已经是文件路径
+                cover_image_path = cover_image
+                cover_image_filename = cover_image.replace('/script_covers/', '')
+        
+        # 序列化复杂字段（角色单独存到角色表）
+        characters = script_data.get('characters', []) or []
+        settings_json = fast_json.dumps(script_data.get('settings', {}))
+        quiz_json = fast_json.dumps(script_data.get('quiz', []))
+        
+        row = (
+            script_id, title, description, author, version, created_at, updated_at,
+            global_story, source_type, cover_image_path, cover_image_filename,
+            settings_json, quiz_json
+        )
+        return row, characters
     
     def save_script(self, script_data: Dict[str, Any]) -> bool:
         """保存剧本到数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            script_id = script_data.get('id')
-            title = script_data.get('title', '')
-            description = script_data.get('description', '')
-            author = script_data.get('author', '')
-            version = script_data.get('version', '1.0.0')
-            created_at = script_data.get('createdAt', datetime.utcnow().isoformat())
-            updated_at = script_data.get('updatedAt', datetime.utcnow().isoformat())
-            global_story = script_data.get('globalStory', '')
-            source_type = script_data.get('sourceType', 'manual')
-            
-            # 处理封面
-            cover_image = script_data.get('coverImage')
-            cover_image_path = None
-            cover_image_filename = None
+            row, characters = self._prepare_script_row(script_data)
             
-            if cover_image:
-                if cover_image.startswith('data:image/'):
-                    # 保存base64封面为文件
-                    try:
-                        base64_data = cover_image.split(',')[1]
-                        timestamp = int(datetime.utcnow().timestamp() * 1000)
-                        cover_filename = f"script_cover_{script_id}_{timestamp}.png"
-                        
-                        # 保存到public目录
-                        public_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'script_covers')
-                        os.makedirs(public_dir, exist_ok=True)
-                        
-                        import base64 as b64
-                        image_data = b64.b64decode(base64_data)
-                        public_path = os.path.join(public_dir, cover_filename)
-                        
-                        with open(public_path, 'wb') as f:
-                            f.write(image_data)
-                        
-                        cover_image_filename = cover_filename
-                        cover_image_path = f"/script_covers/{cover_filename}"
-                        
-                        print(f"📁 封面文件已保存: {cover_filename}")
-                        
-                    except Exception as e:
-                        print(f"⚠️ 保存封面文件失败: {e}")
-                elif cover_image.startswith('/script_covers/'):
-                    # 已经是文件路径
-                    cover_image_path = cover_image
-                    cover_image_filename = cover_image.replace('/script_covers/', '')
+            # 插入或更新数据；先写角色，剧本行的全文索引触发器会读取角色表
+            def write(conn):
+                self._write_characters(conn, row[0], characters)
+                conn.execute(_UPSERT_SCRIPT_SQL, row)
             
-            # 序列化复杂字段
-            characters_json = json.dumps(script_data.get('characters', []), ensure_ascii=False)
-            settings_json = json.dumps(script_data.get('settings', {}), ensure_ascii=False)
-            quiz_json = json.dumps(script_data.get('quiz', []), ensure_ascii=False)
+            self._write(write)
             
-            # 插入或更新数据
-            cursor.execute('''
-                INSERT OR REPLACE INTO scripts 
-                (id, title, description, author, version, created_at, updated_at, 
-                 global_story, source_type, cover_image_path, cover_image_filename,
-                 characters_json, settings_json, quiz_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                script_id, title, description, author, version, created_at, updated_at,
-                global_story, source_type, cover_image_path, cover_image_filename,
-                characters_json, settings_json, quiz_json
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-            print(f"✅ 剧本保存到数据库成功: {title}")
+            print(f"✅ 剧本保存到数据库成功: {row[1]}")
             return True
             
         except Exception as e:
             print(f"❌ 保存剧本到数据库失败: {e}")
             return False
     
+    def save_scripts_bulk(self, scripts: List[Dict[str, Any]],
+                          chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        批量保存剧本及其证物（剧本数据中的 evidences 字段），每保存完一批就产出这一批的结果
+        
+        每 chunk_size 个剧本在一个事务里用 executemany 写入；封面、证物图片的 base64 解码和写文件
+        在线程池中并行，且在事务开始之前完成，不占用写锁。某一批的事务失败时这一批全部记为失败，不影响其他批。
+        
+        Yields:
+            {'index': 在 scripts 中的下标, 'id': 剧本 ID, 'success': 是否成功,
+             'evidence_count': 保存的证物数, 'error': 失败原因（仅失败时）}
+        """
+        with ThreadPoolExecutor(max_workers=BULK_IMAGE_WORKERS) as pool:
+            for start in range(0, len(scripts), chunk_size):
+                chunk = scripts[start:start + chunk_size]
+                prepared = list(pool.map(self._prepare_bulk_item, chunk))
+                yield from self._write_bulk_chunk(start, prepared)
+    
+    def _prepare_bulk_item(self, script_data: Dict[str, Any]):
+        """在线程池中执行：返回 (剧本行, 角色列表, 证物行列表, 错误信息)"""
+        try:
+            if not isinstance(script_data, dict) or not script_data.get('id'):
+                raise ValueError("缺少剧本 id")
+            row, characters = self._prepare_script_row(script_data)
+            evidence_rows = [self._prepare_evidence_row({**evidence, 'script_id': row[0]})
+                             for evidence in script_data.get('evidences') or []]
+            return row, characters, evidence_rows, None
+        except Exception as e:
+            return None, None, None, str(e)
+    
+    def _write_bulk_chunk(self, offset: int, prepared: List[tuple]) -> List[Dict[str, Any]]:
+        """在一个事务中写入一批已准备好的剧本，返回逐条结果"""
+        results = []
+        # 同一批里重复的剧本 ID 以最后出现的为准
+        last_index = {item[0][0]: i for i, item in enumerate(prepared) if item[3] is None}
+        writable = []
+        for i, (row, characters, evidence_rows, error) in enumerate(prepared):
+            result = {'index': offset + i, 'id': row[0] if row else None, 'success': False, 'evidence_count': 0}
+            if error is None and last_index[row[0]] != i:
+                error = "同一批次中有重复的剧本 ID，以后出现的为准"
+            if error is None:
+                writable.append((result, row, characters, evidence_rows))
+            else:
+                result['error'] = error
+            results.append(result)
+        
+        if writable:
+            try:
+                # 先写角色，剧本行的全文索引触发器会读取角色表；证物在剧本之后写，满足外键约束
+                def write(conn):
+                    conn.executemany('DELETE FROM characters WHERE script_id = ?', [(row[0],) for _, row, _, _ in writable])
+                    conn.executemany(_INSERT_CHARACTER_SQL, [
+                        character_row for _, row, characters, _ in writable
+                        for character_row in self._character_rows(row[0], characters)
+                    ])
+                    conn.executemany(_UPSERT_SCRIPT_SQL, [row for _, row, _, _ in writable])
+                    conn.executemany(_UPSERT_EVIDENCE_SQL, [
+                        evidence_row for _, _, _, evidence_rows in writable for evidence_row in evidence_rows
+                    ])
+                
+                self._write(write)
+                for result, _, _, evidence_rows in writable:
+                    result['success'] = True
+                    result['evidence_count'] = len(evidence_rows)
+            except Exception as e:
+                for result, _, _, _ in writable:
+                    result['error'] = f"批次写入失败: {e}"
+        
+        success_count = sum(1 for result in results if result['success'])
+        print(f"📦 批量保存剧本: 成功 {success_count} 个，失败 {len(results) - success_count} 个")
+        return results
+    
+    @staticmethod
+    def _script_from_row(row, characters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """按 _SCRIPT_COLUMNS 的一行转成前端剧本格式"""
+        return {
+            'id': row[0],
+            'title': row[1],
+            'description': row[2] or '',
+            'author': row[3] or '',
+            'version': row[4],
+            'createdAt': row[5],
+            'updatedAt': row[6],
+            'globalStory': row[7] or '',
+            'sourceType': row[8],
+            'coverImage': row[9],  # 使用路径
+            'characters': characters,
+            'settings': fast_json.loads(row[12]) if row[12] else {},
+            'quiz': fast_json.loads(row[13]) if row[13] else []
+        }
+    
+    @staticmethod
+    def _evidence_from_row(row) -> Dict[str, Any]:
+        """按 _EVIDENCE_COLUMNS 的一行转成前端证物格式"""
+        # 解析关联角色JSON
+        related_characters = []
+        if row[10]:  # related_characters
+            try:
+                related_characters = fast_json.loads(row[10])
+            except:
+                related_characters = []
+        
+        return {
+            'id': row[0],
+            'script_id': row[1],
+            'name': row[2],
+            'description': row[3] or '',
+            'overview': row[4] or '',
+            'clues': row[5] or '',
+            'category': row[6] or 'physical',
+            'image': row[7],  # 使用路径
+            'importance': row[8] or 'normal',
+            'initialState': row[9] or 'surface',
+            'relatedCharacters': related_characters,
+            'createdAt': row[11],
+            'updatedAt': row[12]
+        }
+    
+    def script_document(self, script_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        把前端剧本数据整理成 get_script 返回的格式（base64 封面写成文件），不写数据库
+        
+        其他存储后端用它保证和本库读出的数据完全一致。返回 (剧本, 封面文件名)
+        """
+        row, characters = self._prepare_script_row(script_data)
+        # 写入用的行没有 characters_json 列
+        return self._script_from_row(row[:11] + (None,) + row[11:], characters), row[10]
+    
+    def evidence_document(self, evidence_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """把前端证物数据整理成 get_evidences_by_script 返回的格式，返回 (证物, 图片文件名)"""
+        row = self._prepare_evidence_row(evidence_data)
+        # 写入用的行比读取的列多一个 image_filename
+        return self._evidence_from_row(row[:8] + row[9:]), row[8]
+    
+    def get_script_version(self, script_id: str) -> Optional[Tuple[int, Optional[str]]]:
+        """剧本的 (版本号, 更新时间)，剧本不存在时返回 None；只读一行的两列，用于生成 ETag"""
+        with self._connect() as conn:
+            return conn.execute('SELECT revision, updated_at FROM scripts WHERE id = ?', (script_id,)).fetchone()
+    
+    def get_evidences_version(self, script_id: str) -> List[Tuple[str, int]]:
+        """剧本下每个证物的 (ID, 最近一次变更序号)；证物的增删改、移到其他剧本都会让结果变化"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT entity_id, seq FROM changes WHERE script_id = ? AND entity = 'evidence' AND op != 'deleted' "
+                "ORDER BY entity_id", (script_id,)
+            ).fetchall()
+    
+    def get_library_version(self) -> int:
+        """最新的变更序号；任何剧本、证物的增删改都会让它变大，用于判断剧本列表是否变化"""
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+    
     def get_all_scripts(self) -> List[Dict[str, Any]]:
         """获取所有剧本"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, title, description, author, version, created_at, updated_at,
-                       global_story, source_type, cover_image_path, cover_image_filename,
-                       characters_json, settings_json, quiz_json
-                FROM scripts
-                ORDER BY updated_at DESC
-            ''')
-            
-            rows = cursor.fetchall()
-            conn.close()
+            with self._connect() as conn:
+                rows = conn.execute(f'''
+                    SELECT {_SCRIPT_COLUMNS}
+                    FROM scripts
+                    ORDER BY updated_at DESC
+                ''').fetchall()
+                characters_by_script = self._load_characters(conn)
             
-            scripts = []
-            for row in rows:
-                script = {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2] or '',
-                    'author': row[3] or '',
-                    'version': row[4],
-                    'createdAt': row[5],
-                    'updatedAt': row[6],
-                    'globalStory': row[7] or '',
-                    'sourceType': row[8],
-                    'coverImage': row[9],  # 使用路径
-                    'characters': json.loads(row[11]) if row[11] else [],
-                    'settings': json.loads(row[12]) if row[12] else {},
-                    'quiz': json.loads(row[13]) if row[13] else []
-                }
-                scripts.append(script)
+            scripts = [self._script_from_row(row, characters_by_script.get(row[0], [])) for row in rows]
             
             print(f"📋 从数据库加载剧本: {len(scripts)} 个")
             return scripts
@@ -218,39 +682,273 @@ class SimpleScriptDB:
             print(f"❌ 从数据库获取剧本失败: {e}")
             return []
     
-    def get_script(self, script_id: str) -> Optional[Dict[str, Any]]:
-        """获取指定剧本"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def get_changes(self, since: int = 0, limit: int = CHANGES_PAGE_LIMIT) -> Dict[str, Any]:
+        """
+        增量同步：返回序号大于 since 的剧本和证物变更
+        
+        每个剧本/证物只保留最近一次变更，同一对象改多次也只返回一条。新建和修改的对象附带完整数据，删除的只有 ID。
+        
+        Args:
+            since: 客户端上次同步得到的 next_since，首次同步传 0
+            limit: 每页最多返回的变更数
+        
+        Returns:
+            {'changes': [{'seq', 'entity', 'id', 'scriptId', 'op', 'changedAt'}],
+             'scripts': 新建/修改的剧本, 'evidences': 新建/修改的证物,
+             'next_since': 下次请求使用的 since, 'has_more': 是否还有下一页,
+             'current_seq': 当前最新序号, 'reset': since 超过了当前序号（数据库被重建），客户端需要全量重新加载}
+        
+        Raises:
+            ValueError: since 为负数
+        """
+        if since < 0:
+            raise ValueError(f"无效的同步序号: {since}")
+        limit = max(1, min(limit, CHANGES_PAGE_LIMIT))
+        
+        with self._connect() as conn:
+            # 变更记录和对象数据在同一个读事务里读取，看到的是同一个快照
+            conn.execute('BEGIN')
+            current_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+            if since > current_seq:
+                return {'changes': [], 'scripts': [], 'evidences': [], 'next_since': current_seq,
+                        'has_more': False, 'current_seq': current_seq, 'reset': True}
+            
+            rows = conn.execute(
+                'SELECT seq, entity, entity_id, script_id, op, changed_at FROM changes WHERE seq > ? ORDER BY seq LIMIT ?',
+                (since, limit + 1)
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            
+            script_ids = [row[2] for row in rows if row[1] == 'script' and row[4] != 'deleted']
+            evidence_ids = [row[2] for row in rows if row[1] == 'evidence' and row[4] != 'deleted']
+            script_rows = []
+            evidence_rows = []
+            # SQLite 单条语句的参数个数有限，分批查询
+            for start in range(0, len(script_ids), 500):
+                batch = script_ids[start:start + 500]
+                script_rows.extend(conn.execute(
+                    f"SELECT {_SCRIPT_COLUMNS} FROM scripts WHERE id IN ({', '.join('?' for _ in batch)})", batch
+                ).fetchall())
+            for start in range(0, len(evidence_ids), 500):
+                batch = evidence_ids[start:start + 500]
+                evidence_rows.extend(conn.execute(
+                    f"SELECT {_EVIDENCE_COLUMNS} FROM evidences WHERE id IN ({', '.join('?' for _ in batch)})", batch
+                ).fetchall())
+            characters_by_script = self._load_characters(conn, script_ids) if script_ids else {}
+        
+        return {
+            'changes': [{'seq': row[0], 'entity': row[1], 'id': row[2], 'scriptId': row[3], 'op': row[4],
+                         'changedAt': row[5]} for row in rows],
+            'scripts': [self._script_from_row(row, characters_by_script.get(row[0], [])) for row in script_rows],
+            'evidences': [self._evidence_from_row(row) for row in evidence_rows],
+            'next_since': rows[-1][0] if rows else since,
+            'has_more': has_more,
+            'current_seq': current_seq,
+            'reset': False,
+        }
+    
+    def list_script_summaries(self, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分页获取剧本摘要（剧本库列表用），不读取故事正文、设置和问答
+        
+        Args:
+            limit: 每页数量
+            cursor: 上一页返回的 next_cursor，为空时从最新的剧本开始
             
-            cursor.execute('''
-                SELECT id, title, description, author, version, created_at, updated_at,
-                       global_story, source_type, cover_image_path, cover_image_filename,
-                       characters_json, settings_json, quiz_json
+        Returns:
+            {'scripts': [...], 'next_cursor': 下一页游标，没有更多时为 None}
+        """
+        params: List[Any] = []
+        where = ''
+        if cursor:
+            updated_at, script_id = _decode_cursor(cursor)
+            where = 'WHERE (updated_at, id) < (?, ?)'
+            params.extend([updated_at, script_id])
+        # 多取一条用于判断是否还有下一页
+        params.append(limit + 1)
+        
+        with self._connect() as conn:
+            rows = conn.execute(f'''
+                SELECT id, title, description, author, cover_image_path, updated_at,
+                       (SELECT COUNT(*) FROM characters AS c WHERE c.script_id = scripts.id)
                 FROM scripts
-                WHERE id = ?
-            ''', (script_id,))
+                {where}
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+            ''', params).fetchall()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        summaries = [{
+            'id': row[0],
+            'title': row[1],
+            'description': row[2] or '',
+            'author': row[3] or '',
+            'coverImage': row[4],
+            'updatedAt': row[5],
+            'characterCount': row[6],
+        } for row in rows]
+        next_cursor = _encode_cursor(rows[-1][5], rows[-1][0]) if has_more and rows else None
+        return {'scripts': summaries, 'next_cursor': next_cursor}
+    
+    def find_characters(self, script_id: Optional[str] = None, role_type: Optional[str] = None,
+                        flag: Optional[str] = None, missing_avatar: bool = False, name: Optional[str] = None,
+                        limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        按条件查找角色，走角色表上的索引，不需要解析整个剧本
+        
+        Args:
+            script_id: 只查该剧本
+            role_type: 角色类型，如 '凶手'、'搭档'
+            flag: 身份标记，CHARACTER_FLAGS 中的前端字段名，如 'isKiller'
+            missing_avatar: 只返回没有头像的角色
+            name: 角色名（精确匹配）
+            limit: 最多返回的数量
+        """
+        conditions = []
+        params: List[Any] = []
+        if script_id:
+            conditions.append('c.script_id = ?')
+            params.append(script_id)
+        if role_type:
+            conditions.append('c.role_type = ?')
+            params.append(role_type)
+        if flag:
+            if flag not in CHARACTER_FLAGS:
+                raise ValueError(f"未知的角色标记: {flag}")
+            # 部分索引要求条件中出现字面量 1，不能用参数
+            conditions.append(f'c.{CHARACTER_FLAGS[flag]} = 1')
+        if missing_avatar:
+            conditions.append('c.has_avatar = 0')
+        if name:
+            conditions.append('c.name = ?')
+            params.append(name)
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        params.append(limit)
+        
+        with self._connect() as conn:
+            rows = conn.execute(f'''
+                SELECT c.script_id, s.title, c.position, c.data_json
+                FROM characters AS c
+                JOIN scripts AS s ON s.id = c.script_id
+                {where}
+                ORDER BY c.script_id, c.position
+                LIMIT ?
+            ''', params).fetchall()
+        
+        return [{
+            'scriptId': row[0],
+            'scriptTitle': row[1],
+            'position': row[2],
+            'character': fast_json.loads(row[3]),
+        } for row in rows]
+    
+    def search(self, query: str, limit: int = 20, offset: int = 0, kind: str = 'all') -> Dict[str, Any]:
+        """
+        全文检索剧本（标题、简介、故事、角色名和简介）和证物（名称、描述、线索），按相关度排序
+        
+        Args:
+            query: 检索词，空格分隔的多个词需要同时命中
+            limit: 每页数量
+            offset: 跳过的结果数
+            kind: 'all' / 'scripts' / 'evidences'
             
-            row = cursor.fetchone()
-            conn.close()
+        Returns:
+            {'results': [...], 'has_more': 是否还有下一页}
+        """
+        terms = query.split()
+        if not terms:
+            return {'results': [], 'has_more': False}
+        
+        use_fts = all(len(term) >= FTS_MIN_TERM_LENGTH for term in terms)
+        selects = []
+        params: List[Any] = []
+        
+        if use_fts:
+            # 每个词作为短语加引号，避免用户输入被当成 FTS5 查询语法
+            match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+            if kind in ('all', 'scripts'):
+                selects.append('''
+                    SELECT 'script', f.script_id, NULL, f.title, f.title,
+                           snippet(scripts_fts, -1, '<mark>', '</mark>', '…', 16),
+                           bm25(scripts_fts, 0.0, 10.0, 5.0, 1.0, 3.0) AS score
+                    FROM scripts_fts AS f
+                    WHERE scripts_fts MATCH ?
+                ''')
+                params.append(match)
+            if kind in ('all', 'evidences'):
+                selects.append('''
+                    SELECT 'evidence', f.script_id, f.evidence_id, f.name, s.title,
+                           snippet(evidences_fts, -1, '<mark>', '</mark>', '…', 16),
+                           bm25(evidences_fts, 0.0, 0.0, 5.0, 2.0, 1.0) AS score
+                    FROM evidences_fts AS f
+                    LEFT JOIN scripts AS s ON s.id = f.script_id
+                    WHERE evidences_fts MATCH ?
+                ''')
+                params.append(match)
+        else:
+            # trigram 无法索引少于 3 个字的词（中文人名常见），退化为对检索表的 LIKE 扫描，标题命中排在前面
+            patterns = ['%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                        for term in terms]
+            if kind in ('all', 'scripts'):
+                body = "f.title || ' ' || f.description || ' ' || f.characters || ' ' || f.global_story"
+                conditions = ' AND '.join(f"({body}) LIKE ? ESCAPE '\\'" for _ in patterns)
+                selects.append(f'''
+                    SELECT 'script', f.script_id, NULL, f.title, f.title, {body},
+                           CASE WHEN f.title LIKE ? ESCAPE '\\' THEN 0 ELSE 1 END AS score
+                    FROM scripts_fts AS f
+                    WHERE {conditions}
+                ''')
+                params.extend([patterns[0], *patterns])
+            if kind in ('all', 'evidences'):
+                body = "f.name || ' ' || f.description || ' ' || f.clues"
+                conditions = ' AND '.join(f"({body}) LIKE ? ESCAPE '\\'" for _ in patterns)
+                selects.append(f'''
+                    SELECT 'evidence', f.script_id, f.evidence_id, f.name, s.title, {body},
+                           CASE WHEN f.name LIKE ? ESCAPE '\\' THEN 0 ELSE 1 END AS score
+                    FROM evidences_fts AS f
+                    LEFT JOIN scripts AS s ON s.id = f.script_id
+                    WHERE {conditions}
+                ''')
+                params.extend([patterns[0], *patterns])
+        
+        if not selects:
+            return {'results': [], 'has_more': False}
+        
+        params.extend([limit + 1, offset])
+        with self._connect() as conn:
+            rows = conn.execute(
+                ' UNION ALL '.join(selects) + ' ORDER BY score LIMIT ? OFFSET ?', params
+            ).fetchall()
+        
+        has_more = len(rows) > limit
+        results = []
+        for row in rows[:limit]:
+            results.append({
+                'type': row[0],
+                'scriptId': row[1],
+                'evidenceId': row[2],
+                'title': row[3],
+                'scriptTitle': row[4],
+                'snippet': row[5] if use_fts else _like_snippet(row[5] or '', terms[0]),
+                'score': row[6],
+            })
+        return {'results': results, 'has_more': has_more}
+    
+    def get_script(self, script_id: str) -> Optional[Dict[str, Any]]:
+        """获取指定剧本"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(f'''
+                    SELECT {_SCRIPT_COLUMNS}
+                    FROM scripts
+                    WHERE id = ?
+                ''', (script_id,)).fetchone()
+                characters = self._load_characters(conn, [script_id]).get(script_id, []) if row else []
             
             if row:
-                script = {
-                    'id': row[0],
-                    'title': row[1],
-                    'description': row[2] or '',
-                    'author': row[3] or '',
-                    'version': row[4],
-                    'createdAt': row[5],
-                    'updatedAt': row[6],
-                    'globalStory': row[7] or '',
-                    'sourceType': row[8],
-                    'coverImage': row[9],
-                    'characters': json.loads(row[11]) if row[11] else [],
-                    'settings': json.loads(row[12]) if row[12] else {},
-                    'quiz': json.loads(row[13]) if row[13] else []
-                }
+                script = self._script_from_row(row, characters)
                 print(f"📖 从数据库获取剧本: {script['title']}")
                 return script
             else:
@@ -263,28 +961,29 @@ class SimpleScriptDB:
     def delete_script(self, script_id: str) -> bool:
         """删除剧本"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 先获取封面文件名
-            cursor.execute('SELECT cover_image_filename FROM scripts WHERE id = ?', (script_id,))
-            row = cursor.fetchone()
+            # 先获取封面文件名和证物图片文件名（证物随剧本级联删除）
+            with self._connect() as conn:
+                row = conn.execute('SELECT cover_image_filename FROM scripts WHERE id = ?', (script_id,)).fetchone()
+                evidence_images = [r[0] for r in conn.execute(
+                    'SELECT image_filename FROM evidences WHERE script_id = ? AND image_filename IS NOT NULL', (script_id,)
+                )]
             
+            # 删除封面和证物图片；按内容哈希命名的文件可能被共用，由垃圾回收处理
             if row and row[0]:
-                # 删除封面文件
                 try:
-                    public_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'script_covers')
-                    file_path = os.path.join(public_dir, row[0])
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
+                    if asset_store.release('cover', row[0]):
                         print(f"🗑️ 删除封面文件: {row[0]}")
                 except Exception as e:
                     print(f"⚠️ 删除封面文件失败: {e}")
             
-            # 删除数据库记录
-            cursor.execute('DELETE FROM scripts WHERE id = ?', (script_id,))
-            conn.commit()
-            conn.close()
+            for image_filename in evidence_images:
+                try:
+                    asset_store.release('evidence', image_filename)
+                except Exception as e:
+                    print(f"⚠️ 删除证物图片失败: {e}")
+            
+            # 删除数据库记录，角色和证物由外键级联删除
+            self._write(lambda conn: conn.execute('DELETE FROM scripts WHERE id = ?', (script_id,)))
             
             print(f"✅ 从数据库删除剧本成功: {script_id}")
             return True
@@ -293,79 +992,60 @@ class SimpleScriptDB:
             print(f"❌ 从数据库删除剧本失败: {e}")
             return False
     
+    def _prepare_evidence_row(self, evidence_data: Dict[str, Any]) -> tuple:
+        """把前端证物数据转成 evidences 表的一行，base64 图片写成文件"""
+        evidence_id = evidence_data.get('id')
+        script_id = evidence_data.get('script_id') or evidence_data.get('scriptId')
+        name = evidence_data.get('name', '')
+        description = evidence_data.get('description', '')
+        overview = evidence_data.get('overview', '')
+        clues = evidence_data.get('clues', '')
+        category = evidence_data.get('category', 'physical')
+        importance = evidence_data.get('importance', 'normal')
+        initial_state = evidence_data.get('initialState', 'surface')
+        created_at = evidence_data.get('createdAt', datetime.utcnow().isoformat())
+        updated_at = evidence_data.get('updatedAt', datetime.utcnow().isoformat())
+        
+        # 处理关联角色（JSON格式存储）
+        related_characters = evidence_data.get('relatedCharacters', [])
+        related_characters_json = fast_json.dumps(related_characters)
+        
+        # 处理图片
+        image_path = None
+        image_filename = None
+        image_data_field = evidence_data.get('image')
+        
+        if image_data_field:
+            if is_data_url(image_data_field):
+                # 保存base64图片为文件，相同内容的图片只存一份
+                try:
+                    stored = asset_store.put_data_url('evidence', image_data_field)
+                    image_filename = stored.filename
+                    image_path = stored.url_path
+                    
+                    print(f"📁 证物图片已保存: {stored.filename}" if stored.created else f"📁 复用已有证物图片: {stored.filename}")
+                    
+                except Exception as e:
+                    print(f"⚠️ 保存证物图片失败: {e}")
+            elif image_data_field.startswith('/evidence_images/'):
+                # 已经是文件路径
+                image_path = image_data_field
+                image_filename = image_data_field.replace('/evidence_images/', '')
+        
+        return (
+            evidence_id, script_id, name, description, overview, clues, category, image_path,
+            image_filename, importance, initial_state, related_characters_json, created_at, updated_at
+        )
+    
     def save_evidence(self, evidence_data: Dict[str, Any]) -> bool:
         """保存证物到数据库"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            evidence_id = evidence_data.get('id')
-            script_id = evidence_data.get('script_id') or evidence_data.get('scriptId')
-            name = evidence_data.get('name', '')
-            description = evidence_data.get('description', '')
-            overview = evidence_data.get('overview', '')
-            clues = evidence_data.get('clues', '')
-            category = evidence_data.get('category', 'physical')
-            importance = evidence_data.get('importance', 'normal')
-            initial_state = evidence_data.get('initialState', 'surface')
-            created_at = evidence_data.get('createdAt', datetime.utcnow().isoformat())
-            updated_at = evidence_data.get('updatedAt', datetime.utcnow().isoformat())
-            
-            # 处理关联角色（JSON格式存储）
-            related_characters = evidence_data.get('relatedCharacters', [])
-            related_characters_json = json.dumps(related_characters, ensure_ascii=False)
-            
-            # 处理图片
-            image_path = None
-            image_filename = None
-            image_data_field = evidence_data.get('image')
-            
-            if image_data_field:
-                if image_data_field.startswith('data:image/'):
-                    # 保存base64图片为文件
-                    try:
-                        base64_data = image_data_field.split(',')[1]
-                        timestamp = int(datetime.utcnow().timestamp() * 1000)
-                        safe_name = evidence_data.get('name', 'evidence').replace(' ', '_')
-                        image_filename = f"evidence_{safe_name}_{timestamp}.png"
-                        
-                        # 保存到evidence_images目录
-                        evidence_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'evidence_images')
-                        os.makedirs(evidence_dir, exist_ok=True)
-                        
-                        import base64 as b64
-                        image_data_bytes = b64.b64decode(base64_data)
-                        image_file_path = os.path.join(evidence_dir, image_filename)
-                        
-                        with open(image_file_path, 'wb') as f:
-                            f.write(image_data_bytes)
-                        
-                        image_path = f"/evidence_images/{image_filename}"
-                        
-                        print(f"📁 证物图片已保存: {image_filename}")
-                        
-                    except Exception as e:
-                        print(f"⚠️ 保存证物图片失败: {e}")
-                elif image_data_field.startswith('/evidence_images/'):
-                    # 已经是文件路径
-                    image_path = image_data_field
-                    image_filename = image_data_field.replace('/evidence_images/', '')
+            row = self._prepare_evidence_row(evidence_data)
             
             # 插入或更新数据
-            cursor.execute('''
-                INSERT OR REPLACE INTO evidences 
-                (id, script_id, name, description, overview, clues, category, image_path, image_filename, 
-                 importance, initial_state, related_characters, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                evidence_id, script_id, name, description, overview, clues, category, image_path, 
-                image_filename, importance, initial_state, related_characters_json, created_at, updated_at
-            ))
+            self._write(lambda conn: conn.execute(_UPSERT_EVIDENCE_SQL, row))
             
-            conn.commit()
-            conn.close()
-            
-            print(f"✅ 证物保存到数据库成功: {name}")
+            print(f"✅ 证物保存到数据库成功: {row[2]}")
             return True
             
         except Exception as e:
@@ -375,46 +1055,15 @@ class SimpleScriptDB:
     def get_evidences_by_script(self, script_id: str) -> List[Dict[str, Any]]:
         """获取指定剧本的所有证物"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._connect() as conn:
+                rows = conn.execute(f'''
+                    SELECT {_EVIDENCE_COLUMNS}
+                    FROM evidences
+                    WHERE script_id = ?
+                    ORDER BY created_at DESC
+                ''', (script_id,)).fetchall()
             
-            cursor.execute('''
-                SELECT id, script_id, name, description, overview, clues, category, image_path, 
-                       importance, initial_state, related_characters, created_at, updated_at
-                FROM evidences
-                WHERE script_id = ?
-                ORDER BY created_at DESC
-            ''', (script_id,))
-            
-            rows = cursor.fetchall()
-            conn.close()
-            
-            evidences = []
-            for row in rows:
-                # 解析关联角色JSON
-                related_characters = []
-                if row[10]:  # related_characters
-                    try:
-                        related_characters = json.loads(row[10])
-                    except:
-                        related_characters = []
-                
-                evidence = {
-                    'id': row[0],
-                    'script_id': row[1],
-                    'name': row[2],
-                    'description': row[3] or '',
-                    'overview': row[4] or '',
-                    'clues': row[5] or '',
-                    'category': row[6] or 'physical',
-                    'image': row[7],  # 使用路径
-                    'importance': row[8] or 'normal',
-                    'initialState': row[9] or 'surface',
-                    'relatedCharacters': related_characters,
-                    'createdAt': row[11],
-                    'updatedAt': row[12]
-                }
-                evidences.append(evidence)
+            evidences = [self._evidence_from_row(row) for row in rows]
             
             print(f"📋 从数据库加载证物 (剧本 {script_id}): {len(evidences)} 个")
             return evidences
@@ -426,28 +1075,20 @@ class SimpleScriptDB:
     def delete_evidence(self, evidence_id: str) -> bool:
         """删除证物"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # 先获取图片文件名
-            cursor.execute('SELECT image_filename FROM evidences WHERE id = ?', (evidence_id,))
-            row = cursor.fetchone()
+            with self._connect() as conn:
+                row = conn.execute('SELECT image_filename FROM evidences WHERE id = ?', (evidence_id,)).fetchone()
             
             if row and row[0]:
-                # 删除图片文件
+                # 删除图片文件（按内容哈希命名的文件可能被共用，不删除）
                 try:
-                    evidence_dir = os.path.join(os.path.dirname(__file__), '..', 'web', 'public', 'evidence_images')
-                    file_path = os.path.join(evidence_dir, row[0])
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
+                    if asset_store.release('evidence', row[0]):
                         print(f"🗑️ 删除证物图片: {row[0]}")
                 except Exception as e:
                     print(f"⚠️ 删除证物图片失败: {e}")
             
             # 删除数据库记录
-            cursor.execute('DELETE FROM evidences WHERE id = ?', (evidence_id,))
-            conn.commit()
-            conn.close()
+            self._write(lambda conn: conn.execute('DELETE FROM evidences WHERE id = ?', (evidence_id,)))
             
             print(f"✅ 从数据库删除证物成功: {evidence_id}")
             return True
@@ -455,6 +1096,37 @@ class SimpleScriptDB:
         except Exception as e:
             print(f"❌ 从数据库删除证物失败: {e}")
             return False
+    
+    def referenced_images(self) -> List[Tuple[str, str]]:
+        """所有被引用的图片，(资源类型, 文件名)，供 asset_store 统计引用和垃圾回收"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT 'cover', cover_image_filename FROM scripts WHERE cover_image_filename IS NOT NULL "
+                "UNION ALL "
+                "SELECT 'evidence', image_filename FROM evidences WHERE image_filename IS NOT NULL"
+            ).fetchall()
+
+def _like_snippet(text: str, term: str, context: int = 24) -> str:
+    """LIKE 检索没有 snippet()，手动截取命中词前后的文字并标记"""
+    index = text.lower().find(term.lower())
+    if index < 0:
+        return text[:context * 2]
+    start = max(0, index - context)
+    end = min(len(text), index + len(term) + context)
+    return (('…' if start > 0 else '') + text[start:index] + '<mark>' + text[index:index + len(term)] + '</mark>'
+            + text[index + len(term):end] + ('…' if end < len(text) else ''))
+
+def _encode_cursor(updated_at: Optional[str], script_id: str) -> str:
+    raw = fast_json.dumps_bytes([updated_at, script_id])
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_cursor(cursor: str):
+    """解析分页游标，格式错误时抛出 ValueError"""
+    try:
+        updated_at, script_id = fast_json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return updated_at, script_id
 
 # 全局实例
 simple_db = SimpleScriptDB()
@@ -1,15 +1,42 @@
-# 简化的数据库API
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
-from simple_db import simple_db
+# 剧本和证物API，数据读写都经过 script_repository（存储后端由 SCRIPT_STORE 选择）
+# 存储调用都是同步的（SQLite 写操作还要在写线程排队、等跨进程的写锁），一律放到线程池执行，不阻塞事件循环；
+# 同一 worker 的并发写请求因此能同时排进写线程的队列，一起组提交。
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional
+import os
+
+import fast_json
+from http_cache import conditional_bytes, conditional_json, make_etag, success_body
+from script_repository import script_repository
+from simple_db import SimpleScriptDB
 
 router = APIRouter()
 
+def _sqlite_store() -> SimpleScriptDB:
+    """摘要分页、全文检索、角色查询、增量同步依赖 SQLite 的索引表，其他存储后端暂不提供"""
+    if script_repository.sqlite_db is None:
+        raise HTTPException(status_code=501, detail=f"当前剧本存储（{script_repository.backend}）不支持该接口")
+    return script_repository.sqlite_db
+
+@router.get("/db/store")
+async def get_store_info():
+    """当前剧本存储后端、本进程的缓存命中情况和 SQLite 写线程的组提交统计"""
+    sqlite_db = script_repository.sqlite_db
+    return {
+        "success": True,
+        "pid": os.getpid(),
+        "backend": script_repository.backend,
+        "cache": script_repository.stats() if hasattr(script_repository, 'stats') else None,
+        "writes": sqlite_db.write_stats() if sqlite_db is not None else None
+    }
+
 @router.post("/db/scripts/save")
 async def save_script_simple(script_data: Dict[str, Any]):
-    """保存剧本到简化数据库"""
+    """保存剧本"""
     try:
-        success = simple_db.save_script(script_data)
+        success = await run_in_threadpool(script_repository.save_script, script_data)
         
         if success:
             return {
@@ -27,7 +54,7 @@ async def save_script_simple(script_data: Dict[str, Any]):
 async def list_scripts_simple():
     """获取所有剧本列表"""
     try:
-        scripts = simple_db.get_all_scripts()
+        scripts = await run_in_threadpool(script_repository.list_scripts)
         
         return {
             "success": True,
@@ -37,19 +64,39 @@ async def list_scripts_simple():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取剧本列表失败: {str(e)}")
 
-@router.get("/db/scripts/{script_id}")
-async def get_script_simple(script_id: str):
-    """获取指定剧本"""
+@router.get("/db/scripts/summaries")
+async def list_script_summaries_simple(limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    """分页获取剧本摘要（不含故事正文、角色详情等大字段），完整剧本通过 /db/scripts/{script_id} 获取"""
+    store = _sqlite_store()
     try:
-        script = simple_db.get_script(script_id)
+        page = await run_in_threadpool(store.list_script_summaries, limit=limit, cursor=cursor)
         
-        if script:
-            return {
-                "success": True,
-                "script": script
-            }
-        else:
+        return {
+            "success": True,
+            "scripts": page['scripts'],
+            "next_cursor": page['next_cursor']
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取剧本摘要失败: {str(e)}")
+
+@router.get("/db/scripts/{script_id}")
+async def get_script_simple(script_id: str, request: Request):
+    """获取指定剧本；带 If-None-Match 且剧本未修改时返回 304，否则直接返回按版本缓存的序列化结果"""
+    try:
+        version = await run_in_threadpool(script_repository.get_script_version, script_id)
+        if not version:
             raise HTTPException(status_code=404, detail="剧本不存在")
+        
+        def build():
+            script_json = script_repository.get_script_json(script_id)
+            if script_json is None:
+                raise HTTPException(status_code=404, detail="剧本不存在")
+            return success_body('script', script_json)
+        
+        return await run_in_threadpool(conditional_bytes, request, make_etag('script', script_id, *version), build)
             
     except HTTPException:
         raise
@@ -60,7 +107,7 @@ async def get_script_simple(script_id: str):
 async def delete_script_simple(script_id: str):
     """删除剧本"""
     try:
-        success = simple_db.delete_script(script_id)
+        success = await run_in_threadpool(script_repository.delete_script, script_id)
         
         if success:
             return {
@@ -73,20 +120,50 @@ async def delete_script_simple(script_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"删除剧本失败: {str(e)}")
 
+@router.post("/db/scripts/bulk")
+async def bulk_save_scripts_simple(payload: Dict[str, Any]):
+    """
+    批量导入剧本（每个剧本可带 evidences 证物列表），以 NDJSON 流式返回
+    
+    每行一个剧本的结果 {"index", "id", "success", "evidence_count", "error"}，
+    最后一行为汇总 {"done": true, "success_count", "failed_count"}
+    """
+    scripts = payload.get('scripts')
+    if not isinstance(scripts, list):
+        raise HTTPException(status_code=400, detail="scripts 必须是数组")
+    
+    def generate():
+        success_count = 0
+        failed_count = 0
+        try:
+            for result in script_repository.save_scripts_bulk(scripts):
+                if result['success']:
+                    success_count += 1
+                else:
+                    failed_count += 1
+                yield fast_json.dumps_bytes(result) + b"\n"
+        except Exception as e:
+            yield fast_json.dumps_bytes({"done": True, "success": False, "error": f"批量导入失败: {str(e)}"}) + b"\n"
+            return
+        yield fast_json.dumps_bytes({
+            "done": True,
+            "success": success_count > 0 or not scripts,
+            "success_count": success_count,
+            "failed_count": failed_count
+        }) + b"\n"
+    
+    # 同步生成器由 Starlette 放到线程池中迭代，不阻塞事件循环
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.post("/db/migrate")
 async def migrate_data_simple(scripts_data: Dict[str, Any]):
-    """迁移数据到简化数据库"""
+    """迁移数据到剧本存储（批量写入，一次性返回汇总）"""
     try:
         scripts = scripts_data.get('scripts', [])
         
-        success_count = 0
-        failed_count = 0
-        
-        for script in scripts:
-            if simple_db.save_script(script):
-                success_count += 1
-            else:
-                failed_count += 1
+        results = await run_in_threadpool(lambda: list(script_repository.save_scripts_bulk(scripts)))
+        success_count = sum(1 for result in results if result['success'])
+        failed_count = len(results) - success_count
         
         return {
             "success": success_count > 0,
@@ -98,17 +175,92 @@ async def migrate_data_simple(scripts_data: Dict[str, Any]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"数据迁移失败: {str(e)}")
 
+@router.get("/db/characters")
+async def find_characters_simple(
+    script_id: Optional[str] = None,
+    role_type: Optional[str] = None,
+    flag: Optional[str] = Query(None, description="身份标记，如 isKiller、isPartner"),
+    missing_avatar: bool = False,
+    name: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000)
+):
+    """按角色类型、身份标记、头像缺失等条件查找角色"""
+    store = _sqlite_store()
+    try:
+        characters = await run_in_threadpool(
+            store.find_characters, script_id=script_id, role_type=role_type, flag=flag,
+            missing_avatar=missing_avatar, name=name, limit=limit
+        )
+        
+        return {
+            "success": True,
+            "characters": characters,
+            "count": len(characters)
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查找角色失败: {str(e)}")
+
+@router.get("/db/search")
+async def search_simple(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: str = Query('all', pattern='^(all|scripts|evidences)$'),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """全文检索剧本和证物，结果按相关度排序"""
+    store = _sqlite_store()
+    try:
+        page = await run_in_threadpool(store.search, q, limit=limit, offset=offset, kind=type)
+        
+        return {
+            "success": True,
+            "query": q,
+            "results": page['results'],
+            "has_more": page['has_more']
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"检索失败: {str(e)}")
+
+@router.get("/db/changes")
+async def get_changes_simple(
+    since: int = Query(0, ge=0, description="上次同步返回的 next_since，首次传 0"),
+    limit: int = Query(500, ge=1, le=1000)
+):
+    """增量同步：返回 since 之后新建、修改、删除的剧本和证物；has_more 为 true 时用 next_since 继续请求"""
+    store = _sqlite_store()
+    try:
+        page = await run_in_threadpool(store.get_changes, since=since, limit=limit)
+        
+        return {
+            "success": True,
+            **page
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取变更失败: {str(e)}")
+
 # === 证物管理API ===
 
 @router.post("/db/evidences/save")
 async def save_evidence_simple(evidence_data: Dict[str, Any]):
-    """保存证物到简化数据库"""
+    """保存证物；所属剧本必须已经保存（证物表对剧本有外键约束），否则返回 404"""
+    script_id = evidence_data.get('script_id') or evidence_data.get('scriptId')
+    if not script_id:
+        raise HTTPException(status_code=400, detail="剧本ID不能为空")
     try:
-        success = simple_db.save_evidence(evidence_data)
+        if not await run_in_threadpool(script_repository.get_script_version, script_id):
+            raise HTTPException(status_code=404, detail=f"剧本不存在 (ID: {script_id})。请先保存剧本再保存证物。")
+        
+        success = await run_in_threadpool(script_repository.save_evidence, evidence_data)
         
         if success:
             # 构建返回的证物数据（与前端格式一致）
-            import json
             related_characters = evidence_data.get('relatedCharacters', [])
             
             saved_evidence = {
@@ -132,20 +284,26 @@ async def save_evidence_simple(evidence_data: Dict[str, Any]):
         else:
             raise HTTPException(status_code=500, detail="证物保存失败")
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"保存证物失败: {str(e)}")
 
 @router.get("/db/evidences/script/{script_id}")
-async def get_evidences_by_script_simple(script_id: str):
-    """获取指定剧本的所有证物"""
+async def get_evidences_by_script_simple(script_id: str, request: Request):
+    """获取指定剧本的所有证物；带 If-None-Match 且证物未变化时返回 304"""
     try:
-        evidences = simple_db.get_evidences_by_script(script_id)
+        def build():
+            evidences = script_repository.get_evidences(script_id)
+            return {
+                "success": True,
+                "evidences": evidences,
+                "count": len(evidences)
+            }
         
-        return {
-            "success": True,
-            "evidences": evidences,
-            "count": len(evidences)
-        }
+        etag = make_etag('evidences', script_id,
+                         await run_in_threadpool(script_repository.get_evidences_version, script_id))
+        return await run_in_threadpool(conditional_json, request, etag, build)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取证物列表失败: {str(e)}")
@@ -154,7 +312,7 @@ async def get_evidences_by_script_simple(script_id: str):
 async def delete_evidence_simple(evidence_id: str):
     """删除证物"""
     try:
-        success = simple_db.delete_evidence(evidence_id)
+        success = await run_in_threadpool(script_repository.delete_evidence, evidence_id)
         
         if success:
             return {
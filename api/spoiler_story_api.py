@@ -1,14 +1,20 @@
 # 剧透故事管理API
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+import base64
 import time
 
+import fast_json
 from models import (
-    Script, SpoilerStory, get_db, create_tables,
-    spoiler_story_to_dict, dict_to_spoiler_story
+    SpoilerStory, get_async_db, get_async_write_db, create_tables,
+    spoiler_story_to_dict, dict_to_spoiler_story, SPOILER_STORY_SUMMARY_COLUMNS, spoiler_story_summary_to_dict
 )
+from http_cache import conditional_json_async, make_etag
+from script_repository import script_repository
 from settings import MODEL, PROMPTS_VERSION
 
 router = APIRouter()
@@ -17,7 +23,7 @@ router = APIRouter()
 create_tables()
 
 @router.post("/db/spoiler-stories/save")
-async def save_spoiler_story(story_data: Dict[str, Any], db: Session = Depends(get_db)):
+async def save_spoiler_story(story_data: Dict[str, Any], db: AsyncSession = Depends(get_async_write_db)):
     """保存剧透故事到数据库"""
     try:
         script_id = story_data.get('scriptId')
@@ -26,8 +32,8 @@ async def save_spoiler_story(story_data: Dict[str, Any], db: Session = Depends(g
         
         print(f"💾 保存剧透故事到数据库: 剧本 {script_id}")
         
-        # 检查剧本是否存在
-        script = db.query(Script).filter(Script.id == script_id).first()
+        # 检查剧本是否存在（剧本在 script_repository 中，读取有缓存；存储调用是同步的，放到线程池执行）
+        script = await run_in_threadpool(script_repository.get_script, script_id)
         if not script:
             raise HTTPException(status_code=404, detail="剧本不存在")
         
@@ -40,12 +46,14 @@ async def save_spoiler_story(story_data: Dict[str, Any], db: Session = Depends(g
         
         # 如果没有提供标题，自动生成一个
         if not story.title or story.title == '剧透故事':
-            story_count = db.query(SpoilerStory).filter(SpoilerStory.script_id == script_id).count()
-            story.title = f"《{script.title}》剧透故事 #{story_count + 1}"
+            story_count = await db.scalar(
+                select(func.count(SpoilerStory.id)).where(SpoilerStory.script_id == script_id)
+            )
+            story.title = f"《{script['title']}》剧透故事 #{story_count + 1}"
         
         db.add(story)
-        db.commit()
-        db.refresh(story)
+        await db.commit()
+        await db.refresh(story)
         
         print(f"✅ 剧透故事保存成功: {story.title}")
         
@@ -58,7 +66,7 @@ async def save_spoiler_story(story_data: Dict[str, Any], db: Session = Depends(g
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 保存剧透故事失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -66,53 +74,132 @@ async def save_spoiler_story(story_data: Dict[str, Any], db: Session = Depends(g
         )
 
 @router.get("/db/spoiler-stories/{script_id}")
-async def get_spoiler_stories(script_id: str, db: Session = Depends(get_db)):
-    """获取指定剧本的所有剧透故事"""
+async def get_spoiler_stories(script_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """获取指定剧本的所有剧透故事（含正文）；带 If-None-Match 且没有变化时返回 304。历史列表用 /summaries 分页接口"""
     try:
-        # 检查剧本是否存在
-        script = db.query(Script).filter(Script.id == script_id).first()
-        if not script:
+        # 检查剧本是否存在；响应里带剧本标题，剧本版本号也计入 ETag
+        script_version = await run_in_threadpool(script_repository.get_script_version, script_id)
+        if not script_version:
             raise HTTPException(status_code=404, detail="剧本不存在")
         
-        # 获取所有剧透故事，按生成时间倒序排列
-        stories = db.query(SpoilerStory).filter(
-            SpoilerStory.script_id == script_id
-        ).order_by(SpoilerStory.generated_at.desc()).all()
+        # 只读每篇故事的版本信息，不读正文；ID 可能在删除后被复用，带上生成时间区分
+        versions = (await db.execute(
+            select(SpoilerStory.id, SpoilerStory.revision, SpoilerStory.generated_at)
+            .where(SpoilerStory.script_id == script_id)
+            .order_by(SpoilerStory.id)
+        )).all()
+        
+        async def build():
+            # 获取所有剧透故事，按生成时间倒序排列
+            stories = (await db.scalars(
+                select(SpoilerStory).where(SpoilerStory.script_id == script_id).order_by(SpoilerStory.generated_at.desc())
+            )).all()
+            
+            stories_data = [spoiler_story_to_dict(story) for story in stories]
+            
+            print(f"📋 获取剧本 {script_id} 的剧透故事: {len(stories_data)} 个")
+            
+            script = await run_in_threadpool(script_repository.get_script, script_id)
+            return {
+                "success": True,
+                "stories": stories_data,
+                "script_title": (script or {}).get('title', '')
+            }
+        
+        etag = make_etag('spoiler-stories', script_id, *script_version, [tuple(row) for row in versions])
+        return await conditional_json_async(request, etag, build)
         
-        stories_data = [spoiler_story_to_dict(story) for story in stories]
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ 获取剧透故事失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取剧透故事失败: {str(e)}"
+        )
+
+@router.get("/db/spoiler-stories/{script_id}/summaries")
+async def list_spoiler_story_summaries(
+    script_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    order: str = Query('newest', pattern='^(newest|oldest)$'),
+    ai_model: Optional[str] = Query(None, description="只返回该模型生成的故事"),
+    prompt_version: Optional[str] = Query(None, description="只返回该提示词版本生成的故事"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    分页获取剧本的剧透故事列表，只含标题、字数、耗时、模型等元数据和正文开头的预览；
+    正文通过 /db/spoiler-stories/story/{story_id} 按需获取
+    """
+    try:
+        if not await run_in_threadpool(script_repository.get_script_version, script_id):
+            raise HTTPException(status_code=404, detail="剧本不存在")
         
-        print(f"📋 获取剧本 {script_id} 的剧透故事: {len(stories_data)} 个")
+        filters = [SpoilerStory.script_id == script_id]
+        if ai_model:
+            filters.append(SpoilerStory.ai_model == ai_model)
+        if prompt_version:
+            filters.append(SpoilerStory.prompt_version == prompt_version)
+        total = await db.scalar(select(func.count(SpoilerStory.id)).where(*filters))
+        
+        # 按 (生成时间, ID) 键集分页，走 (script_id, generated_at) 索引，翻到后面的页也不需要跳过前面的行
+        key = tuple_(SpoilerStory.generated_at, SpoilerStory.id)
+        query = select(*SPOILER_STORY_SUMMARY_COLUMNS).where(*filters)
+        if cursor:
+            generated_at, story_id = _decode_cursor(cursor)
+            query = query.where(key < (generated_at, story_id) if order == 'newest' else key > (generated_at, story_id))
+        if order == 'newest':
+            query = query.order_by(SpoilerStory.generated_at.desc(), SpoilerStory.id.desc())
+        else:
+            query = query.order_by(SpoilerStory.generated_at, SpoilerStory.id)
+        # 多取一条用于判断是否还有下一页
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         return {
             "success": True,
-            "stories": stories_data,
-            "script_title": script.title
+            "stories": [spoiler_story_summary_to_dict(row) for row in rows],
+            "total": total,
+            "next_cursor": _encode_cursor(rows[-1].generated_at, rows[-1].id) if has_more else None
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"❌ 获取剧透故事失败: {e}")
+        print(f"❌ 获取剧透故事列表失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"获取剧透故事失败: {str(e)}"
+            detail=f"获取剧透故事列表失败: {str(e)}"
         )
 
 @router.get("/db/spoiler-stories/story/{story_id}")
-async def get_spoiler_story(story_id: int, db: Session = Depends(get_db)):
-    """获取指定的剧透故事详情"""
+async def get_spoiler_story(story_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """获取指定的剧透故事详情；带 If-None-Match 且没有修改时返回 304"""
     try:
-        story = db.query(SpoilerStory).filter(SpoilerStory.id == story_id).first()
+        version = (await db.execute(
+            select(SpoilerStory.revision, SpoilerStory.generated_at).where(SpoilerStory.id == story_id)
+        )).first()
         
-        if not story:
+        if not version:
             raise HTTPException(status_code=404, detail="剧透故事不存在")
         
-        print(f"📖 获取剧透故事: {story.title}")
+        async def build():
+            story = await db.get(SpoilerStory, story_id)
+            if not story:
+                raise HTTPException(status_code=404, detail="剧透故事不存在")
+            
+            print(f"📖 获取剧透故事: {story.title}")
+            
+            return {
+                "success": True,
+                "story": spoiler_story_to_dict(story)
+            }
         
-        return {
-            "success": True,
-            "story": spoiler_story_to_dict(story)
-        }
+        return await conditional_json_async(request, make_etag('spoiler-story', story_id, *version), build)
         
     except HTTPException:
         raise
@@ -124,17 +211,17 @@ async def get_spoiler_story(story_id: int, db: Session = Depends(get_db)):
         )
 
 @router.delete("/db/spoiler-stories/{story_id}")
-async def delete_spoiler_story(story_id: int, db: Session = Depends(get_db)):
+async def delete_spoiler_story(story_id: int, db: AsyncSession = Depends(get_async_write_db)):
     """删除指定的剧透故事"""
     try:
-        story = db.query(SpoilerStory).filter(SpoilerStory.id == story_id).first()
+        story = await db.get(SpoilerStory, story_id)
         
         if not story:
             raise HTTPException(status_code=404, detail="剧透故事不存在")
         
         story_title = story.title
-        db.delete(story)
-        db.commit()
+        await db.delete(story)
+        await db.commit()
         
         print(f"✅ 删除剧透故事成功: {story_title}")
         
@@ -146,7 +233,7 @@ async def delete_spoiler_story(story_id: int, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 删除剧透故事失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -154,10 +241,10 @@ async def delete_spoiler_story(story_id: int, db: Session = Depends(get_db)):
         )
 
 @router.put("/db/spoiler-stories/{story_id}")
-async def update_spoiler_story(story_id: int, story_data: Dict[str, Any], db: Session = Depends(get_db)):
+async def update_spoiler_story(story_id: int, story_data: Dict[str, Any], db: AsyncSession = Depends(get_async_write_db)):
     """更新剧透故事"""
     try:
-        story = db.query(SpoilerStory).filter(SpoilerStory.id == story_id).first()
+        story = await db.get(SpoilerStory, story_id)
         
         if not story:
             raise HTTPException(status_code=404, detail="剧透故事不存在")
@@ -168,9 +255,10 @@ async def update_spoiler_story(story_id: int, story_data: Dict[str, Any], db: Se
         if 'content' in story_data:
             story.content = story_data['content']
             story.word_count = len(story_data['content'])
+        story.revision = (story.revision or 0) + 1
         
-        db.commit()
-        db.refresh(story)
+        await db.commit()
+        await db.refresh(story)
         
         print(f"✅ 更新剧透故事成功: {story.title}")
         
@@ -183,7 +271,7 @@ async def update_spoiler_story(story_id: int, story_data: Dict[str, Any], db: Se
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 更新剧透故事失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -191,25 +279,22 @@ async def update_spoiler_story(story_id: int, story_data: Dict[str, Any], db: Se
         )
 
 @router.post("/db/spoiler-stories/batch-delete")
-async def batch_delete_spoiler_stories(story_ids: List[int], db: Session = Depends(get_db)):
-    """批量删除剧透故事"""
+async def batch_delete_spoiler_stories(story_ids: List[int], db: AsyncSession = Depends(get_async_write_db)):
+    """批量删除剧透故事：一条 DELETE ... WHERE id IN (...) RETURNING id，不存在的 ID 记为失败"""
     try:
-        deleted_count = 0
-        failed_ids = []
-        
-        for story_id in story_ids:
-            try:
-                story = db.query(SpoilerStory).filter(SpoilerStory.id == story_id).first()
-                if story:
-                    db.delete(story)
-                    deleted_count += 1
-                else:
-                    failed_ids.append(story_id)
-            except Exception as e:
-                print(f"删除故事 {story_id} 失败: {e}")
-                failed_ids.append(story_id)
-        
-        db.commit()
+        requested_ids = list(dict.fromkeys(story_ids))
+        deleted_ids = set()
+        if requested_ids:
+            deleted_ids = set((await db.scalars(
+                delete(SpoilerStory)
+                .where(SpoilerStory.id.in_(requested_ids))
+                .returning(SpoilerStory.id)
+                .execution_options(synchronize_session=False)
+            )).all())
+        await db.commit()
+        
+        deleted_count = len(deleted_ids)
+        failed_ids = [story_id for story_id in requested_ids if story_id not in deleted_ids]
         
         print(f"✅ 批量删除剧透故事: 成功 {deleted_count} 个，失败 {len(failed_ids)} 个")
         
@@ -221,9 +306,21 @@ async def batch_delete_spoiler_stories(story_ids: List[int], db: Session = Depen
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ 批量删除剧透故事失败: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"批量删除剧透故事失败: {str(e)}"
         )
+
+def _encode_cursor(generated_at: datetime, story_id: int) -> str:
+    raw = fast_json.dumps_bytes([generated_at.isoformat(), story_id])
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_cursor(cursor: str):
+    """解析分页游标，格式错误时抛出 ValueError"""
+    try:
+        generated_at, story_id = fast_json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(generated_at), int(story_id)
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
@@ -0,0 +1,163 @@
+# SQLite 写入协调：每个进程、每个数据库文件一个写线程，所有写操作排队交给它执行
+# 写线程把队列里积压的写操作合并到一个事务里提交（组提交），每个操作用 SAVEPOINT 隔开，失败只回滚自己。
+# 多个 uvicorn worker 之间仍靠 SQLite 的文件锁互斥：事务用 BEGIN IMMEDIATE 开始，在 busy_timeout 内排队等写锁，
+# 超时再退避重试。每个进程同一时刻只有一个写事务，进程间的写锁竞争最多 worker 数个。
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+from sqlite_pool import apply_pragmas
+
+SQLITE_WRITE_BATCH_SIZE = int(os.getenv("SQLITE_WRITE_BATCH_SIZE", "64"))  # 一个事务最多合并的写操作数
+SQLITE_WRITE_RETRIES = int(os.getenv("SQLITE_WRITE_RETRIES", "5"))  # busy_timeout 之后仍拿不到写锁时的重试次数
+SQLITE_WRITE_TIMEOUT_S = float(os.getenv("SQLITE_WRITE_TIMEOUT_S", "60"))  # 调用方等待写入结果的上限
+
+
+def is_locked_error(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and (
+        "database is locked" in str(error) or "database is busy" in str(error)
+    )
+
+
+class _WriteJob:
+    __slots__ = ("fn", "future")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+
+
+class SQLiteWriter:
+    """单写线程 + 组提交
+
+    run(fn) 把 fn(conn) 交给写线程，在事务中执行后返回 fn 的返回值或抛出它的异常。
+    fn 只能用传入的连接做数据库操作，不能再调用 run（写线程会等待自己）。
+    """
+
+    def __init__(self, db_path: str, batch_size: int = SQLITE_WRITE_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self._queue: "queue.SimpleQueue[_WriteJob]" = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._stats = {"jobs": 0, "batches": 0, "max_batch": 0, "failed_jobs": 0, "lock_retries": 0}
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # fork 出的子进程没有父进程的写线程，队列也要换新的
+            self._queue = queue.SimpleQueue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name=f"sqlite-writer:{os.path.basename(self.db_path)}",
+                                            daemon=True)
+            self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        self._ensure_thread()
+        job = _WriteJob(fn)
+        self._queue.put(job)
+        return job.future
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any], timeout: float = SQLITE_WRITE_TIMEOUT_S) -> Any:
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("写操作中不能再提交写操作")
+        return self.submit(fn).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _open(self) -> sqlite3.Connection:
+        # isolation_level=None：由写线程自己发 BEGIN IMMEDIATE / SAVEPOINT / COMMIT
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn)
+        return conn
+
+    def _loop(self):
+        conn = self._open()
+        while True:
+            batch = [self._queue.get()]
+            # 不额外等待：空闲时单个写操作立即提交，繁忙时排队的写操作自然合并
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit_batch(conn, batch)
+            except sqlite3.Error as e:
+                # 连接本身出了问题，重开连接，这一批全部失败
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                conn = self._open()
+
+    def _begin(self, conn: sqlite3.Connection):
+        """BEGIN IMMEDIATE 先在 busy_timeout 内等待写锁，仍被其他进程占用时退避重试"""
+        for attempt in range(SQLITE_WRITE_RETRIES + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not is_locked_error(e) or attempt == SQLITE_WRITE_RETRIES:
+                    raise
+                with self._lock:
+                    self._stats["lock_retries"] += 1
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List[_WriteJob]):
+        self._begin(conn)
+        outcomes = []
+        for job in batch:
+            conn.execute("SAVEPOINT write_job")
+            try:
+                result = job.fn(conn)
+                conn.execute("RELEASE write_job")
+                outcomes.append((job, result, None))
+            except Exception as e:
+                conn.execute("ROLLBACK TO write_job")
+                conn.execute("RELEASE write_job")
+                outcomes.append((job, None, e))
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._stats["jobs"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            self._stats["failed_jobs"] += sum(1 for _, _, error in outcomes if error is not None)
+        for job, result, error in outcomes:
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+
+_writers: Dict[str, SQLiteWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def writer_for(db_path: str) -> SQLiteWriter:
+    """同一个数据库文件在进程内共用一个写线程"""
+    key = os.path.abspath(db_path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = SQLiteWriter(db_path)
+        return writer
@@ -0,0 +1,21 @@
+# Server-Sent Events 帧编码
+from typing import Any, Dict
+
+import fast_json
+
+
+def format_sse_event(payload: Dict[str, Any]) -> str:
+    """把一个事件编码为 SSE 的 data 帧（以空行结束）；中文按 UTF-8 原样输出，不转义成 \\uXXXX"""
+    return f"data: {fast_json.dumps(payload)}\n\n"
+
+
+def sse_chunk(content: str) -> str:
+    return format_sse_event({'type': 'chunk', 'content': content})
+
+
+def sse_end() -> str:
+    return format_sse_event({'type': 'end'})
+
+
+def sse_error(message: str) -> str:
+    return format_sse_event({'type': 'error', 'message': message})
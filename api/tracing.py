@@ -0,0 +1,224 @@
+# 请求链路追踪：按阶段记录耗时（span），导出为 OpenTelemetry span 或本地 JSONL 文件
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from settings import TRACE_EXPORTER, TRACE_JSONL_PATH
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # OpenTelemetry 是可选依赖
+    otel_trace = None
+
+
+class Span:
+    """单个阶段的耗时记录，字段命名与 OpenTelemetry 保持一致"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """一次 /invoke 请求的完整链路，根 span 之下按调用栈嵌套各阶段"""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, self.trace_id, attributes=attributes)
+        self.spans: List[Span] = [self.root]
+        self._stack: List[Span] = [self.root]
+        self._finished = False
+
+    @property
+    def name(self) -> str:
+        return self.root.name
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = self._stack[-1] if self._stack else self.root
+        span = Span(name, self.trace_id, parent.span_id, attributes)
+        self.spans.append(span)
+        self._stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "error"
+            span.set_attribute("error", str(e))
+            raise
+        finally:
+            span.end()
+            # 流式响应中 span 可能交错结束，按对象移除而不是直接 pop
+            if span in self._stack:
+                self._stack.remove(span)
+
+    def stage_durations(self) -> Dict[str, float]:
+        """各阶段耗时（毫秒），同名阶段累加；根 span 记为 total"""
+        durations: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            durations[span.name] = round(durations.get(span.name, 0.0) + span.duration_ms, 3)
+        durations["total"] = round(self.root.duration_ms, 3)
+        return durations
+
+    def summary(self) -> Dict[str, Any]:
+        """写入 conversation_turns.stage_timings 的内容"""
+        return {"trace_id": self.trace_id, "stages_ms": self.stage_durations()}
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        self.root.end()
+        export_trace(self)
+        stages = ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.stage_durations().items())
+        print(f"⏱️ {self.name} [{self.trace_id[:8]}] {stages}")
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_turn(name: str, **attributes):
+    """开启一条链路并设为当前链路，退出时导出"""
+    trace = Trace(name, **attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.status = "error"
+        trace.root.set_attribute("error", str(e))
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+
+
+@contextmanager
+def use_trace(trace: Optional[Trace]):
+    """在请求上下文之外（如流式生成器的单次迭代内）临时指定当前链路"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, trace: Optional[Trace] = None, **attributes):
+    """在当前链路下记录一个阶段；没有活动链路时返回一个不导出的独立 span"""
+    trace = trace or current_trace()
+    if trace is None:
+        detached = Span(name, "", attributes=attributes)
+        try:
+            yield detached
+        finally:
+            detached.end()
+        return
+    with trace.span(name, **attributes) as s:
+        yield s
+
+
+def record_llm_usage(span: Span, latency_s: float, input_tokens: Optional[int], output_tokens: Optional[int],
+                     ttft_s: Optional[float] = None):
+    """记录一次模型调用的延迟、首 token 时间和吞吐"""
+    span.set_attribute("llm.latency_ms", round(latency_s * 1000, 3))
+    if ttft_s is not None:
+        span.set_attribute("llm.ttft_ms", round(ttft_s * 1000, 3))
+    if input_tokens is not None:
+        span.set_attribute("llm.input_tokens", input_tokens)
+    if output_tokens is not None:
+        span.set_attribute("llm.output_tokens", output_tokens)
+        # 吞吐按首 token 之后的生成时间计算；非流式调用拿不到首 token 时间，按总延迟计算
+        generation_s = latency_s - (ttft_s or 0.0)
+        if generation_s > 0:
+            span.set_attribute("llm.tokens_per_sec", round(output_tokens / generation_s, 2))
+
+
+# ===== 导出 =====
+
+_jsonl_lock = threading.Lock()
+_otel_tracer = None
+
+
+def _export_jsonl(trace: Trace):
+    path = TRACE_JSONL_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False) + "\n" for s in trace.spans)
+    # 多个 worker 进程共享同一文件，单次 append 写入整条链路以避免行交错
+    with _jsonl_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _export_otel(trace: Trace):
+    global _otel_tracer
+    if otel_trace is None:
+        return
+    if _otel_tracer is None:
+        _otel_tracer = otel_trace.get_tracer("ai-murder-mystery.api")
+
+    # span 已经结束，按开始时间顺序补建 OpenTelemetry span 并保持父子关系
+    otel_spans = {}
+    for s in sorted(trace.spans, key=lambda x: x.start_ns):
+        parent = otel_spans.get(s.parent_id)
+        context = otel_trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = _otel_tracer.start_span(s.name, context=context, start_time=s.start_ns,
+                                            attributes={k: v for k, v in s.attributes.items() if v is not None})
+        otel_span.set_attribute("app.trace_id", s.trace_id)
+        if s.status == "error":
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        otel_spans[s.span_id] = otel_span
+    for s in trace.spans:
+        otel_spans[s.span_id].end(end_time=s.end_ns or time.time_ns())
+
+
+def export_trace(trace: Trace):
+    try:
+        if TRACE_EXPORTER in ("jsonl", "both"):
+            _export_jsonl(trace)
+        if TRACE_EXPORTER in ("otel", "both"):
+            _export_otel(trace)
+    except Exception as e:
+        print(f"⚠️ 导出链路追踪失败: {e}")
@@ -0,0 +1,69 @@
+# 按版本号校验的进程内 LRU 缓存
+# 读取时先查一次数据的版本号（一行或一个聚合查询），版本号和缓存的一致就直接返回缓存；
+# 其他 worker 写入后版本号随之变化，所以不需要跨进程失效。
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class VersionedCache:
+    """
+    {键: (版本号, 值)} 的 LRU
+
+    版本号要先于数据读取：并发写入时最多多读一次，不会把旧数据记到新版本下。
+    返回的是缓存中的同一个对象，调用方不要修改。
+    """
+
+    _MISS = object()
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable, version: Any) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return self._MISS
+
+    def _store(self, key: Hashable, version: Any, value: Any):
+        if value is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def read_through(self, key: Hashable, version: Any, load: Callable[[], Any]) -> Any:
+        value = self._lookup(key, version)
+        if value is self._MISS:
+            value = load()
+            self._store(key, version, value)
+        return value
+
+    async def read_through_async(self, key: Hashable, version: Any, load: Callable[[], Awaitable[Any]]) -> Any:
+        """load 为协程函数（使用 AsyncSession 查询的路由）"""
+        value = self._lookup(key, version)
+        if value is self._MISS:
+            value = await load()
+            self._store(key, version, value)
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        """本进程写入后立即丢弃相关缓存，释放内存；正确性不依赖这里"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
@@ -1,5 +1,5 @@
 // 数据库API接口
-import { Script } from '../types/script';
+import { Script, ScriptEvidence } from '../types/script';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:10000';
 
@@ -12,6 +12,22 @@ export interface ScriptListResponse extends DatabaseResponse {
   scripts: Script[];
 }
 
+// 剧本库列表用的轻量摘要
+export interface ScriptSummary {
+  id: string;
+  title: string;
+  description: string;
+  author: string;
+  coverImage: string | null;
+  updatedAt: string;
+  characterCount: number;
+}
+
+export interface ScriptSummaryPageResponse extends DatabaseResponse {
+  scripts: ScriptSummary[];
+  next_cursor: string | null;
+}
+
 export interface ScriptResponse extends DatabaseResponse {
   script: Script;
 }
@@ -89,6 +105,90 @@ export async function getScriptsFromDB(): Promise<ScriptListResponse> {
   }
 }
 
+// 分页获取剧本摘要（不含故事正文和角色详情），完整剧本用 getScriptFromDB 按需加载
+export async function getScriptSummariesFromDB(limit = 50, cursor?: string | null): Promise<ScriptSummaryPageResponse> {
+  try {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+
+    const response = await fetch(`${API_BASE_URL}/db/scripts/summaries?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('❌ 剧本摘要查询请求失败:', error);
+    return {
+      success: false,
+      scripts: [],
+      next_cursor: null,
+      message: `剧本摘要查询请求失败: ${error instanceof Error ? error.message : '未知错误'}`
+    };
+  }
+}
+
+// 增量同步：一条变更记录，每个剧本/证物只保留最近一次变更
+export interface ChangeRecord {
+  seq: number;
+  entity: 'script' | 'evidence';
+  id: string;
+  scriptId: string | null;
+  op: 'created' | 'updated' | 'deleted';
+  changedAt: string;
+}
+
+export interface ChangesResponse extends DatabaseResponse {
+  changes: ChangeRecord[];
+  scripts: Script[];  // 新建/修改的剧本完整数据
+  evidences: (ScriptEvidence & { script_id: string })[];  // 新建/修改的证物完整数据
+  next_since: number;  // 下次请求使用的 since
+  has_more: boolean;
+  current_seq: number;
+  reset: boolean;  // 为 true 时本地缓存已失效，需要重新全量加载
+}
+
+// 获取 since 之后的变更；has_more 为 true 时用 next_since 继续请求
+export async function getChangesFromDB(since = 0, limit = 500): Promise<ChangesResponse> {
+  try {
+    const params = new URLSearchParams({ since: String(since), limit: String(limit) });
+
+    const response = await fetch(`${API_BASE_URL}/db/changes?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('❌ 变更查询请求失败:', error);
+    return {
+      success: false,
+      changes: [],
+      scripts: [],
+      evidences: [],
+      next_since: since,
+      has_more: false,
+      current_seq: since,
+      reset: false,
+      message: `变更查询请求失败: ${error instanceof Error ? error.message : '未知错误'}`
+    };
+  }
+}
+
 // 从数据库获取指定剧本
 export async function getScriptFromDB(scriptId: string): Promise<ScriptResponse> {
   try {
@@ -161,40 +261,102 @@ export async function deleteScriptFromDB(scriptId: string): Promise<DatabaseResp
   }
 }
 
-// 迁移现有数据到数据库
-export async function migrateDataToDB(scripts: Script[]): Promise<DatabaseResponse> {
+// 批量导入的逐条结果（NDJSON 每行一个）
+export interface BulkImportItemResult {
+  index: number;
+  id: string | null;
+  success: boolean;
+  evidence_count: number;
+  error?: string;
+}
+
+export interface BulkImportResponse extends DatabaseResponse {
+  success_count: number;
+  failed_count: number;
+  results: BulkImportItemResult[];
+}
+
+// 批量导入剧本（可带 evidences），服务端一批一个事务，结果按批流式返回
+export async function bulkImportScriptsToDB(
+  scripts: Script[],
+  onProgress?: (result: BulkImportItemResult) => void
+): Promise<BulkImportResponse> {
+  const results: BulkImportItemResult[] = [];
   try {
-    
-    let successCount = 0;
-    let failedCount = 0;
-    
-    // 逐个迁移剧本
-    for (const script of scripts) {
-      try {
-        const result = await saveScriptToDB(script);
-        if (result.success) {
-          successCount++;
+    const response = await fetch(`${API_BASE_URL}/db/scripts/bulk`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ scripts }),
+    });
+
+    if (!response.ok || !response.body) {
+      const errorText = await response.text();
+      throw new Error(`HTTP ${response.status}: ${errorText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary: any = null;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() || '';
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const item = JSON.parse(line);
+        if (item.done) {
+          summary = item;
         } else {
-          failedCount++;
-          console.error(`❌ 迁移剧本失败: ${script.title}`, result.message);
+          results.push(item);
+          onProgress?.(item);
         }
-      } catch (error) {
-        failedCount++;
-        console.error(`❌ 迁移剧本异常: ${script.title}`, error);
       }
     }
-    
-    
+
+    if (!summary) {
+      throw new Error('批量导入响应不完整');
+    }
+    if (summary.error) {
+      throw new Error(summary.error);
+    }
+
     return {
-      success: successCount > 0,
-      message: `数据迁移完成: 成功 ${successCount} 个，失败 ${failedCount} 个`
+      success: summary.success,
+      message: `批量导入完成: 成功 ${summary.success_count} 个，失败 ${summary.failed_count} 个`,
+      success_count: summary.success_count,
+      failed_count: summary.failed_count,
+      results
     };
-    
   } catch (error) {
-    console.error('❌ 数据迁移异常:', error);
+    console.error('❌ 批量导入失败:', error);
+    const successCount = results.filter(r => r.success).length;
     return {
       success: false,
-      message: `数据迁移异常: ${error instanceof Error ? error.message : '未知错误'}`
+      message: `批量导入失败: ${error instanceof Error ? error.message : '未知错误'}`,
+      success_count: successCount,
+      failed_count: results.length - successCount,
+      results
     };
   }
 }
+
+// 迁移现有数据到数据库
+export async function migrateDataToDB(scripts: Script[]): Promise<DatabaseResponse> {
+  const result = await bulkImportScriptsToDB(scripts, (item) => {
+    if (!item.success) {
+      console.error(`❌ 迁移剧本失败: ${scripts[item.index]?.title}`, item.error);
+    }
+  });
+  return {
+    success: result.success,
+    message: result.success
+      ? `数据迁移完成: 成功 ${result.success_count} 个，失败 ${result.failed_count} 个`
+      : result.message
+  };
+}
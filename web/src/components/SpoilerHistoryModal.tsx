@@ -13,7 +13,8 @@ interface SpoilerStory {
   id: number;
   scriptId: string;
   title: string;
-  content: string;
+  content?: string; // 列表接口不返回正文，查看详情时再按 ID 获取
+  excerpt?: string; // 正文开头的预览
   generatedAt: string;
   wordCount: number;
   generationDuration: number;
@@ -64,29 +65,41 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
   onViewStory
 }) => {
   const [stories, setStories] = useState<SpoilerStory[]>([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [loadingDetail, setLoadingDetail] = useState(false);
+  // 正文加载失败的故事及原因；只在仍查看该故事时显示
+  const [detailError, setDetailError] = useState<{ storyId: number; message: string } | null>(null);
   const [selectedStory, setSelectedStory] = useState<SpoilerStory | null>(null);
   const [viewMode, setViewMode] = useState<'list' | 'detail'>('list');
 
-  // 加载历史剧透故事
-  const loadStories = async () => {
+  // 加载历史剧透故事（分页，只含元数据和预览）；传入 cursor 时追加下一页
+  const loadStories = async (cursor?: string) => {
     if (!script?.id) return;
     
-    setLoading(true);
+    const setBusy = cursor ? setLoadingMore : setLoading;
+    setBusy(true);
     try {
-      const response = await fetch(`${API_URL}/db/spoiler-stories/${script.id}`);
+      const params = new URLSearchParams({ limit: '20' });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${API_URL}/db/spoiler-stories/${script.id}/summaries?${params}`);
       const data = await response.json();
       
       if (data.success) {
-        setStories(data.stories || []);
-        console.log(`📚 加载了 ${data.stories?.length || 0} 个历史剧透故事`);
+        const page: SpoilerStory[] = data.stories || [];
+        setStories(prev => cursor ? [...prev, ...page] : page);
+        setTotal(data.total || 0);
+        setNextCursor(data.next_cursor || null);
+        console.log(`📚 加载了 ${page.length} 个历史剧透故事，共 ${data.total || 0} 个`);
       } else {
         console.error('加载历史剧透故事失败:', data.message);
       }
     } catch (error) {
       console.error('加载历史剧透故事出错:', error);
     } finally {
-      setLoading(false);
+      setBusy(false);
     }
   };
 
@@ -100,6 +113,7 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
       
       if (data.success) {
         setStories(stories.filter(story => story.id !== storyId));
+        setTotal(count => Math.max(count - 1, 0));
         console.log('✅ 删除剧透故事成功');
         
         // 如果正在查看被删除的故事，返回列表
@@ -115,15 +129,37 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
     }
   };
 
-  // 查看故事详情
-  const viewStoryDetail = (story: SpoilerStory) => {
+  // 查看故事详情：正文按需获取
+  const viewStoryDetail = async (story: SpoilerStory) => {
     setSelectedStory(story);
     setViewMode('detail');
+    setDetailError(null);
+    if (story.content !== undefined) return;
+    
+    setLoadingDetail(true);
+    try {
+      const response = await fetch(`${API_URL}/db/spoiler-stories/story/${story.id}`);
+      const data = await response.json();
+      
+      if (response.ok && data.success) {
+        setSelectedStory(current => current?.id === story.id ? data.story : current);
+        setStories(prev => prev.map(item => item.id === story.id ? data.story : item));
+      } else {
+        console.error('加载剧透故事详情失败:', data.detail || data.message);
+        setDetailError({ storyId: story.id, message: data.detail || data.message || `HTTP ${response.status}` });
+      }
+    } catch (error) {
+      console.error('加载剧透故事详情出错:', error);
+      setDetailError({ storyId: story.id, message: '网络错误，请检查后端服务是否可用' });
+    } finally {
+      setLoadingDetail(false);
+    }
   };
 
   // 返回列表视图
   const backToList = () => {
     setSelectedStory(null);
+    setDetailError(null);
     setViewMode('list');
   };
 
@@ -257,12 +293,12 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
               }}>
                 <Group justify="space-between">
                   <Text size="md" fw={600} style={{ color: '#A78BFA' }}>
-                    共找到 {stories.length} 个历史剧透故事
+                    共找到 {total} 个历史剧透故事
                   </Text>
                   <Group gap="sm">
                     <Button
                       leftSection={<IconRefresh size={16} />}
-                      onClick={loadStories}
+                      onClick={() => loadStories()}
                       disabled={loading}
                       size="sm"
                       styles={{
@@ -374,7 +410,7 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
                                 overflow: 'hidden'
                               }}
                             >
-                              {story.content.replace(/[#*]/g, '').substring(0, 150)}...
+                              {(story.excerpt ?? story.content ?? '').replace(/[#*]/g, '').substring(0, 150)}...
                             </Text>
                           </div>
                           
@@ -416,6 +452,16 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
                       </Paper>
                     ))
                   )}
+                  {!loading && nextCursor && (
+                    <Button
+                      variant="subtle"
+                      onClick={() => loadStories(nextCursor)}
+                      loading={loadingMore}
+                      style={{ color: '#A78BFA' }}
+                    >
+                      加载更多
+                    </Button>
+                  )}
                 </Stack>
               </ScrollArea>
             </>
@@ -474,19 +520,58 @@ const SpoilerHistoryModal: React.FC<SpoilerHistoryModalProps> = ({
                 boxShadow: '0 0 20px rgba(167, 139, 250, 0.3)'
               }}>
                 <ScrollArea h="50vh">
-                  <TypographyStylesProvider>
-                    <div 
+                  {!loadingDetail && detailError?.storyId === selectedStory.id ? (
+                    <Alert
+                      color="red"
+                      title="故事内容加载失败"
+                      icon={<IconFileText />}
                       style={{
-                        color: '#FFFFFF',
-                        fontSize: '16px',
-                        lineHeight: '1.8',
-                        fontFamily: '"Noto Serif SC", "Georgia", serif',
+                        backgroundColor: 'rgba(239, 68, 68, 0.1)',
+                        border: '1px solid rgba(239, 68, 68, 0.3)'
                       }}
-                      dangerouslySetInnerHTML={{
-                        __html: convertMarkdownToHtml(selectedStory.content)
-                      }}
-                    />
-                  </TypographyStylesProvider>
+                    >
+                      <Stack gap="sm">
+                        <Text style={{ color: '#E0E0E0' }}>
+                          {detailError.message}
+                        </Text>
+                        <Group gap="sm">
+                          <Button
+                            size="xs"
+                            variant="light"
+                            color="red"
+                            leftSection={<IconRefresh size={14} />}
+                            onClick={() => viewStoryDetail(selectedStory)}
+                          >
+                            重试
+                          </Button>
+                          <Button size="xs" variant="subtle" onClick={backToList} style={{ color: '#A78BFA' }}>
+                            返回列表
+                          </Button>
+                        </Group>
+                      </Stack>
+                    </Alert>
+                  ) : loadingDetail || selectedStory.content === undefined ? (
+                    <Stack align="center" gap="md" py="xl">
+                      <Loader size="lg" color="#A78BFA" />
+                      <Text style={{ color: '#A78BFA' }}>
+                        正在加载故事内容...
+                      </Text>
+                    </Stack>
+                  ) : (
+                    <TypographyStylesProvider>
+                      <div 
+                        style={{
+                          color: '#FFFFFF',
+                          fontSize: '16px',
+                          lineHeight: '1.8',
+                          fontFamily: '"Noto Serif SC", "Georgia", serif',
+                        }}
+                        dangerouslySetInnerHTML={{
+                          __html: convertMarkdownToHtml(selectedStory.content)
+                        }}
+                      />
+                    </TypographyStylesProvider>
+                  )}
                 </ScrollArea>
               </Paper>
             </>
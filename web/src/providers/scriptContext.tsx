@@ -37,6 +37,8 @@ export const ScriptProvider: React.FC<ScriptProviderProps> = ({ children }) => {
         // 启用数据库功能，从数据库加载剧本数据
         
         // 首先尝试从数据库加载剧本
+        // 剧本库网格只需要摘要（getScriptSummariesFromDB），但游戏、编辑器和下面的角色迁移都从这份列表里取完整剧本，
+        // 改成按需加载详情之前仍然加载完整列表
         let dbScripts: Script[] = [];
         try {
           const { getScriptsFromDB } = await import('../api/database');